@@ -1,8 +1,12 @@
-from fastapi import APIRouter
+import json
+from fastapi import APIRouter, Request
+from fastapi.responses import Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from app.config import vector_db_engine
 from app.config import llm
 from app.api.models import Query
-from app.services.llm_services import query_llm
+from app.services.llm_services import aquery_llm, astream_query_llm
+from app.utils.metrics_utils import REQUESTS_IN_PROGRESS
 
 api_router = APIRouter()
 
@@ -13,16 +17,62 @@ def say_hello():
 
 
 @api_router.post("/query/")
-def ask_query(query: Query):
-    full_response = query_llm(
-        vector_db_engine=vector_db_engine,
-        query_text=query.query_text,
-        model=llm,
-        search_k=query.search_k,
-    )
+async def ask_query(query: Query):
+    with REQUESTS_IN_PROGRESS.labels("/query/").track_inprogress():
+        full_response = await aquery_llm(
+            vector_db_engine=vector_db_engine,
+            query_text=query.query_text,
+            model=llm,
+            search_k=query.search_k,
+        )
     return {
         "message": "Query entregada con exito",
         "query": query,
         "model_response": full_response.get("model_response"),
         "sources": full_response.get("sources"),
+        "context_tokens": full_response.get("context_tokens"),
     }
+
+
+@api_router.post("/query/stream")
+async def ask_query_stream(query: Query, request: Request):
+    """
+    Responde la query como Server-Sent Events: primero las fuentes (`sources`), luego cada
+    fragmento generado por el LLM (`token`) y al final un evento `done` con los tokens del
+    contexto (`context_tokens`). Si el cliente se desconecta, se deja de consumir el stream
+    del LLM.
+    """
+
+    async def event_stream():
+        events = astream_query_llm(
+            vector_db_engine=vector_db_engine,
+            query_text=query.query_text,
+            model=llm,
+            search_k=query.search_k,
+        )
+        try:
+            with REQUESTS_IN_PROGRESS.labels("/query/stream").track_inprogress():
+                async for event in events:
+                    if await request.is_disconnected():
+                        print("El cliente se desconecto. Se detiene la generacion.")
+                        break
+                    yield format_sse_event(event)
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@api_router.get("/metrics")
+def metrics():
+    """
+    Expone las métricas del backend en el formato de Prometheus: duración de cada etapa del
+    pipeline, documentos recuperados, tamaño del contexto, tokens del prompt y de la respuesta,
+    aciertos de los caches y consultas en curso.
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+def format_sse_event(event):
+    data = json.dumps(event["data"], ensure_ascii=False)
+    return f"event: {event['event']}\ndata: {data}\n\n"
@@ -2,8 +2,16 @@ import os
 from dotenv import load_dotenv
 from langchain_ollama import OllamaLLM
 from app.engines.chroma_engine import ChromaEngine
+from app.engines.hnsw_engine import HnswEngine
 from app.engines.mongo_engine import MongoEngine
+from app.engines.numpy_engine import NumpyEngine
+from app.utils.bm25_utils import BM25Index
+from app.utils.embedding_batch_utils import BatchingEmbeddings
+from app.utils.embedding_cache_utils import CachedQueryEmbeddings
+from app.utils.embedding_store_utils import EmbeddingStore, StoreBackedEmbeddings
 from app.utils.embedding_utils import get_jina_v2_embedding_function
+from app.utils.ingestion_utils import IngestionWriter
+from app.utils.metrics_utils import register_cache_stats
 
 load_dotenv(override=True)
 MONGODB_URI = os.getenv("MONGODB_URI")
@@ -11,6 +19,83 @@ MONGODB_NAME = os.getenv("MONGODB_NAME")
 MONGODB_COLLECTION_NAME = os.getenv("MONGODB_COLLECTION_NAME")
 DOCUMENTS_PATH = os.getenv("DOCUMENTS_PATH")
 CHROMA_PERSISTENT_DIRECTORY = os.getenv("CHROMA_PERSISTENT_DIRECTORY")
+NUMPY_PERSISTENT_DIRECTORY = os.getenv(
+    "NUMPY_PERSISTENT_DIRECTORY", "app/data/numpy_store"
+)
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(
+    os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "10000")
+)
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "10000"))
+MONGODB_SOCKET_TIMEOUT_MS = (
+    int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS"))
+    if os.getenv("MONGODB_SOCKET_TIMEOUT_MS")
+    else None
+)
+# Candidatos que evalúa $vectorSearch por consulta (Atlas recomienda entre 10 y 20 veces k).
+MONGODB_NUM_CANDIDATES = int(os.getenv("MONGODB_NUM_CANDIDATES", "100"))
+ENSURE_INDEXES_ON_STARTUP = (
+    os.getenv("ENSURE_INDEXES_ON_STARTUP", "false").lower() == "true"
+)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH")
+EMBEDDING_STORE_PATH = os.getenv("EMBEDDING_STORE_PATH", "app/data/embedding_store")
+# Micro-batching de los embeddings de queries concurrentes. Una ventana de 0 lo desactiva.
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+NUMPY_QUANTIZATION = os.getenv("NUMPY_QUANTIZATION") or None
+NUMPY_RESCORE_FACTOR = int(os.getenv("NUMPY_RESCORE_FACTOR", "4"))
+HNSW_PERSISTENT_DIRECTORY = os.getenv("HNSW_PERSISTENT_DIRECTORY", "app/data/hnsw_store")
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF = int(os.getenv("HNSW_EF", "64"))
+# Índice BM25 local para la búsqueda por keywords. Un valor vacío lo desactiva.
+KEYWORD_INDEX_PATH = os.getenv("KEYWORD_INDEX_PATH", "app/data/keyword_index")
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+INGESTION_EMBEDDING_BATCH_SIZE = int(os.getenv("INGESTION_EMBEDDING_BATCH_SIZE", "64"))
+INGESTION_EMBEDDING_WORKERS = int(os.getenv("INGESTION_EMBEDDING_WORKERS", "4"))
+INGESTION_WRITE_BATCH_SIZE = int(os.getenv("INGESTION_WRITE_BATCH_SIZE", "512"))
+INGESTION_MAX_PENDING_BATCHES = int(os.getenv("INGESTION_MAX_PENDING_BATCHES", "8"))
+INGESTION_CHECKPOINT_PATH = os.getenv(
+    "INGESTION_CHECKPOINT_PATH", "app/data/ingestion_checkpoint.json"
+)
+INGESTION_MANIFEST_PATH = os.getenv(
+    "INGESTION_MANIFEST_PATH", "app/data/ingestion_manifest.json"
+)
+
+# Los embeddings de los chunks se reutilizan desde el almacen local (llave: modelo + sha512)
+# y los embeddings de las queries se guardan en cache (memoria y, opcionalmente, disco). Las
+# queries que no están en cache y llegan al mismo tiempo se envían al modelo en un solo batch.
+base_embedding_model = get_jina_v2_embedding_function()
+if EMBEDDING_BATCH_WINDOW_MS > 0:
+    base_embedding_model = BatchingEmbeddings(
+        base_embedding_model,
+        window_ms=EMBEDDING_BATCH_WINDOW_MS,
+        max_batch_size=EMBEDDING_BATCH_MAX_SIZE,
+    )
+chunk_embedding_model = StoreBackedEmbeddings(
+    base_embedding_model, EmbeddingStore(EMBEDDING_STORE_PATH)
+)
+embedding_model = CachedQueryEmbeddings(
+    chunk_embedding_model,
+    maxsize=EMBEDDING_CACHE_SIZE,
+    persist_path=EMBEDDING_CACHE_PATH,
+)
+register_cache_stats("query_embedding", embedding_model.stats)
+register_cache_stats("chunk_embedding_store", chunk_embedding_model.stats)
+
+ingestion_writer = IngestionWriter(
+    embedding_batch_size=INGESTION_EMBEDDING_BATCH_SIZE,
+    embedding_workers=INGESTION_EMBEDDING_WORKERS,
+    write_batch_size=INGESTION_WRITE_BATCH_SIZE,
+    max_pending_batches=INGESTION_MAX_PENDING_BATCHES,
+)
+
+keyword_index = (
+    BM25Index(KEYWORD_INDEX_PATH, k1=BM25_K1, b=BM25_B) if KEYWORD_INDEX_PATH else None
+)
 
 vector_db_engine = MongoEngine(
     conn_string=MONGODB_URI,
@@ -18,15 +103,49 @@ vector_db_engine = MongoEngine(
     collection=MONGODB_COLLECTION_NAME,
     search_index="default",
     search_index_function="cosine",
-    embedding_model=get_jina_v2_embedding_function(),
+    embedding_model=embedding_model,
+    max_pool_size=MONGODB_MAX_POOL_SIZE,
+    min_pool_size=MONGODB_MIN_POOL_SIZE,
+    server_selection_timeout_ms=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+    connect_timeout_ms=MONGODB_CONNECT_TIMEOUT_MS,
+    socket_timeout_ms=MONGODB_SOCKET_TIMEOUT_MS,
+    ingestion_writer=ingestion_writer,
+    keyword_index=keyword_index,
+    num_candidates=MONGODB_NUM_CANDIDATES,
 )
 
 """
 vector_db_engine = ChromaEngine(
     persist_directory=os.path.abspath(CHROMA_PERSISTENT_DIRECTORY),
     collection_name="documents",
+    embedding_model=embedding_model,
+    ingestion_writer=ingestion_writer,
+    keyword_index=keyword_index,
 )
 print(os.path.abspath(CHROMA_PERSISTENT_DIRECTORY))
 """
 
+"""
+vector_db_engine = NumpyEngine(
+    persist_directory=os.path.abspath(NUMPY_PERSISTENT_DIRECTORY),
+    embedding_model=embedding_model,
+    ingestion_writer=ingestion_writer,
+    keyword_index=keyword_index,
+    quantization=NUMPY_QUANTIZATION,
+    rescore_factor=NUMPY_RESCORE_FACTOR,
+)
+"""
+
+"""
+vector_db_engine = HnswEngine(
+    persist_directory=os.path.abspath(HNSW_PERSISTENT_DIRECTORY),
+    embedding_model=embedding_model,
+    ingestion_writer=ingestion_writer,
+    keyword_index=keyword_index,
+    m=HNSW_M,
+    ef_construction=HNSW_EF_CONSTRUCTION,
+    ef=HNSW_EF,
+)
+"""
+
 llm = OllamaLLM(model="llama3.2")
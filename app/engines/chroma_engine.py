@@ -1,15 +1,22 @@
+import json
 import os
 import shutil
-from typing import List
+import threading
+import uuid
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 from chromadb import PersistentClient
+from chromadb.api.models.Collection import Collection
 from langchain.schema import Document
 from langchain_chroma import Chroma
 from app.engines.engine_interface import Engine
+from app.utils.data_version_utils import DataVersionFile
 from app.utils.embedding_utils import (
     check_all_documents_for_duplicate,
     get_jina_v2_embedding_function,
 )
 from langchain.embeddings.base import Embeddings
+from app.utils.bm25_utils import BM25Index
+from app.utils.ingestion_utils import IngestionWriter
 from app.utils.keyword_search_utils import preprocess_query_spacy, transform_to_document
 
 
@@ -19,63 +26,217 @@ class ChromaEngine(Engine):
         persist_directory: str,
         collection_name: str,
         embedding_model: Embeddings = get_jina_v2_embedding_function(),
+        ingestion_writer: Optional[IngestionWriter] = None,
+        keyword_index: Optional[BM25Index] = None,
     ):
         self.persist_directory = persist_directory
         self.collection_name = collection_name
         self.embedding_model = embedding_model
         self.chromadb_client = PersistentClient(path=self.persist_directory)
+        self.ingestion_writer = ingestion_writer or IngestionWriter()
+        self.keyword_index = keyword_index
+        self.catalog_path = os.path.join(self.persist_directory, "project_catalog.json")
+        self.data_version = DataVersionFile(
+            os.path.join(self.persist_directory, "data_version.json")
+        )
+        self._vector_store = None
+        self._collection = None
+        self._project_catalog = None
+        self._catalog_version = None
+        self._catalog_lock = threading.Lock()
 
     def init_vector_store(self) -> Chroma:
+        if self._vector_store is None:
+            self._vector_store = Chroma(
+                collection_name=self.collection_name,
+                embedding_function=self.embedding_model,
+                client=self.chromadb_client,
+            )
+        return self._vector_store
 
-        vector_store = Chroma(
-            collection_name=self.collection_name,
-            embedding_function=self.embedding_model,
-            client=self.chromadb_client,
-        )
-        return vector_store
+    def get_collection(self) -> Collection:
+        if self._collection is None:
+            self._collection = self.chromadb_client.get_or_create_collection(
+                name=self.collection_name, embedding_function=None
+            )
+        return self._collection
+
+    def find_existing_hashes(
+        self, hashes: List[str], batch_size: int = 500, page_size: int = 1000
+    ) -> Set[str]:
+        """
+        Obtiene cuáles de los hashes indicados ya existen en la colección, consultando por lotes
+        con un filtro `where` sobre `page_content_sha512` y leyendo solo la metadata, paginada.
+        """
+        collection = self.get_collection()
+        unique_hashes = list(dict.fromkeys(sha for sha in hashes if sha))
+        existing_hashes = set()
+        for i in range(0, len(unique_hashes), batch_size):
+            where = {"page_content_sha512": {"$in": unique_hashes[i : i + batch_size]}}
+            offset = 0
+            while True:
+                results = collection.get(
+                    where=where, include=["metadatas"], limit=page_size, offset=offset
+                )
+                for metadata in results["metadatas"]:
+                    existing_hashes.add(metadata.get("page_content_sha512"))
+                if len(results["ids"]) < page_size:
+                    break
+                offset += page_size
+        return existing_hashes
 
     def load_db(self, documents: List[Document]) -> List[str]:
-        vector_store = self.init_vector_store()
-        existing_documents = vector_store.get()
-        sha512_dicts = []
-        for metadata in existing_documents["metadatas"]:
-            sha = metadata.get("page_content_sha512")
-            if sha:
-                sha512_dicts.append({"page_content_sha512": sha})
+        existing_hashes = self.find_existing_hashes(
+            [document.metadata.get("page_content_sha512") for document in documents]
+        )
+        sha512_dicts = [{"page_content_sha512": sha} for sha in existing_hashes]
 
         final_documents = check_all_documents_for_duplicate(documents, sha512_dicts)
 
         print(
             f"Found {len(documents) - len(final_documents)} duplicates. Loading {len(final_documents)} documents."
         )
+        added_ids = []
         if len(final_documents) > 0:
-            added_ids = vector_store.add_documents(final_documents)
-            return added_ids
-        else:
-            return []
+            added_ids = self.ingestion_writer.write(
+                final_documents, self.embedding_model, self.add_embedded_documents
+            )
+            self.update_project_catalog(final_documents)
+        changed_projects = self.update_keyword_index(documents)
+        if len(final_documents) > 0:
+            changed_projects |= {
+                document.metadata.get("project_name") for document in final_documents
+            }
+        if changed_projects:
+            self.notify_change(changed_projects)
+        return added_ids
+
+    def add_embedded_documents(
+        self, documents: List[Document], embeddings: List[List[float]]
+    ) -> List[str]:
+        collection = self.get_collection()
+        ids = [str(uuid.uuid4()) for _ in documents]
+        # Chroma limita la cantidad de registros por llamada.
+        max_batch_size = self.chromadb_client.get_max_batch_size()
+        for i in range(0, len(documents), max_batch_size):
+            batch = documents[i : i + max_batch_size]
+            collection.upsert(
+                ids=ids[i : i + max_batch_size],
+                embeddings=embeddings[i : i + max_batch_size],
+                documents=[document.page_content for document in batch],
+                metadatas=[document.metadata for document in batch],
+            )
+        return ids
 
     def clear_db(self) -> None:
         self.chromadb_client.delete_collection(name=self.collection_name)
         if os.path.exists(self.persist_directory):
             shutil.rmtree(self.persist_directory)
+        self._vector_store = None
+        self._collection = None
+        with self._catalog_lock:
+            self._project_catalog = {}
+            self._catalog_version = None
+        self.clear_keyword_index()
         print("Cleared all documents from the ChromaDB collection.")
+        self.notify_change()
+
+    def iter_documents(self, batch_size: int = 1000) -> Iterator[List[Document]]:
+        collection = self.get_collection()
+        offset = 0
+        while True:
+            results = collection.get(
+                include=["documents", "metadatas"], limit=batch_size, offset=offset
+            )
+            if results["ids"]:
+                yield [
+                    Document(id=document_id, page_content=content, metadata=metadata)
+                    for document_id, content, metadata in zip(
+                        results["ids"], results["documents"], results["metadatas"]
+                    )
+                ]
+            if len(results["ids"]) < batch_size:
+                return
+            offset += batch_size
 
     def get_project_names(self) -> List[str]:
-        vector_store = self.init_vector_store()
-        existing_data = vector_store.get()
-        project_names = list(
-            {
-                metadata.get("project_name", "")
-                for metadata in existing_data["metadatas"]
-                if metadata.get("project_name", "")
-            }
-        )
+        return list(self.get_project_catalog())
+
+    def get_project_catalog(self) -> Dict[str, int]:
+        """
+        Obtiene la cantidad de chunks de cada proyecto.
+
+        El catálogo se mantiene de forma incremental en `load_db` y se guarda junto a la base de
+        datos. Solo si no existe (por ejemplo, en una base de datos creada antes del catálogo) se
+        construye una vez recorriendo la metadata de la colección por páginas.
 
-        return project_names
+        El archivo se vuelve a leer cuando cambia su fecha de modificación o su tamaño, por lo
+        que la API ve los proyectos agregados por un `--load` ejecutado en otro proceso.
+        """
+        with self._catalog_lock:
+            catalog_version = self._get_catalog_version()
+            if (
+                self._project_catalog is None
+                or catalog_version != self._catalog_version
+            ):
+                if catalog_version is not None:
+                    with open(self.catalog_path, "r", encoding="utf-8") as catalog_file:
+                        self._project_catalog = json.load(catalog_file)
+                    self._catalog_version = catalog_version
+                else:
+                    self._project_catalog = self._scan_project_catalog()
+                    self._save_project_catalog()
+            return dict(self._project_catalog)
+
+    def update_project_catalog(self, documents: List[Document]) -> None:
+        self.get_project_catalog()
+        with self._catalog_lock:
+            for document in documents:
+                project_name = document.metadata.get("project_name")
+                if project_name:
+                    self._project_catalog[project_name] = (
+                        self._project_catalog.get(project_name, 0) + 1
+                    )
+            self._save_project_catalog()
+
+    def _scan_project_catalog(self, page_size: int = 1000) -> Dict[str, int]:
+        collection = self.get_collection()
+        catalog = {}
+        offset = 0
+        while True:
+            results = collection.get(
+                include=["metadatas"], limit=page_size, offset=offset
+            )
+            for metadata in results["metadatas"]:
+                project_name = metadata.get("project_name")
+                if project_name:
+                    catalog[project_name] = catalog.get(project_name, 0) + 1
+            if len(results["ids"]) < page_size:
+                return catalog
+            offset += page_size
+
+    def _save_project_catalog(self) -> None:
+        os.makedirs(self.persist_directory, exist_ok=True)
+        temporary_path = f"{self.catalog_path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as catalog_file:
+            json.dump(self._project_catalog, catalog_file, ensure_ascii=False)
+        os.replace(temporary_path, self.catalog_path)
+        self._catalog_version = self._get_catalog_version()
+
+    def _get_catalog_version(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.catalog_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
 
     def keyword_search(
         self, project_name: str, query: str, top_k: int = 10
     ) -> List[Document]:
+        if self.keyword_index is not None and self.keyword_index.has_project(
+            project_name
+        ):
+            return self.keyword_index.search(project_name, query, top_k)
         print(f"Original query: {query}")
 
         keyword_query = preprocess_query_spacy(query)
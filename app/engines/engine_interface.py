@@ -1,7 +1,8 @@
+import asyncio
 from abc import ABC, abstractmethod
 from langchain_core.vectorstores import VectorStore
 from langchain.schema import Document
-from typing import List
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
 
 
 class Engine(ABC):
@@ -29,6 +30,23 @@ class Engine(ABC):
         """
         pass
 
+    @abstractmethod
+    def add_embedded_documents(
+        self, documents: List[Document], embeddings: List[List[float]]
+    ) -> List[str]:
+        """
+        Escribe un lote de documentos cuyos embeddings ya fueron calculados. Es utilizado por
+        `IngestionWriter` desde `load_db`.
+
+        Args:
+            documents (List[Document]): Los documentos a escribir.
+            embeddings (List[List[float]]): El embedding de cada documento, en el mismo orden.
+
+        Returns:
+            List[str]: La lista de IDs para los documentos agregados.
+        """
+        pass
+
     @abstractmethod
     def clear_db() -> None:
         """
@@ -58,6 +76,134 @@ class Engine(ABC):
         """
         pass
 
+    def add_change_listener(
+        self, listener: Callable[[Optional[Set[str]]], None]
+    ) -> None:
+        """
+        Registra una función que será llamada cada vez que cambien los datos del engine.
+
+        Args:
+            listener (Callable): Función que recibe los nombres de los proyectos modificados, o None si cambiaron todos.
+        """
+        if not hasattr(self, "_change_listeners"):
+            self._change_listeners = []
+        self._change_listeners.append(listener)
+
+    def notify_change(self, project_names: Optional[Set[str]] = None) -> None:
+        """
+        Registra el cambio en la versión persistida de los datos (`data_version`), si el engine
+        tiene una, y avisa a los listeners registrados que los datos del engine cambiaron.
+        Debe llamarse desde `load_db` y `clear_db`.
+
+        Args:
+            project_names (Set[str], opcional): Los proyectos modificados. None indica que cambiaron todos.
+        """
+        data_version = getattr(self, "data_version", None)
+        if data_version is not None:
+            data_version.bump(project_names)
+        for listener in getattr(self, "_change_listeners", []):
+            listener(project_names)
+
+    def get_data_version(self, project_name: str) -> Optional[Tuple]:
+        """
+        Obtiene la versión persistida de los datos de un proyecto. A diferencia de los listeners,
+        refleja también los cambios hechos por otros procesos (ej. `--load` o `--reset` del CLI).
+
+        Args:
+            project_name (str): El proyecto.
+
+        Returns:
+            Tuple: Un valor que cambia cada vez que cambian los datos del proyecto, o None si el engine no persiste su versión.
+        """
+        data_version = getattr(self, "data_version", None)
+        if data_version is None:
+            return None
+        return data_version.get(project_name)
+
+    def update_keyword_index(self, documents: List[Document]) -> Set[str]:
+        """
+        Agrega documentos al índice de keywords del engine (`keyword_index`), si tiene uno.
+        Debe llamarse desde `load_db` después de escribir los documentos nuevos, con todos los
+        documentos recibidos: el índice omite los que ya contiene, y así incorpora también los
+        que ya estaban en la base de datos pero no en el índice. Si la escritura falla no se
+        indexa nada, para que el índice no tenga chunks que la base de datos no tiene.
+
+        Args:
+            documents (List[Document]): Los documentos a indexar.
+
+        Returns:
+            Set[str]: Los proyectos cuyo índice cambió, para incluirlos en `notify_change`.
+        """
+        keyword_index = getattr(self, "keyword_index", None)
+        if keyword_index is None:
+            return set()
+        added = keyword_index.add_documents_by_project(documents)
+        print(f"Se agregaron {sum(added.values())} chunks al índice de keywords.")
+        return {project_name for project_name, count in added.items() if count}
+
+    def iter_documents(self, batch_size: int = 1000) -> Iterator[List[Document]]:
+        """
+        Recorre por lotes los documentos almacenados en el engine, sin sus embeddings.
+
+        Args:
+            batch_size (int): Cantidad de documentos por lote. Default: 1000.
+
+        Yields:
+            List[Document]: Un lote de documentos, con su contenido y metadata.
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} no permite recorrer sus documentos."
+        )
+
+    def rebuild_keyword_index(self, batch_size: int = 1000) -> int:
+        """
+        Vacía el índice de keywords del engine, si tiene uno, y lo vuelve a construir desde los
+        documentos almacenados (`iter_documents`), sin leer los PDFs ni calcular embeddings.
+        Al terminar avisa el cambio (`notify_change`) para descartar las respuestas en cache.
+
+        Args:
+            batch_size (int): Cantidad de documentos indexados por lote. Default: 1000.
+
+        Returns:
+            int: Cantidad de documentos indexados.
+        """
+        keyword_index = getattr(self, "keyword_index", None)
+        if keyword_index is None:
+            return 0
+        keyword_index.clear()
+        added = 0
+        for documents in self.iter_documents(batch_size):
+            added += keyword_index.add_documents(documents)
+        # Las búsquedas por keywords pueden cambiar en todos los proyectos.
+        self.notify_change()
+        return added
+
+    def clear_keyword_index(self) -> None:
+        """
+        Vacía el índice de keywords del engine, si tiene uno. Debe llamarse desde `clear_db`.
+        """
+        keyword_index = getattr(self, "keyword_index", None)
+        if keyword_index is not None:
+            keyword_index.clear()
+
+    def ensure_indexes(self, recreate_mismatched: bool = False) -> Dict[str, str]:
+        """
+        Crea y verifica los índices que requiere el engine para responder consultas.
+
+        Args:
+            recreate_mismatched (bool): Si es True, reemplaza los índices que existen con opciones distintas. Default: False.
+
+        Returns:
+            Dict[str, str]: El estado de cada índice. Vacío si el engine no requiere índices.
+        """
+        return {}
+
+    def close(self) -> None:
+        """
+        Libera los recursos asociados al engine, como clientes o conexiones abiertas.
+        """
+        pass
+
     @abstractmethod
     def vector_search(
         self,
@@ -73,3 +219,39 @@ class Engine(ABC):
         self, project_name: str, query: str, top_k: int = 10
     ) -> List[Document]:
         pass
+
+    async def aget_project_names(self) -> List[str]:
+        """
+        Versión asíncrona de `get_project_names`.
+
+        No es una implementación asíncrona nativa: la llamada síncrona se ejecuta en el pool de
+        hilos por defecto de asyncio (`asyncio.to_thread`) para no bloquear el event loop. Las
+        consultas concurrentes quedan acotadas por el tamaño de ese pool y cada una ocupa un
+        hilo mientras espera a la base de datos. Un engine con un cliente asíncrono puede
+        sobrescribir este método.
+        """
+        return await asyncio.to_thread(self.get_project_names)
+
+    async def avector_search(
+        self,
+        query: str,
+        project_name: str = None,
+        search_type: str = "similarity",
+        k: int = 4,
+    ) -> List[Document]:
+        """
+        Versión asíncrona de `vector_search`. Al igual que `aget_project_names`, se ejecuta en
+        el pool de hilos de asyncio (`asyncio.to_thread`); no es asíncrona de forma nativa.
+        """
+        return await asyncio.to_thread(
+            self.vector_search, query, project_name, search_type, k
+        )
+
+    async def akeyword_search(
+        self, project_name: str, query: str, top_k: int = 10
+    ) -> List[Document]:
+        """
+        Versión asíncrona de `keyword_search`. Al igual que `aget_project_names`, se ejecuta en
+        el pool de hilos de asyncio (`asyncio.to_thread`); no es asíncrona de forma nativa.
+        """
+        return await asyncio.to_thread(self.keyword_search, project_name, query, top_k)
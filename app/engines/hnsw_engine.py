@@ -0,0 +1,241 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+import hnswlib
+import numpy as np
+from langchain.embeddings.base import Embeddings
+from langchain.schema import Document
+from app.engines.numpy_engine import NumpyEngine
+from app.utils.bm25_utils import BM25Index
+from app.utils.chunk_store_utils import ChunkPartition
+from app.utils.embedding_utils import get_jina_v2_embedding_function
+from app.utils.ingestion_utils import IngestionWriter
+
+
+class ReadWriteLock:
+    """
+    Lock que permite varias lecturas simultáneas o una sola escritura. Las escrituras en espera
+    tienen prioridad sobre las lecturas nuevas, para que un flujo constante de consultas no las
+    posponga indefinidamente.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._condition:
+            while self._writing or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+class HnswPartitionIndex:
+    """
+    Índice HNSW sobre los embeddings de una partición de chunks. La etiqueta de cada elemento
+    es su fila en la partición.
+
+    El índice se guarda en `index.hnsw` dentro del directorio de la partición. Si al abrirlo
+    tiene menos elementos que la partición (por ejemplo, si una carga se interrumpió antes de
+    guardarlo), se agregan las filas faltantes.
+
+    hnswlib no admite agregar elementos ni redimensionar el índice mientras se consulta: las
+    consultas toman el lock en modo lectura y `sync`/`save` en modo escritura.
+    """
+
+    def __init__(
+        self, partition: ChunkPartition, m: int, ef_construction: int, ef: int
+    ):
+        self.partition = partition
+        self.path = os.path.join(partition.directory, "index.hnsw")
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef = ef
+        self.index = None
+        self.dirty = False
+        self._lock = ReadWriteLock()
+
+    def _open(self) -> None:
+        if self.index is not None or self.partition.dimension is None:
+            return
+        self.index = hnswlib.Index(space="cosine", dim=self.partition.dimension)
+        if os.path.exists(self.path):
+            self.index.load_index(self.path, max_elements=max(self.partition.rows, 1))
+        else:
+            self.index.init_index(
+                max_elements=max(self.partition.rows, 1),
+                ef_construction=self.ef_construction,
+                M=self.m,
+            )
+        self.index.set_ef(self.ef)
+
+    def sync(self) -> int:
+        """
+        Agrega al índice las filas de la partición que aún no están indexadas.
+
+        Returns:
+            int: Cantidad de filas agregadas.
+        """
+        vectors = self.partition.get_vectors()
+        end = 0 if vectors is None else len(vectors)
+        with self._lock.read():
+            if self.index is not None and end <= self.index.get_current_count():
+                return 0
+        with self._lock.write():
+            self._open()
+            if self.index is None:
+                return 0
+            start = self.index.get_current_count()
+            if end <= start:
+                return 0
+            if end > self.index.get_max_elements():
+                self.index.resize_index(
+                    max(end, 2 * self.index.get_max_elements())
+                )
+            self.index.add_items(vectors[start:end], list(range(start, end)))
+            self.dirty = True
+            return end - start
+
+    def save(self) -> None:
+        """
+        Guarda el índice en disco, si cambió desde la última vez que se guardó.
+        """
+        with self._lock.write():
+            if self.index is not None and self.dirty:
+                # Se reemplaza el archivo de forma atómica, ya que otro proceso puede estar
+                # abriéndolo.
+                temporary_path = f"{self.path}.tmp"
+                self.index.save_index(temporary_path)
+                os.replace(temporary_path, self.path)
+                self.dirty = False
+
+    def query(self, query_vector, k: int) -> List[Tuple[int, float]]:
+        """
+        Args:
+            query_vector: El embedding normalizado de la consulta.
+            k (int): Cantidad de resultados.
+
+        Returns:
+            List[Tuple[int, float]]: Pares (fila, similitud coseno), de mayor a menor similitud.
+        """
+        self.sync()
+        with self._lock.read():
+            k = min(k, self.index.get_current_count()) if self.index is not None else 0
+            if k <= 0:
+                return []
+            labels, distances = self.index.knn_query(query_vector, k=k)
+        return [
+            (int(row), 1.0 - float(distance))
+            for row, distance in zip(labels[0], distances[0])
+        ]
+
+
+class HnswEngine(NumpyEngine):
+    """
+    Engine local con búsqueda aproximada de vecinos más cercanos (HNSW, `chroma-hnswlib`).
+
+    Almacena los chunks igual que `NumpyEngine`, y además mantiene un índice HNSW persistente
+    por cada `project_name`. Así, una búsqueda filtrada por proyecto consulta directamente el
+    índice del proyecto y retorna exactamente `k` resultados, sin sobre-muestrear ni filtrar
+    después. Los índices se actualizan de forma incremental en `load_db`.
+
+    `M` y `ef_construction` controlan la calidad y el tamaño de los índices al construirlos y
+    `ef` el compromiso entre recall y latencia de cada consulta.
+    """
+
+    def __init__(
+        self,
+        persist_directory: str,
+        embedding_model: Embeddings = get_jina_v2_embedding_function(),
+        ingestion_writer: Optional[IngestionWriter] = None,
+        m: int = 16,
+        ef_construction: int = 200,
+        ef: int = 64,
+        keyword_index: Optional[BM25Index] = None,
+    ):
+        """
+        Args:
+            persist_directory (str): Directorio donde se guardan los chunks, sus embeddings y los índices.
+            embedding_model (Embeddings): El modelo de embeddings.
+            ingestion_writer (IngestionWriter, opcional): Escritor de documentos usado por `load_db`.
+            m (int): Cantidad de conexiones por nodo del grafo. Default: 16.
+            ef_construction (int): Tamaño de la lista de candidatos al construir el índice. Default: 200.
+            ef (int): Tamaño de la lista de candidatos al consultar (como mínimo `k`). Default: 64.
+            keyword_index (BM25Index, opcional): Índice BM25 local para `keyword_search`.
+        """
+        super().__init__(
+            persist_directory,
+            embedding_model,
+            ingestion_writer,
+            keyword_index=keyword_index,
+        )
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef = ef
+        self._indexes = {}
+        self._indexes_lock = threading.Lock()
+
+    def get_index(self, partition: ChunkPartition) -> HnswPartitionIndex:
+        with self._indexes_lock:
+            index = self._indexes.get(partition.directory)
+            if index is None:
+                index = HnswPartitionIndex(
+                    partition, self.m, self.ef_construction, self.ef
+                )
+                self._indexes[partition.directory] = index
+            return index
+
+    def load_db(self, documents: List[Document]) -> List[str]:
+        added_ids = super().load_db(documents)
+        if added_ids:
+            for partition in self.chunk_store.get_partitions():
+                self.get_index(partition).save()
+        return added_ids
+
+    def add_embedded_documents(
+        self, documents: List[Document], embeddings: List[List[float]]
+    ) -> List[str]:
+        ids = super().add_embedded_documents(documents, embeddings)
+        project_names = {document.metadata.get("project_name") for document in documents}
+        for project_name in project_names:
+            self.get_index(self.chunk_store.get_partition(project_name)).sync()
+        return ids
+
+    def clear_db(self) -> None:
+        with self._indexes_lock:
+            self._indexes = {}
+        super().clear_db()
+
+    def _search_partition(
+        self, partition: ChunkPartition, query_vector: np.ndarray, k: int
+    ) -> List[Tuple[ChunkPartition, int, float]]:
+        return [
+            (partition, row, score)
+            for row, score in self.get_index(partition).query(query_vector, k)
+        ]
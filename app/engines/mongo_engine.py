@@ -1,10 +1,16 @@
-from typing import List
-from pymongo import MongoClient
+import threading
+import uuid
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+from pymongo import ASCENDING, TEXT, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
 from pymongo.database import Database
 from pymongo.collection import Collection
 from langchain.schema.document import Document
 from langchain_mongodb.vectorstores import MongoDBAtlasVectorSearch
 from app.engines.engine_interface import Engine
+from app.utils.bm25_utils import BM25Index
+from app.utils.data_version_utils import GLOBAL_VERSION_KEY
+from app.utils.ingestion_utils import IngestionWriter
 from app.utils.embedding_utils import (
     check_all_documents_for_duplicate,
     get_jina_v2_embedding_function,
@@ -17,6 +23,75 @@ from app.utils.keyword_search_utils import (
 )
 
 
+# Indices requeridos por el engine, con sus opciones. El nombre corresponde al que MongoDB asigna por defecto.
+REQUIRED_INDEXES = {
+    "page_content_text": ([("page_content", TEXT)], {}),
+    "project_name_1": ([("project_name", ASCENDING)], {}),
+    # Unico para evitar chunks duplicados. Los documentos sin hash (ej. mensajes) quedan fuera del indice.
+    "page_content_sha512_1": (
+        [("page_content_sha512", ASCENDING)],
+        {
+            "unique": True,
+            "partialFilterExpression": {"page_content_sha512": {"$exists": True}},
+        },
+    ),
+}
+# Codigo de error de MongoDB para una llave duplicada en un indice unico.
+DUPLICATE_KEY_ERROR = 11000
+# Campo donde se guarda el embedding de cada chunk.
+EMBEDDING_KEY = "page_content_embedding_jina_v2"
+
+
+class MongoDataVersion:
+    """
+    Versión de los datos del engine guardada en una colección de MongoDB, compartida por todos
+    los procesos que usan la misma base de datos. Tiene la misma interfaz que `DataVersionFile`:
+    un token aleatorio global y uno por proyecto, reemplazados en cada cambio.
+    """
+
+    def __init__(self, get_collection: Callable[[], Collection]):
+        """
+        Args:
+            get_collection (Callable[[], Collection]): Función que retorna la colección de versiones.
+        """
+        self.get_collection = get_collection
+
+    def get(self, project_name: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Args:
+            project_name (str): El proyecto.
+
+        Returns:
+            Tuple[str, str]: La versión global y la del proyecto. None si aún no tienen versión.
+        """
+        versions = {
+            record["_id"]: record["version"]
+            for record in self.get_collection().find(
+                {"_id": {"$in": [GLOBAL_VERSION_KEY, project_name]}}
+            )
+        }
+        return versions.get(GLOBAL_VERSION_KEY), versions.get(project_name)
+
+    def bump(self, project_names: Optional[Set[str]] = None) -> None:
+        """
+        Registra un cambio en los datos.
+
+        Args:
+            project_names (Set[str], opcional): Los proyectos modificados. None indica que cambiaron todos.
+        """
+        keys = [GLOBAL_VERSION_KEY] if project_names is None else list(project_names)
+        if not keys:
+            return
+        self.get_collection().bulk_write(
+            [
+                UpdateOne(
+                    {"_id": key}, {"$set": {"version": uuid.uuid4().hex}}, upsert=True
+                )
+                for key in keys
+            ]
+        )
+
+
 class MongoEngine(Engine):
     def __init__(
         self,
@@ -26,6 +101,14 @@ class MongoEngine(Engine):
         search_index: str = "default",
         search_index_function: str = "cosine",
         embedding_model: Embeddings = get_jina_v2_embedding_function(),
+        max_pool_size: int = 100,
+        min_pool_size: int = 0,
+        server_selection_timeout_ms: int = 10000,
+        connect_timeout_ms: int = 10000,
+        socket_timeout_ms: Optional[int] = None,
+        ingestion_writer: Optional[IngestionWriter] = None,
+        keyword_index: Optional[BM25Index] = None,
+        num_candidates: int = 100,
     ):
         """
         Args:
@@ -35,6 +118,14 @@ class MongoEngine(Engine):
             search_index (str): Nombre del vector search index creado mediante la plataforma de Mongo Atlas Search. Default: "default".
             search_index_function (str): La función de búsqueda a utilizar (cosin, euclidean, dot product). Default: "cosine"
             embedding_model (Embeddings): El modelo de embeddings a utilizar.
+            max_pool_size (int): Cantidad máxima de conexiones del pool del cliente. Default: 100.
+            min_pool_size (int): Cantidad mínima de conexiones que se mantienen abiertas. Default: 0.
+            server_selection_timeout_ms (int): Tiempo máximo para encontrar un servidor disponible. Default: 10000.
+            connect_timeout_ms (int): Tiempo máximo para establecer una conexión. Default: 10000.
+            socket_timeout_ms (int, opcional): Tiempo máximo de espera de una operación. Default: None (sin límite).
+            ingestion_writer (IngestionWriter, opcional): Controla los lotes y la concurrencia de `load_db`. Default: IngestionWriter().
+            keyword_index (BM25Index, opcional): Índice BM25 local para `keyword_search`. Si no se indica, o el proyecto aún no está en el índice, se usa el índice de texto de MongoDB.
+            num_candidates (int): Candidatos que evalúa `$vectorSearch` antes de entregar los `k` mejores. Se usa al menos `k`. Default: 100.
         """
         self.conn_string = conn_string
         self.db_name = db_name
@@ -42,27 +133,72 @@ class MongoEngine(Engine):
         self.search_index = search_index
         self.search_index_function = search_index_function
         self.embedding_model = embedding_model
+        self.max_pool_size = max_pool_size
+        self.min_pool_size = min_pool_size
+        self.server_selection_timeout_ms = server_selection_timeout_ms
+        self.connect_timeout_ms = connect_timeout_ms
+        self.socket_timeout_ms = socket_timeout_ms
+        self.ingestion_writer = ingestion_writer or IngestionWriter()
+        self.keyword_index = keyword_index
+        self.num_candidates = num_candidates
+        self._client = None
+        self._vector_store = None
+        self._client_lock = threading.Lock()
+        self.data_version = MongoDataVersion(self.get_data_version_collection)
+
+    def get_client(self) -> MongoClient:
+        """
+        Obtiene el cliente MongoDB compartido por el engine.
+
+        El cliente se crea una sola vez, de forma perezosa, y mantiene su propio pool de conexiones
+        que es reutilizado por todas las operaciones del engine.
+
+        Returns:
+            MongoClient: El cliente MongoDB.
+        """
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = MongoClient(
+                        self.conn_string,
+                        maxPoolSize=self.max_pool_size,
+                        minPoolSize=self.min_pool_size,
+                        serverSelectionTimeoutMS=self.server_selection_timeout_ms,
+                        connectTimeoutMS=self.connect_timeout_ms,
+                        socketTimeoutMS=self.socket_timeout_ms,
+                    )
+        return self._client
 
     def init_vector_store(self) -> MongoDBAtlasVectorSearch:
         """
         Inicializa la vector store utilizando los campos de clase indicados.
 
+        La vector store se crea una sola vez sobre el cliente compartido y luego se reutiliza.
+
         Returns:
             MongoDBAtlasVectorSearch: La vector store inicializada.
         """
-        client = MongoClient(self.conn_string)
-        mongodb_collection = client[self.db_name][self.collection]
+        if self._vector_store is None:
+            self._vector_store = MongoDBAtlasVectorSearch(
+                collection=self.get_db_collection(),
+                embedding=self.embedding_model,
+                index_name=self.search_index,
+                relevance_score_fn=self.search_index_function,
+                text_key="page_content",
+                embedding_key=EMBEDDING_KEY,
+            )
 
-        vector_store = MongoDBAtlasVectorSearch(
-            collection=mongodb_collection,
-            embedding=self.embedding_model,
-            index_name=self.search_index,
-            relevance_score_fn=self.search_index_function,
-            text_key="page_content",
-            embedding_key="page_content_embedding_jina_v2",
-        )
+        return self._vector_store
 
-        return vector_store
+    def close(self) -> None:
+        """
+        Cierra el cliente MongoDB compartido y descarta la vector store asociada.
+        """
+        with self._client_lock:
+            if self._client is not None:
+                self._client.close()
+            self._client = None
+            self._vector_store = None
 
     def load_db(self, documents: List[Document]) -> List[str]:
         """
@@ -75,14 +211,95 @@ class MongoEngine(Engine):
         Returns:
             List[str]: La lista de IDs para los documentos agregados.
         """
-        db_documents = self.get_db_collection().find()
+        existing_hashes = self.find_existing_hashes(
+            [document.metadata.get("page_content_sha512") for document in documents]
+        )
+        db_documents = [
+            {"page_content_sha512": existing_hash} for existing_hash in existing_hashes
+        ]
         final_documents = check_all_documents_for_duplicate(documents, db_documents)
         print(
             f"Se encontraron {len(documents) - len(final_documents)} chunks repetidos. Se cargará un total de {len(final_documents)} chunks. "
         )
-        added_ids = self.init_vector_store().add_documents(documents=final_documents)
+        added_ids = self.ingestion_writer.write(
+            final_documents, self.embedding_model, self.add_embedded_documents
+        )
+        changed_projects = self.update_keyword_index(documents)
+        if added_ids:
+            changed_projects |= {
+                document.metadata.get("project_name") for document in final_documents
+            }
+        if changed_projects:
+            self.notify_change(changed_projects)
         return added_ids
 
+    def find_existing_hashes(
+        self, hashes: List[str], batch_size: int = 1000
+    ) -> Set[str]:
+        """
+        Obtiene cuáles de los hashes indicados ya existen en la colección.
+
+        La consulta se realiza por lotes con `$in` sobre el índice de `page_content_sha512`,
+        proyectando solo ese campo, por lo que no se transfieren los documentos completos.
+
+        Args:
+            hashes (List[str]): Los hashes SHA-512 de los chunks a verificar.
+            batch_size (int): Cantidad de hashes por consulta. Default: 1000.
+
+        Returns:
+            Set[str]: Los hashes que ya existen en la colección.
+        """
+        collection = self.get_db_collection()
+        unique_hashes = list(dict.fromkeys(sha for sha in hashes if sha))
+        existing_hashes = set()
+        for i in range(0, len(unique_hashes), batch_size):
+            results = collection.find(
+                {"page_content_sha512": {"$in": unique_hashes[i : i + batch_size]}},
+                {"page_content_sha512": 1, "_id": 0},
+            )
+            for result in results:
+                existing_hashes.add(result["page_content_sha512"])
+        return existing_hashes
+
+    def add_embedded_documents(
+        self, documents: List[Document], embeddings: List[List[float]]
+    ) -> List[str]:
+        """
+        Inserta un lote de documentos con sus embeddings ya calculados mediante un insert masivo
+        no ordenado. Los documentos se guardan con el mismo formato que utiliza la vector store.
+        Los documentos rechazados por el índice único de `page_content_sha512` se omiten.
+
+        Args:
+            documents (List[Document]): Los documentos a insertar.
+            embeddings (List[List[float]]): El embedding de cada documento, en el mismo orden.
+
+        Returns:
+            List[str]: La lista de IDs para los documentos insertados.
+        """
+        records = [
+            {
+                "page_content": document.page_content,
+                EMBEDDING_KEY: embedding,
+                **document.metadata,
+            }
+            for document, embedding in zip(documents, embeddings)
+        ]
+        try:
+            result = self.get_db_collection().insert_many(records, ordered=False)
+            return [str(inserted_id) for inserted_id in result.inserted_ids]
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+            if any(error["code"] != DUPLICATE_KEY_ERROR for error in write_errors):
+                raise
+            # insert_many asigna el _id de cada registro antes de enviarlo.
+            failed_indexes = {error["index"] for error in write_errors}
+            print(f"Se omitieron {len(failed_indexes)} chunks duplicados.")
+            return [
+                str(record["_id"])
+                for index, record in enumerate(records)
+                if index not in failed_indexes
+            ]
+
     def clear_db(self) -> None:
         """
         Elimina todos los documentos de una coleccion MongoDB asociada con la vector store.
@@ -90,6 +307,33 @@ class MongoEngine(Engine):
         collection = self.get_db_collection()
         deletions = collection.delete_many({}).deleted_count
         print(f"Se eliminaron {deletions} documentos.")
+        self.clear_keyword_index()
+        self.notify_change()
+
+    def iter_documents(self, batch_size: int = 1000) -> Iterator[List[Document]]:
+        """
+        Recorre por lotes los documentos de la colección, sin el campo del embedding.
+
+        Args:
+            batch_size (int): Cantidad de documentos por lote. Default: 1000.
+
+        Yields:
+            List[Document]: Un lote de documentos.
+        """
+        cursor = (
+            self.get_db_collection()
+            .find({}, {EMBEDDING_KEY: 0})
+            .batch_size(batch_size)
+        )
+        batch = []
+        for record in cursor:
+            record["_id"] = str(record["_id"])
+            batch.append(transform_to_document(record))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
 
     def get_db(self) -> Database:
         """
@@ -98,8 +342,7 @@ class MongoEngine(Engine):
         Returns:
             Database: La instancia de la base de datos MongoDB.
         """
-        client = MongoClient(self.conn_string)
-        db = client[self.db_name]
+        db = self.get_client()[self.db_name]
         return db
 
     def get_db_collection(self) -> Collection:
@@ -113,6 +356,73 @@ class MongoEngine(Engine):
         collection = db[self.collection]
         return collection
 
+    def get_data_version_collection(self) -> Collection:
+        """
+        Obtiene la colección donde se guarda la versión de los datos (`MongoDataVersion`).
+
+        Returns:
+            Collection: La colección `<collection>_data_version`.
+        """
+        return self.get_db()[f"{self.collection}_data_version"]
+
+    def ensure_indexes(self, recreate_mismatched: bool = False) -> Dict[str, str]:
+        """
+        Crea los índices que requiere el engine si no existen y verifica su estado.
+
+        Los índices son: el índice de texto sobre `page_content` (usado por `keyword_search`),
+        el índice sobre `project_name` y el índice único sobre `page_content_sha512`. Debe ejecutarse
+        antes de realizar consultas, ya que `keyword_search` asume que el índice de texto existe.
+
+        Un índice existente con otras opciones (ej. sin `unique`) solo se informa. Se reemplaza
+        únicamente con `recreate_mismatched`, y antes de eliminarlo se verifica que la colección
+        no tenga valores duplicados que impidan crear el índice único.
+
+        Args:
+            recreate_mismatched (bool): Si es True, reemplaza los índices que existen con opciones distintas. Default: False.
+
+        Returns:
+            Dict[str, str]: El estado de cada índice ("existente", "creado", "recreado", "con opciones distintas", "no encontrado" o el error producido).
+        """
+        collection = self.get_db_collection()
+        existing_indexes = collection.index_information()
+        status = {}
+        for index_name, (keys, options) in REQUIRED_INDEXES.items():
+            existing_index = existing_indexes.get(index_name)
+            if existing_index and _index_matches_options(existing_index, options):
+                status[index_name] = "existente"
+                continue
+            if existing_index and not recreate_mismatched:
+                status[index_name] = (
+                    "con opciones distintas (usar --recreate-indexes para reemplazarlo)"
+                )
+                continue
+            try:
+                if existing_index:
+                    duplicates = _count_duplicate_values(collection, keys, options)
+                    if duplicates:
+                        status[index_name] = (
+                            f"error: {duplicates} valores duplicados impiden crear el índice único; no se eliminó el índice existente"
+                        )
+                        continue
+                    collection.drop_index(index_name)
+                    status[index_name] = "recreado"
+                else:
+                    status[index_name] = "creado"
+                collection.create_index(keys, name=index_name, **options)
+            except OperationFailure as e:
+                status[index_name] = f"error: {e}"
+
+        existing_indexes = collection.index_information()
+        for index_name, (_, options) in REQUIRED_INDEXES.items():
+            existing_index = existing_indexes.get(index_name)
+            if not existing_index:
+                status[index_name] = "no encontrado"
+            elif not _index_matches_options(existing_index, options) and not status[
+                index_name
+            ].startswith(("con opciones distintas", "error")):
+                status[index_name] = "con opciones distintas"
+        return status
+
     def get_project_names(self) -> List[str]:
         """
         Obtiene una lista de los nombres de los proyectos desde la base de datos.
@@ -154,13 +464,16 @@ class MongoEngine(Engine):
     def keyword_search(
         self, project_name: str, query: str, top_k: int = 10
     ) -> list[Document]:
+        if self.keyword_index is not None and self.keyword_index.has_project(
+            project_name
+        ):
+            return self.keyword_index.search(project_name, query, top_k)
         print("La query a buscar es:" + query)
         keyword_query = preprocess_query_spacy(query)
         if project_name in keyword_query:
             keyword_query = keyword_query.replace(project_name, "").strip()
         print("Las keyboard a buscar son:" + keyword_query)
         collection = self.get_db_collection()
-        collection.create_index([("page_content", "text")])
 
         results = (
             collection.find(
@@ -168,16 +481,22 @@ class MongoEngine(Engine):
                     "$text": {"$search": keyword_query},
                     "project_name": project_name,
                 },
-                {"score": {"$meta": "textScore"}},
+                {"score": {"$meta": "textScore"}, EMBEDDING_KEY: 0},
             )
             .sort([("score", {"$meta": "textScore"})])
             .limit(top_k)
         )
 
         lg_documents = []
-        for result in results:
-            docu = transform_to_document(result)
-            lg_documents.append(docu)
+        try:
+            for result in results:
+                docu = transform_to_document(result)
+                lg_documents.append(docu)
+        except OperationFailure as e:
+            print(
+                f"Error durante la busqueda por keywords: {e}. Revisar que los indices existan (python -m app.utils.execute --ensure-indexes)."
+            )
+            return []
 
         return list(lg_documents)
 
@@ -189,31 +508,62 @@ class MongoEngine(Engine):
         k: int = 4,
     ) -> list[Document]:
         """
-        Realiza una búsqueda en la vector store y filtra los resultados por el campo 'project_name' si se proporciona.
+        Realiza una búsqueda vectorial con `$vectorSearch`, filtrando por el campo 'project_name' si se proporciona.
+
+        El filtro se aplica dentro de la búsqueda y se piden exactamente `k` resultados. Los
+        documentos se entregan sin su embedding y con la similitud en la metadata (`score`).
 
         Args:
             query (str): La consulta en lenguaje natural.
             project_name (str, opcional): El nombre del proyecto para filtrar los resultados. Si no se proporciona, no se filtra.
-            search_type (str, opcional): El tipo de búsqueda. Por defecto, es "similarity".
+            search_type (str, opcional): El tipo de búsqueda. Solo se soporta "similarity".
             k (int, opcional): El número de documentos a devolver. Por defecto, es 4.
 
         Returns:
             List[Document]: Una lista de documentos que cumplen con la consulta de búsqueda y el filtro de 'project_name'.
         """
-        retriever = self.init_vector_store().as_retriever(
-            search_type=search_type,
-            search_kwargs={
-                "k": k * 10,
-                "pre_filter": {"project_name": {"$eq": project_name}},
-                # "pre_filter": {"string": {"path": "project_name", "query": project_name}},
-                "post_filter_pipeline": [{"$limit": k}],
-            },
-        )
-        docs = retriever.invoke(query)
+        vector_search = {
+            "index": self.search_index,
+            "path": EMBEDDING_KEY,
+            "queryVector": self.embedding_model.embed_query(query),
+            "numCandidates": max(self.num_candidates, k),
+            "limit": k,
+        }
         if project_name:
-            filtered_docs = []
-            for doc in docs:
-                if doc.metadata.get("project_name") == project_name:
-                    filtered_docs.append(doc)
-            docs = filtered_docs
+            vector_search["filter"] = {"project_name": {"$eq": project_name}}
+        pipeline = [
+            {"$vectorSearch": vector_search},
+            {"$set": {"score": {"$meta": "vectorSearchScore"}}},
+            {"$project": {EMBEDDING_KEY: 0}},
+        ]
+
+        docs = []
+        for result in self.get_db_collection().aggregate(pipeline):
+            result["_id"] = str(result["_id"])
+            docs.append(transform_to_document(result))
         return docs
+
+
+def _index_matches_options(index_information: Dict, options: Dict) -> bool:
+    return all(index_information.get(key) == value for key, value in options.items())
+
+
+def _count_duplicate_values(collection: Collection, keys: List, options: Dict) -> int:
+    """
+    Cuenta los valores repetidos del campo de un índice único, para no eliminar un índice
+    que luego no se podría volver a crear.
+
+    Returns:
+        int: La cantidad de valores que aparecen en más de un documento. 0 si el índice no es único.
+    """
+    if not options.get("unique"):
+        return 0
+    field = keys[0][0]
+    pipeline = [
+        {"$match": options.get("partialFilterExpression", {})},
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$count": "duplicates"},
+    ]
+    result = list(collection.aggregate(pipeline))
+    return result[0]["duplicates"] if result else 0
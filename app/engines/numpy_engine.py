@@ -0,0 +1,231 @@
+import os
+import threading
+from collections import defaultdict
+from typing import Iterator, List, Optional, Tuple
+import numpy as np
+from langchain.embeddings.base import Embeddings
+from langchain.schema import Document
+from app.engines.engine_interface import Engine
+from app.utils.bm25_utils import BM25Index
+from app.utils.chunk_store_utils import (
+    ChunkPartition,
+    ChunkStore,
+    normalize_vectors,
+    top_k_indices,
+)
+from app.utils.data_version_utils import DataVersionFile
+from app.utils.embedding_utils import (
+    check_all_documents_for_duplicate,
+    get_jina_v2_embedding_function,
+)
+from app.utils.ingestion_utils import IngestionWriter
+from app.utils.keyword_search_utils import preprocess_query_spacy
+from app.utils.quantization_utils import QuantizedVectors, check_quantization
+
+
+class NumpyEngine(Engine):
+    """
+    Engine local que guarda los embeddings normalizados en matrices float32 leídas como memmap,
+    una por proyecto, y responde `vector_search` con una búsqueda exacta por similitud coseno.
+
+    No requiere servicios externos, inicia sin cargar los embeddings en memoria y los procesos
+    que abren el mismo directorio comparten las páginas de los archivos. Es adecuado para
+    corpus pequeños y medianos.
+
+    Opcionalmente, la búsqueda recorre una copia cuantizada (float16 o int8) de los embeddings
+    y re-puntúa de forma exacta los mejores candidatos con los vectores float32 en disco.
+    """
+
+    def __init__(
+        self,
+        persist_directory: str,
+        embedding_model: Embeddings = get_jina_v2_embedding_function(),
+        ingestion_writer: Optional[IngestionWriter] = None,
+        quantization: Optional[str] = None,
+        rescore_factor: int = 4,
+        keyword_index: Optional[BM25Index] = None,
+    ):
+        """
+        Args:
+            persist_directory (str): Directorio donde se guardan los chunks y sus embeddings.
+            embedding_model (Embeddings): El modelo de embeddings.
+            ingestion_writer (IngestionWriter, opcional): Escritor de documentos usado por `load_db`.
+            quantization (str, opcional): "float16" o "int8" para buscar sobre embeddings cuantizados. Por defecto se busca sobre float32.
+            rescore_factor (int): Con cuantización, candidatos por resultado que se re-puntúan de forma exacta. 0 desactiva el re-puntaje. Default: 4.
+            keyword_index (BM25Index, opcional): Índice BM25 local para `keyword_search`. Si no se indica, o el proyecto aún no está en el índice, se busca por similitud con las keywords de la query.
+        """
+        if quantization is not None:
+            check_quantization(quantization)
+        self.persist_directory = persist_directory
+        self.embedding_model = embedding_model
+        self.ingestion_writer = ingestion_writer or IngestionWriter()
+        self.keyword_index = keyword_index
+        self.chunk_store = ChunkStore(persist_directory)
+        self.data_version = DataVersionFile(
+            os.path.join(persist_directory, "data_version.json")
+        )
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self._quantized_vectors = {}
+        self._quantized_lock = threading.Lock()
+
+    def init_vector_store(self) -> ChunkStore:
+        """
+        Este engine no usa una vector store de LangChain: retorna el almacén de chunks.
+
+        Returns:
+            ChunkStore: El almacén de chunks del engine.
+        """
+        return self.chunk_store
+
+    def load_db(self, documents: List[Document]) -> List[str]:
+        existing_hashes = self.chunk_store.find_existing_hashes(
+            [document.metadata.get("page_content_sha512") for document in documents]
+        )
+        final_documents = check_all_documents_for_duplicate(
+            documents, [{"page_content_sha512": sha} for sha in existing_hashes]
+        )
+
+        print(
+            f"Found {len(documents) - len(final_documents)} duplicates. Loading {len(final_documents)} documents."
+        )
+        added_ids = []
+        if len(final_documents) > 0:
+            added_ids = self.ingestion_writer.write(
+                final_documents, self.embedding_model, self.add_embedded_documents
+            )
+        changed_projects = self.update_keyword_index(documents)
+        if len(final_documents) > 0:
+            changed_projects |= {
+                document.metadata.get("project_name") for document in final_documents
+            }
+        if changed_projects:
+            self.notify_change(changed_projects)
+        return added_ids
+
+    def add_embedded_documents(
+        self, documents: List[Document], embeddings: List[List[float]]
+    ) -> List[str]:
+        rows_by_project = defaultdict(list)
+        for row, document in enumerate(documents):
+            rows_by_project[document.metadata.get("project_name")].append(row)
+
+        vectors = normalize_vectors(embeddings)
+        ids = [None] * len(documents)
+        for project_name, rows in rows_by_project.items():
+            partition = self.chunk_store.get_or_create_partition(project_name)
+            partition_ids = partition.append(
+                [documents[row] for row in rows], vectors[rows]
+            )
+            for row, document_id in zip(rows, partition_ids):
+                ids[row] = document_id
+        return ids
+
+    def clear_db(self) -> None:
+        with self._quantized_lock:
+            self._quantized_vectors = {}
+        self.chunk_store.clear()
+        self.clear_keyword_index()
+        print("Cleared all documents from the NumPy store.")
+        self.notify_change()
+
+    def get_project_names(self) -> List[str]:
+        return self.chunk_store.get_project_names()
+
+    def iter_documents(self, batch_size: int = 1000) -> Iterator[List[Document]]:
+        for partition in self.chunk_store.get_partitions():
+            for start in range(0, partition.rows, batch_size):
+                yield partition.get_documents(
+                    range(start, min(start + batch_size, partition.rows))
+                )
+
+    def search_by_vector(
+        self, query_vector: List[float], project_name: str = None, k: int = 4
+    ) -> List[Tuple[Document, float]]:
+        """
+        Busca los `k` chunks más similares a un embedding. Sin cuantización, la búsqueda es exacta.
+
+        Args:
+            query_vector (List[float]): El embedding de la consulta.
+            project_name (str, opcional): Restringe la búsqueda a un proyecto. Si no se indica, se busca en todos.
+            k (int): Cantidad de resultados. Default: 4.
+
+        Returns:
+            List[Tuple[Document, float]]: Los documentos con su similitud coseno, de mayor a menor.
+        """
+        if project_name:
+            partition = self.chunk_store.get_partition(project_name)
+            partitions = [partition] if partition is not None else []
+        else:
+            partitions = self.chunk_store.get_partitions()
+
+        query_vector = normalize_vectors(query_vector)
+        candidates = []
+        for partition in partitions:
+            candidates.extend(self._search_partition(partition, query_vector, k))
+        candidates.sort(key=lambda candidate: candidate[2], reverse=True)
+
+        return [
+            (partition.get_documents([row])[0], score)
+            for partition, row, score in candidates[:k]
+        ]
+
+    def get_quantized_vectors(self, partition: ChunkPartition) -> QuantizedVectors:
+        with self._quantized_lock:
+            quantized_vectors = self._quantized_vectors.get(partition.directory)
+            if quantized_vectors is None:
+                quantized_vectors = QuantizedVectors(partition, self.quantization)
+                self._quantized_vectors[partition.directory] = quantized_vectors
+            return quantized_vectors
+
+    def _search_partition(
+        self, partition: ChunkPartition, query_vector: np.ndarray, k: int
+    ) -> List[Tuple[ChunkPartition, int, float]]:
+        if self.quantization is not None:
+            return [
+                (partition, row, score)
+                for row, score in self.get_quantized_vectors(partition).search(
+                    query_vector, k, self.rescore_factor
+                )
+            ]
+
+        vectors = partition.get_vectors()
+        if vectors is None:
+            return []
+        scores = vectors @ query_vector
+        return [
+            (partition, int(row), float(scores[row]))
+            for row in top_k_indices(scores, k)
+        ]
+
+    def keyword_search(
+        self, project_name: str, query: str, top_k: int = 10
+    ) -> List[Document]:
+        if self.keyword_index is not None and self.keyword_index.has_project(
+            project_name
+        ):
+            return self.keyword_index.search(project_name, query, top_k)
+        print(f"Original query: {query}")
+
+        keyword_query = preprocess_query_spacy(query)
+        print(f"Processed query: {keyword_query}")
+
+        results = self.vector_search(keyword_query, project_name, k=top_k)
+        if not results:
+            print("No matching documents found.")
+        return results
+
+    def vector_search(
+        self,
+        query: str,
+        project_name: str = None,
+        search_type: str = "similarity",
+        k: int = 4,
+    ) -> List[Document]:
+        print(f"Query: {query}")
+
+        query_vector = self.embedding_model.embed_query(query)
+        return [
+            document
+            for document, _ in self.search_by_vector(query_vector, project_name, k)
+        ]
@@ -1,5 +1,19 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.api.routes import api_router
+from app.config import ENSURE_INDEXES_ON_STARTUP, vector_db_engine
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if ENSURE_INDEXES_ON_STARTUP:
+        index_status = await asyncio.to_thread(vector_db_engine.ensure_indexes)
+        print(f"Estado de los indices: {index_status}")
+    yield
+    # Se cierran las conexiones del engine al apagar la aplicacion.
+    vector_db_engine.close()
+
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(api_router)
@@ -0,0 +1,341 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from app.engines.engine_interface import Engine
+from app.utils.cache_utils import LRUCache
+from app.utils.chunk_store_utils import normalize_vectors
+from app.utils.embedding_cache_utils import normalize_query_text
+from app.utils.metrics_utils import register_cache_stats
+
+load_dotenv(override=True)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+# Similitud coseno mínima para reutilizar la respuesta de otra query del mismo proyecto.
+# Un valor 0 desactiva el nivel semántico.
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(
+    os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95")
+)
+ANSWER_CACHE_SEMANTIC_SIZE = int(os.getenv("ANSWER_CACHE_SEMANTIC_SIZE", "256"))
+
+
+class SemanticAnswerCache:
+    """
+    Respuestas de un proyecto indexadas por el embedding de su query. Acotado en tamaño (LRU)
+    y con expiración por entrada.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        # (modelo, search_k, query normalizada) -> (expira, embedding normalizado, respuesta).
+        self._entries = OrderedDict()
+
+    def get(
+        self, query_vector: np.ndarray, threshold: float, model_name: str, search_k: int
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Args:
+            query_vector (np.ndarray): El embedding normalizado de la query.
+            threshold (float): La similitud coseno mínima.
+            model_name (str): El nombre del LLM.
+            search_k (int): La cantidad de documentos solicitada.
+
+        Returns:
+            Dict[str, Any]: La respuesta de la query almacenada más similar, o None si ninguna alcanza el umbral.
+        """
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items() if entry[0] <= now]:
+            del self._entries[key]
+        keys = [key for key in self._entries if key[:2] == (model_name, search_k)]
+        if not keys:
+            return None
+        vectors = np.stack([self._entries[key][1] for key in keys])
+        scores = vectors @ query_vector
+        best = int(np.argmax(scores))
+        if scores[best] < threshold:
+            return None
+        self._entries.move_to_end(keys[best])
+        return self._entries[keys[best]][2]
+
+    def put(
+        self, key: Tuple, query_vector: np.ndarray, response: Dict[str, Any]
+    ) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds
+        self._entries[key] = (expires_at, query_vector, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+class AnswerCache:
+    """
+    Cache en memoria de las respuestas del LLM, con dos niveles:
+
+    - Exacto: llave (proyecto, modelo, query normalizada, `search_k`).
+    - Semántico: dentro del mismo proyecto, modelo y `search_k`, reutiliza la respuesta de una
+      query cuyo embedding tenga similitud coseno mayor o igual a `similarity_threshold`.
+
+    Las entradas de un proyecto se eliminan cuando el engine avisa que sus datos cambiaron
+    (`load_db`/`clear_db`). Cada proyecto lleva una generación que aumenta en cada cambio, y
+    las respuestas calculadas con una generación anterior no se guardan. Como los cambios
+    hechos por otro proceso (ej. el CLI de ingesta) no llegan a los listeners, además se
+    compara la versión persistida del engine (`get_data_version`) antes de retornar una
+    respuesta.
+    """
+
+    def __init__(
+        self,
+        vector_db_engine: Engine,
+        maxsize: int = ANSWER_CACHE_SIZE,
+        ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+        similarity_threshold: float = ANSWER_CACHE_SIMILARITY_THRESHOLD,
+        semantic_maxsize: int = ANSWER_CACHE_SEMANTIC_SIZE,
+    ):
+        """
+        Args:
+            vector_db_engine (Engine): El engine cuyos cambios invalidan el cache.
+            maxsize (int): Cantidad máxima de respuestas en el nivel exacto. Default: ANSWER_CACHE_SIZE.
+            ttl_seconds (float): Segundos que dura cada respuesta. Default: ANSWER_CACHE_TTL_SECONDS.
+            similarity_threshold (float): Similitud coseno mínima del nivel semántico. 0 lo desactiva. Default: ANSWER_CACHE_SIMILARITY_THRESHOLD.
+            semantic_maxsize (int): Cantidad máxima de respuestas por proyecto en el nivel semántico. Default: ANSWER_CACHE_SEMANTIC_SIZE.
+        """
+        self.vector_db_engine = vector_db_engine
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.semantic_maxsize = semantic_maxsize
+        self.exact_cache = LRUCache(maxsize=maxsize, ttl_seconds=ttl_seconds)
+        self.semantic_hits = 0
+        self._semantic_caches: Dict[str, SemanticAnswerCache] = {}
+        self._generations: Dict[str, int] = {}
+        # Versión persistida de los datos con la que se calcularon las respuestas de cada proyecto.
+        self._data_versions: Dict[str, Optional[Tuple]] = {}
+        self._global_generation = 0
+        self._lock = threading.Lock()
+        vector_db_engine.add_change_listener(self.invalidate)
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.similarity_threshold > 0
+
+    def invalidate(self, project_names: Optional[Set[str]] = None) -> None:
+        """
+        Elimina las respuestas de los proyectos modificados.
+
+        Args:
+            project_names (Set[str], opcional): Los proyectos modificados. None elimina todas las respuestas.
+        """
+        with self._lock:
+            if project_names is None:
+                self._global_generation += 1
+                self._generations = {}
+                self._data_versions = {}
+                self._semantic_caches = {}
+                self.exact_cache.clear()
+                return
+            self._remove_projects(project_names)
+
+    def _remove_projects(self, project_names: Set[str]) -> None:
+        for project_name in project_names:
+            self._generations[project_name] = self._generations.get(project_name, 0) + 1
+            self._data_versions.pop(project_name, None)
+            self._semantic_caches.pop(project_name, None)
+        self.exact_cache.remove_if(lambda key: key[0] in project_names)
+
+    def _check_data_version(self, project_name: str) -> Optional[Tuple]:
+        """
+        Elimina las respuestas del proyecto si su versión persistida cambió desde que se
+        guardaron (ej. por un `--load` en otro proceso).
+
+        Returns:
+            Tuple: La versión persistida actual de los datos del proyecto.
+        """
+        data_version = self.vector_db_engine.get_data_version(project_name)
+        with self._lock:
+            if (
+                project_name in self._data_versions
+                and self._data_versions[project_name] != data_version
+            ):
+                self._remove_projects({project_name})
+        return data_version
+
+    def get_generation(self, project_name: str) -> Tuple:
+        """
+        Args:
+            project_name (str): El proyecto.
+
+        Returns:
+            Tuple: La generación actual de los datos del proyecto, para pasarla a `put`.
+        """
+        data_version = self._check_data_version(project_name)
+        with self._lock:
+            return (
+                self._global_generation,
+                self._generations.get(project_name, 0),
+                data_version,
+            )
+
+    def _exact_key(
+        self, project_name: str, model_name: str, query_text: str, search_k: int
+    ) -> Tuple:
+        return (project_name, model_name, normalize_query_text(query_text), search_k)
+
+    def get(
+        self,
+        project_name: str,
+        model_name: str,
+        query_text: str,
+        search_k: int,
+        query_vector: Optional[List[float]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Busca una respuesta en el nivel exacto y, si no está y se entrega el embedding de la
+        query, en el nivel semántico.
+
+        Args:
+            project_name (str): El proyecto de la query.
+            model_name (str): El nombre del LLM.
+            query_text (str): La query en lenguaje natural.
+            search_k (int): La cantidad de documentos solicitada.
+            query_vector (List[float], opcional): El embedding de la query.
+
+        Returns:
+            Dict[str, Any]: La respuesta almacenada, o None si no se encontró.
+        """
+        self._check_data_version(project_name)
+        response = self.exact_cache.get(
+            self._exact_key(project_name, model_name, query_text, search_k)
+        )
+        if response is not None or query_vector is None or not self.semantic_enabled:
+            return response
+
+        with self._lock:
+            semantic_cache = self._semantic_caches.get(project_name)
+            if semantic_cache is None:
+                return None
+            response = semantic_cache.get(
+                normalize_vectors(query_vector),
+                self.similarity_threshold,
+                model_name,
+                search_k,
+            )
+            if response is not None:
+                self.semantic_hits += 1
+            return response
+
+    def put(
+        self,
+        project_name: str,
+        model_name: str,
+        query_text: str,
+        search_k: int,
+        response: Dict[str, Any],
+        generation: Tuple,
+        query_vector: Optional[List[float]] = None,
+    ) -> None:
+        """
+        Guarda una respuesta, salvo que los datos del proyecto hayan cambiado desde `generation`.
+
+        Args:
+            project_name (str): El proyecto de la query.
+            model_name (str): El nombre del LLM.
+            query_text (str): La query en lenguaje natural.
+            search_k (int): La cantidad de documentos solicitada.
+            response (Dict[str, Any]): La respuesta a guardar.
+            generation (Tuple): La generación obtenida con `get_generation` antes de recuperar los documentos.
+            query_vector (List[float], opcional): El embedding de la query, para el nivel semántico.
+        """
+        exact_key = self._exact_key(project_name, model_name, query_text, search_k)
+        with self._lock:
+            current_generation = (
+                self._global_generation,
+                self._generations.get(project_name, 0),
+            )
+            data_version = generation[2]
+            if current_generation != generation[:2] or self._data_versions.get(
+                project_name, data_version
+            ) != data_version:
+                return
+            self._data_versions[project_name] = data_version
+            self.exact_cache.put(exact_key, response)
+            if query_vector is None or not self.semantic_enabled:
+                return
+            semantic_cache = self._semantic_caches.get(project_name)
+            if semantic_cache is None:
+                semantic_cache = SemanticAnswerCache(
+                    self.semantic_maxsize, self.ttl_seconds
+                )
+                self._semantic_caches[project_name] = semantic_cache
+            semantic_cache.put(
+                (model_name, search_k, exact_key[2]),
+                normalize_vectors(query_vector),
+                response,
+            )
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: Aciertos exactos, aciertos semánticos, fallos y tamaño del nivel exacto.
+        """
+        exact_stats = self.exact_cache.stats()
+        return {
+            "exact_hits": exact_stats["hits"],
+            "semantic_hits": self.semantic_hits,
+            "misses": exact_stats["misses"] - self.semantic_hits,
+            "size": exact_stats["size"],
+        }
+
+
+# Un cache por engine, con llave `id(engine)`. El cache mantiene una referencia al engine y
+# queda registrado en `/metrics`, por lo que ambos viven mientras viva el proceso.
+_answer_caches: Dict[int, AnswerCache] = {}
+_answer_caches_lock = threading.Lock()
+
+
+def get_answer_cache(vector_db_engine: Engine) -> Optional[AnswerCache]:
+    """
+    Obtiene el cache de respuestas asociado a un engine, creándolo si no existe.
+
+    Args:
+        vector_db_engine (Engine): El engine del cache.
+
+    Returns:
+        AnswerCache: El cache de respuestas compartido para ese engine, o None si `ANSWER_CACHE_ENABLED` es false.
+    """
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    with _answer_caches_lock:
+        answer_cache = _answer_caches.get(id(vector_db_engine))
+        if answer_cache is None:
+            answer_cache = AnswerCache(vector_db_engine)
+            _answer_caches[id(vector_db_engine)] = answer_cache
+            register_answer_cache_stats(answer_cache)
+        return answer_cache
+
+
+def register_answer_cache_stats(answer_cache: AnswerCache) -> None:
+    """
+    Expone en `/metrics` los aciertos y fallos de cada nivel del cache de respuestas. Las
+    consultas que fallan en el nivel exacto son las que llegan al nivel semántico.
+
+    Args:
+        answer_cache (AnswerCache): El cache de respuestas.
+    """
+
+    def exact_stats() -> Dict[str, int]:
+        stats = answer_cache.stats()
+        return {
+            "hits": stats["exact_hits"],
+            "misses": stats["semantic_hits"] + stats["misses"],
+        }
+
+    def semantic_stats() -> Dict[str, int]:
+        stats = answer_cache.stats()
+        return {"hits": stats["semantic_hits"], "misses": stats["misses"]}
+
+    register_cache_stats("answer_exact", exact_stats)
+    register_cache_stats("answer_semantic", semantic_stats)
@@ -0,0 +1,192 @@
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from langchain.schema.document import Document
+from app.engines.engine_interface import Engine
+from app.utils.embedding_utils import (
+    hash_documents,
+    iter_pdf_documents,
+    list_pdf_files_subdirectories,
+    split_documents,
+)
+from app.utils.ingestion_utils import (
+    IngestionCheckpoint,
+    IngestionManifest,
+    iter_in_background,
+)
+from app.utils.token_utils import count_documents_tokens
+
+
+def plan_ingestion(
+    documents_path: str, manifest_path: Optional[str] = None
+) -> Dict[str, List[str]]:
+    """
+    Determina qué archivos fuente de `documents_path` deben cargarse, comparándolos con el
+    manifiesto de la última carga. No extrae el texto de ningún archivo.
+
+    Args:
+        documents_path (str): Ruta del directorio principal con un subdirectorio por proyecto.
+        manifest_path (str, opcional): Ruta al manifiesto. Si no se indica, todos los archivos se consideran nuevos.
+
+    Returns:
+        Dict[str, List[str]]: Las rutas agrupadas en "added", "changed", "unchanged" y "removed".
+    """
+    manifest = IngestionManifest(manifest_path) if manifest_path else None
+    return diff_source_files(list_pdf_files_subdirectories(documents_path), manifest)
+
+
+def diff_source_files(
+    pdf_files: List[Tuple[str, str]], manifest: Optional[IngestionManifest]
+) -> Dict[str, List[str]]:
+    file_paths = [file_path for _, file_path in pdf_files]
+    if manifest is None:
+        return {"added": file_paths, "changed": [], "unchanged": [], "removed": []}
+    return manifest.diff(file_paths)
+
+
+def run_ingestion_pipeline(
+    vector_db_engine: Engine,
+    documents_path: str,
+    checkpoint_path: str,
+    manifest_path: Optional[str] = None,
+    chunk_size: int = 512,
+    chunk_overlap: int = 64,
+    flush_size: int = 2048,
+    queue_size: int = 8,
+    max_workers: Optional[int] = None,
+) -> Dict[str, float]:
+    """
+    Carga los PDFs de `documents_path` en la base de datos como un pipeline de generadores:
+    carga -> split -> hash -> (deduplicación -> embeddings -> escritura, dentro de `load_db`).
+
+    Cada etapa avanza en su propio hilo y se comunica con la siguiente mediante una cola
+    acotada, por lo que la memoria utilizada no depende del tamaño del corpus. Los chunks se
+    entregan a `load_db` en grupos de al menos `flush_size` chunks y, al terminar cada grupo,
+    sus archivos fuente se registran en el checkpoint. Si la carga se interrumpe, la siguiente
+    ejecución omite los archivos ya registrados. El checkpoint se elimina al terminar.
+
+    Si se indica un manifiesto, solo se procesan los archivos nuevos o modificados desde la
+    última carga, y el manifiesto se actualiza junto con el checkpoint. Los chunks de archivos
+    modificados o eliminados que ya estaban en la base de datos no se eliminan.
+
+    Args:
+        vector_db_engine (Engine): El engine donde se cargan los documentos.
+        documents_path (str): Ruta del directorio principal con un subdirectorio por proyecto.
+        checkpoint_path (str): Ruta al archivo JSON del checkpoint.
+        manifest_path (str, opcional): Ruta al manifiesto de archivos cargados. Si no se indica, se procesan todos los archivos.
+        chunk_size (int): El tamaño máximo de cada chunk. Default: 512.
+        chunk_overlap (int): La cantidad de overlap entre los chunks. Default: 64.
+        flush_size (int): Cantidad mínima de chunks por llamada a `load_db`. Default: 2048.
+        queue_size (int): Cantidad máxima de archivos esperando en cada cola del pipeline. Default: 8.
+        max_workers (int, opcional): Cantidad de procesos que extraen el texto de los PDFs. Por defecto, la cantidad de CPUs.
+
+    Returns:
+        Dict[str, float]: Resumen de la carga: archivos procesados, sin cambios, eliminados y omitidos por el checkpoint, chunks, chunks agregados y tiempos de embeddings y escritura.
+    """
+    checkpoint = IngestionCheckpoint(checkpoint_path)
+    manifest = IngestionManifest(manifest_path) if manifest_path else None
+    pdf_files = list_pdf_files_subdirectories(documents_path)
+    changes = diff_source_files(pdf_files, manifest)
+    files_to_load = set(changes["added"]) | set(changes["changed"])
+
+    pending_files = [
+        (subdir, file_path)
+        for subdir, file_path in pdf_files
+        if file_path in files_to_load and not checkpoint.is_completed(file_path)
+    ]
+    if len(pending_files) < len(files_to_load):
+        print(
+            f"Reanudando carga desde el checkpoint: se omiten {len(files_to_load) - len(pending_files)} archivos ya cargados."
+        )
+
+    summary = {
+        "files": 0,
+        "unchanged_files": len(changes["unchanged"]),
+        "removed_files": len(changes["removed"]),
+        "skipped_files": len(files_to_load) - len(pending_files),
+        "chunks": 0,
+        "added": 0,
+        "embedding_seconds": 0.0,
+        "write_seconds": 0.0,
+    }
+
+    loaded_files = iter_in_background(
+        iter_pdf_documents(pending_files, max_workers, max_in_flight=queue_size),
+        queue_size,
+    )
+    chunked_files = iter_in_background(
+        split_and_hash_files(loaded_files, chunk_size, chunk_overlap), queue_size
+    )
+
+    for file_paths, chunks in group_files_by_chunks(chunked_files, flush_size):
+        start_time = time.perf_counter()
+        vector_db_engine.ingestion_writer.reset()
+        added_ids = vector_db_engine.load_db(chunks) if chunks else []
+        checkpoint.mark_completed(file_paths)
+        if manifest is not None:
+            manifest.record(file_paths)
+            manifest.save()
+
+        writer_summary = vector_db_engine.ingestion_writer.summary()
+        summary["files"] += len(file_paths)
+        summary["chunks"] += len(chunks)
+        summary["added"] += len(added_ids)
+        summary["embedding_seconds"] += writer_summary["embedding_seconds"]
+        summary["write_seconds"] += writer_summary["write_seconds"]
+        print(
+            f"Archivos completados: {summary['files']}/{len(pending_files)}. "
+            f"Se agregaron {len(added_ids)} de {len(chunks)} chunks en {time.perf_counter() - start_time:.2f} segundos."
+        )
+
+    if manifest is not None:
+        manifest.forget(changes["removed"])
+        manifest.save()
+    checkpoint.clear()
+    return summary
+
+
+def split_and_hash_files(
+    loaded_files: Iterable[Tuple[str, List[Document]]],
+    chunk_size: int,
+    chunk_overlap: int,
+) -> Iterator[Tuple[str, List[Document]]]:
+    """
+    Divide en chunks las páginas de cada archivo y agrega el hash y la cantidad de tokens de
+    cada chunk.
+
+    Args:
+        loaded_files (Iterable[Tuple[str, List[Document]]]): Pares (ruta del archivo, páginas).
+        chunk_size (int): El tamaño máximo de cada chunk.
+        chunk_overlap (int): La cantidad de overlap entre los chunks.
+
+    Yields:
+        Tuple[str, List[Document]]: Pares (ruta del archivo, chunks con hash y tokens).
+    """
+    for file_path, documents in loaded_files:
+        chunks = split_documents(documents, chunk_size, chunk_overlap)
+        yield file_path, count_documents_tokens(hash_documents(chunks))
+
+
+def group_files_by_chunks(
+    chunked_files: Iterable[Tuple[str, List[Document]]], flush_size: int
+) -> Iterator[Tuple[List[str], List[Document]]]:
+    """
+    Agrupa archivos consecutivos hasta juntar al menos `flush_size` chunks.
+
+    Args:
+        chunked_files (Iterable[Tuple[str, List[Document]]]): Pares (ruta del archivo, chunks).
+        flush_size (int): Cantidad mínima de chunks por grupo (el último grupo puede tener menos).
+
+    Yields:
+        Tuple[List[str], List[Document]]: Las rutas de los archivos del grupo y todos sus chunks.
+    """
+    file_paths = []
+    chunks = []
+    for file_path, file_chunks in chunked_files:
+        file_paths.append(file_path)
+        chunks.extend(file_chunks)
+        if len(chunks) >= flush_size:
+            yield file_paths, chunks
+            file_paths = []
+            chunks = []
+    if file_paths:
+        yield file_paths, chunks
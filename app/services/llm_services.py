@@ -1,7 +1,41 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
 from langchain.prompts import ChatPromptTemplate
+from langchain.schema import Document
 from langchain_ollama import OllamaLLM
 from app.engines.engine_interface import Engine
 from langchain_core.language_models import BaseLLM
+from app.services.answer_cache_services import AnswerCache, get_answer_cache
+from app.services.vector_db_services import get_project_registry
+from app.utils.fusion_utils import reciprocal_rank_fusion
+from app.utils.metrics_utils import (
+    atime_stage,
+    get_engine_label,
+    observe_context,
+    observe_documents,
+    observe_generation,
+    observe_stage,
+    time_stage,
+)
+from app.utils.token_utils import CONTEXT_SEPARATOR, count_tokens, pack_documents
+
+load_dotenv(override=True)
+# Fusión de los resultados de la búsqueda vectorial y por keywords (reciprocal rank fusion).
+RRF_K = int(os.getenv("RRF_K", "60"))
+RRF_VECTOR_WEIGHT = float(os.getenv("RRF_VECTOR_WEIGHT", "1.0"))
+RRF_KEYWORD_WEIGHT = float(os.getenv("RRF_KEYWORD_WEIGHT", "1.0"))
+# Cantidad de chunks que se entregan al LLM. 0 usa el `search_k` de la consulta.
+RRF_TOP_N = int(os.getenv("RRF_TOP_N", "0"))
+KEYWORD_SEARCH_K = int(os.getenv("KEYWORD_SEARCH_K", "5"))
+# Presupuesto de tokens del contexto por modelo, por ejemplo '{"llama3.2": 6000}'. Los
+# modelos sin presupuesto propio usan CONTEXT_TOKEN_BUDGET. El default deja espacio para las
+# instrucciones y la respuesta dentro de la ventana de 2048 tokens que Ollama usa por defecto.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_TOKEN_BUDGETS = json.loads(os.getenv("CONTEXT_TOKEN_BUDGETS", "{}"))
 
 PROMPT_TEMPLATE = ChatPromptTemplate(
     [
@@ -29,39 +63,74 @@ PROMPT_TEMPLATE = ChatPromptTemplate(
 )
 
 
+NO_PROJECT_RESPONSE = "No se encontro el nombre del proyecto en la query"
+
+
 def query_llm(
     vector_db_engine: Engine,
     query_text: str,
     model: BaseLLM = OllamaLLM(model="llama3.2"),
     search_k: int = 4,
 ):
-
+    engine_label = get_engine_label(vector_db_engine)
     query_text = query_text.lower()
-    project_name = ""
-    project_names = vector_db_engine.get_project_names()
-    print(project_names)
-    for project in project_names:
-        if project in query_text:
-            project_name = project
-            print(f"Se encontro el nombre del proyecto en la query: {project_name}")
-    if not project_name:
+    start_time = time.perf_counter()
+    project_name = get_project_registry(vector_db_engine).find_project(query_text)
+    observe_stage(
+        "project_detection",
+        engine_label,
+        project_name,
+        time.perf_counter() - start_time,
+    )
+    if project_name:
+        print(f"Se encontro el nombre del proyecto en la query: {project_name}")
+    else:
         full_response = {
-            "model_response": "No se encontro el nombre del proyecto en la query",
+            "model_response": NO_PROJECT_RESPONSE,
             "sources": None,
+            "context_tokens": 0,
         }
         return full_response
 
-    vector_docs = vector_db_engine.vector_search(
-        query=query_text,
-        search_type="similarity",
-        k=search_k,
-        project_name=project_name,
+    answer_cache = get_answer_cache(vector_db_engine)
+    if answer_cache is not None:
+        with time_stage("answer_cache", engine_label, project_name):
+            generation = answer_cache.get_generation(project_name)
+            query_vector = get_query_vector(vector_db_engine, answer_cache, query_text)
+            cached_response = answer_cache.get(
+                project_name, get_model_name(model), query_text, search_k, query_vector
+            )
+        if cached_response is not None:
+            print("Se reutilizo una respuesta del cache.")
+            return cached_response
+
+    with time_stage("vector_search", engine_label, project_name):
+        vector_docs = vector_db_engine.vector_search(
+            query=query_text,
+            search_type="similarity",
+            k=search_k,
+            project_name=project_name,
+        )
+    observe_documents("vector", engine_label, project_name, len(vector_docs))
+    with time_stage("keyword_search", engine_label, project_name):
+        keyword_docs = vector_db_engine.keyword_search(
+            project_name, query_text, KEYWORD_SEARCH_K
+        )
+    observe_documents("keyword", engine_label, project_name, len(keyword_docs))
+    with time_stage("prompt_building", engine_label, project_name):
+        docs = fuse_documents(vector_docs, keyword_docs, search_k)
+        docs, context_tokens = pack_context(docs, model)
+        prompt = generate_prompt(docs, query_text)
+    observe_context(engine_label, project_name, len(docs), context_tokens)
+    with time_stage("llm_generation", engine_label, project_name):
+        response_text = model.invoke(prompt)
+    observe_generation(
+        engine_label,
+        project_name,
+        get_model_name(model),
+        count_tokens(prompt),
+        count_tokens(response_text),
     )
-    keyword_docs = vector_db_engine.keyword_search(project_name, query_text, 5)
-    docs = vector_docs + keyword_docs
-    context_text = generate_context_text(docs)
-    prompt = PROMPT_TEMPLATE.format(context=context_text, question=query_text)
-    response_text = model.invoke(prompt)
     sources = generate_sources(docs)
 
     # sources_string = generate_sources_string(sources)  # Para debugging
@@ -69,11 +138,397 @@ def query_llm(
     full_response = {
         "model_response": response_text,
         "sources": sources,
+        "context_tokens": context_tokens,
+    }
+    if answer_cache is not None:
+        answer_cache.put(
+            project_name,
+            get_model_name(model),
+            query_text,
+            search_k,
+            full_response,
+            generation,
+            query_vector,
+        )
+
+    return full_response
+
+
+async def aquery_llm(
+    vector_db_engine: Engine,
+    query_text: str,
+    model: BaseLLM = OllamaLLM(model="llama3.2"),
+    search_k: int = 4,
+):
+    """
+    Versión asíncrona de `query_llm`.
+
+    La búsqueda vectorial y la búsqueda por keywords se ejecutan de forma concurrente, por lo que
+    el tiempo de recuperación es aproximadamente el de la más lenta de ambas. Ambas búsquedas
+    corren en el pool de hilos de asyncio (ver `Engine.avector_search`): la concurrencia es la
+    de ese pool y no la de un driver asíncrono. La generación se
+    realiza con `ainvoke`, sin ocupar un hilo mientras el LLM responde. Las respuestas se
+    reutilizan desde el cache de respuestas (`get_answer_cache`) cuando es posible.
+
+    Args:
+        vector_db_engine (Engine): El engine de la base de datos vectorial.
+        query_text (str): La query en lenguaje natural.
+        model (BaseLLM): El LLM que genera la respuesta.
+        search_k (int): La cantidad de documentos a obtener mediante búsqueda vectorial. Default: 4.
+
+    Returns:
+        dict: La respuesta del modelo (`model_response`), las fuentes utilizadas (`sources`) y los tokens del contexto (`context_tokens`).
+    """
+    engine_label = get_engine_label(vector_db_engine)
+    query_text = query_text.lower()
+    start_time = time.perf_counter()
+    project_name = await get_project_registry(vector_db_engine).afind_project(
+        query_text
+    )
+    observe_stage(
+        "project_detection",
+        engine_label,
+        project_name,
+        time.perf_counter() - start_time,
+    )
+    if not project_name:
+        full_response = {
+            "model_response": NO_PROJECT_RESPONSE,
+            "sources": None,
+            "context_tokens": 0,
+        }
+        return full_response
+    print(f"Se encontro el nombre del proyecto en la query: {project_name}")
+
+    answer_cache = get_answer_cache(vector_db_engine)
+    if answer_cache is not None:
+        with time_stage("answer_cache", engine_label, project_name):
+            generation = answer_cache.get_generation(project_name)
+            query_vector = await aget_query_vector(
+                vector_db_engine, answer_cache, query_text
+            )
+            cached_response = answer_cache.get(
+                project_name, get_model_name(model), query_text, search_k, query_vector
+            )
+        if cached_response is not None:
+            print("Se reutilizo una respuesta del cache.")
+            return cached_response
+
+    docs = await aretrieve_documents(
+        vector_db_engine, query_text, search_k, project_name
+    )
+    with time_stage("prompt_building", engine_label, project_name):
+        docs, context_tokens = pack_context(docs, model)
+        prompt = generate_prompt(docs, query_text)
+    observe_context(engine_label, project_name, len(docs), context_tokens)
+    with time_stage("llm_generation", engine_label, project_name):
+        response_text = await model.ainvoke(prompt)
+    observe_generation(
+        engine_label,
+        project_name,
+        get_model_name(model),
+        count_tokens(prompt),
+        count_tokens(response_text),
+    )
+    sources = generate_sources(docs)
+
+    full_response = {
+        "model_response": response_text,
+        "sources": sources,
+        "context_tokens": context_tokens,
     }
+    if answer_cache is not None:
+        answer_cache.put(
+            project_name,
+            get_model_name(model),
+            query_text,
+            search_k,
+            full_response,
+            generation,
+            query_vector,
+        )
 
     return full_response
 
 
+async def astream_query_llm(
+    vector_db_engine: Engine,
+    query_text: str,
+    model: BaseLLM = OllamaLLM(model="llama3.2"),
+    search_k: int = 4,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Versión de `aquery_llm` que entrega la respuesta como una secuencia de eventos.
+
+    Primero se entrega un evento `sources` con las fuentes recuperadas, luego un evento `token`
+    por cada fragmento generado por el LLM y finalmente un evento `done` con los tokens del
+    contexto (`context_tokens`). Si el generador se cierra antes de terminar (por ejemplo,
+    porque el cliente se desconectó), se cierra también el stream del LLM y la generación se
+    detiene. Si la respuesta está en el cache de respuestas, se entrega en un único evento
+    `token`, y solo las respuestas completas se guardan en el cache.
+
+    Las etapas `llm_first_token` y `llm_generation` miden el tiempo hasta el primer fragmento
+    y el tiempo total de espera del LLM, sin contar el tiempo que el cliente tarda en leer.
+
+    Args:
+        vector_db_engine (Engine): El engine de la base de datos vectorial.
+        query_text (str): La query en lenguaje natural.
+        model (BaseLLM): El LLM que genera la respuesta.
+        search_k (int): La cantidad de documentos a obtener mediante búsqueda vectorial. Default: 4.
+
+    Yields:
+        Dict[str, Any]: Eventos con las llaves `event` y `data`.
+    """
+    engine_label = get_engine_label(vector_db_engine)
+    query_text = query_text.lower()
+    start_time = time.perf_counter()
+    project_name = await get_project_registry(vector_db_engine).afind_project(
+        query_text
+    )
+    observe_stage(
+        "project_detection",
+        engine_label,
+        project_name,
+        time.perf_counter() - start_time,
+    )
+    if not project_name:
+        yield {"event": "sources", "data": None}
+        yield {"event": "token", "data": NO_PROJECT_RESPONSE}
+        yield {"event": "done", "data": {"context_tokens": 0}}
+        return
+    print(f"Se encontro el nombre del proyecto en la query: {project_name}")
+
+    answer_cache = get_answer_cache(vector_db_engine)
+    if answer_cache is not None:
+        with time_stage("answer_cache", engine_label, project_name):
+            generation = answer_cache.get_generation(project_name)
+            query_vector = await aget_query_vector(
+                vector_db_engine, answer_cache, query_text
+            )
+            cached_response = answer_cache.get(
+                project_name, get_model_name(model), query_text, search_k, query_vector
+            )
+        if cached_response is not None:
+            print("Se reutilizo una respuesta del cache.")
+            yield {"event": "sources", "data": cached_response["sources"]}
+            yield {"event": "token", "data": cached_response["model_response"]}
+            yield {
+                "event": "done",
+                "data": {"context_tokens": cached_response["context_tokens"]},
+            }
+            return
+
+    docs = await aretrieve_documents(
+        vector_db_engine, query_text, search_k, project_name
+    )
+    with time_stage("prompt_building", engine_label, project_name):
+        docs, context_tokens = pack_context(docs, model)
+        prompt = generate_prompt(docs, query_text)
+    observe_context(engine_label, project_name, len(docs), context_tokens)
+    sources = generate_sources(docs)
+    yield {"event": "sources", "data": sources}
+
+    tokens = []
+    # Solo se mide la espera de cada fragmento del LLM: el tiempo que el cliente tarda en
+    # recibir cada evento no es parte de la generación.
+    generation_seconds = 0.0
+    token_stream = model.astream(prompt)
+    try:
+        while True:
+            start_time = time.perf_counter()
+            try:
+                token = await token_stream.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                generation_seconds += time.perf_counter() - start_time
+            if not tokens:
+                observe_stage(
+                    "llm_first_token", engine_label, project_name, generation_seconds
+                )
+            tokens.append(token)
+            yield {"event": "token", "data": token}
+    finally:
+        await token_stream.aclose()
+        observe_stage("llm_generation", engine_label, project_name, generation_seconds)
+        observe_generation(
+            engine_label,
+            project_name,
+            get_model_name(model),
+            count_tokens(prompt),
+            count_tokens("".join(tokens)),
+        )
+
+    if answer_cache is not None:
+        answer_cache.put(
+            project_name,
+            get_model_name(model),
+            query_text,
+            search_k,
+            {
+                "model_response": "".join(tokens),
+                "sources": sources,
+                "context_tokens": context_tokens,
+            },
+            generation,
+            query_vector,
+        )
+    yield {"event": "done", "data": {"context_tokens": context_tokens}}
+
+
+async def aretrieve_documents(
+    vector_db_engine: Engine, query_text: str, search_k: int, project_name: str
+) -> List[Document]:
+    """
+    Obtiene los documentos relevantes de un proyecto, ejecutando la búsqueda vectorial y la
+    búsqueda por keywords de forma concurrente en el pool de hilos de asyncio. La duración de cada búsqueda y la cantidad de
+    documentos obtenidos se registran en las métricas.
+
+    Args:
+        vector_db_engine (Engine): El engine de la base de datos vectorial.
+        query_text (str): La query en lenguaje natural, en minúsculas.
+        search_k (int): La cantidad de documentos a obtener mediante búsqueda vectorial.
+        project_name (str): El proyecto detectado en la query.
+
+    Returns:
+        List[Document]: Los documentos recuperados, combinados con `fuse_documents`.
+    """
+    engine_label = get_engine_label(vector_db_engine)
+    vector_docs, keyword_docs = await asyncio.gather(
+        atime_stage(
+            vector_db_engine.avector_search(
+                query=query_text,
+                search_type="similarity",
+                k=search_k,
+                project_name=project_name,
+            ),
+            "vector_search",
+            engine_label,
+            project_name,
+        ),
+        atime_stage(
+            vector_db_engine.akeyword_search(
+                project_name, query_text, KEYWORD_SEARCH_K
+            ),
+            "keyword_search",
+            engine_label,
+            project_name,
+        ),
+    )
+    observe_documents("vector", engine_label, project_name, len(vector_docs))
+    observe_documents("keyword", engine_label, project_name, len(keyword_docs))
+    return fuse_documents(vector_docs, keyword_docs, search_k)
+
+
+def get_model_name(model: BaseLLM) -> str:
+    """
+    Args:
+        model (BaseLLM): El LLM.
+
+    Returns:
+        str: El nombre del modelo, o el nombre de su clase si no lo expone.
+    """
+    return getattr(model, "model", None) or type(model).__name__
+
+
+def get_query_vector(
+    vector_db_engine: Engine, answer_cache: AnswerCache, query_text: str
+) -> Optional[List[float]]:
+    """
+    Obtiene el embedding de la query para el nivel semántico del cache de respuestas. Con
+    `CachedQueryEmbeddings`, la búsqueda vectorial reutiliza este mismo embedding.
+
+    Args:
+        vector_db_engine (Engine): El engine de la base de datos vectorial.
+        answer_cache (AnswerCache): El cache de respuestas.
+        query_text (str): La query en lenguaje natural, en minúsculas.
+
+    Returns:
+        List[float]: El embedding de la query, o None si el nivel semántico está desactivado o el engine no tiene modelo de embeddings.
+    """
+    embedding_model = getattr(vector_db_engine, "embedding_model", None)
+    if embedding_model is None or not answer_cache.semantic_enabled:
+        return None
+    return embedding_model.embed_query(query_text)
+
+
+async def aget_query_vector(
+    vector_db_engine: Engine, answer_cache: AnswerCache, query_text: str
+) -> Optional[List[float]]:
+    """
+    Versión asíncrona de `get_query_vector`.
+    """
+    embedding_model = getattr(vector_db_engine, "embedding_model", None)
+    if embedding_model is None or not answer_cache.semantic_enabled:
+        return None
+    return await embedding_model.aembed_query(query_text)
+
+
+def fuse_documents(
+    vector_docs: List[Document], keyword_docs: List[Document], search_k: int
+) -> List[Document]:
+    """
+    Combina los resultados de la búsqueda vectorial y por keywords con reciprocal rank fusion,
+    eliminando los chunks repetidos, y retorna los `RRF_TOP_N` mejores (o `search_k`, si no
+    está configurado).
+
+    Args:
+        vector_docs (List[Document]): Los documentos de la búsqueda vectorial, de mayor a menor relevancia.
+        keyword_docs (List[Document]): Los documentos de la búsqueda por keywords, de mayor a menor relevancia.
+        search_k (int): La cantidad de documentos solicitada en la consulta.
+
+    Returns:
+        List[Document]: Los documentos que se entregan como contexto al LLM.
+    """
+    return reciprocal_rank_fusion(
+        [vector_docs, keyword_docs],
+        weights=[RRF_VECTOR_WEIGHT, RRF_KEYWORD_WEIGHT],
+        k=RRF_K,
+        top_n=RRF_TOP_N or search_k,
+    )
+
+
+def get_context_token_budget(model: BaseLLM) -> int:
+    """
+    Obtiene el presupuesto de tokens del contexto para un modelo, desde `CONTEXT_TOKEN_BUDGETS`
+    o, si el modelo no tiene uno propio, `CONTEXT_TOKEN_BUDGET`.
+
+    Args:
+        model (BaseLLM): El LLM que genera la respuesta.
+
+    Returns:
+        int: La cantidad máxima de tokens del contexto.
+    """
+    model_name = getattr(model, "model", None)
+    return int(CONTEXT_TOKEN_BUDGETS.get(model_name, CONTEXT_TOKEN_BUDGET))
+
+
+def pack_context(docs: List[Document], model: BaseLLM) -> Tuple[List[Document], int]:
+    """
+    Selecciona, en orden de relevancia, los documentos que caben en el presupuesto de tokens
+    del modelo.
+
+    Args:
+        docs (List[Document]): Los documentos recuperados, de mayor a menor relevancia.
+        model (BaseLLM): El LLM que genera la respuesta.
+
+    Returns:
+        Tuple[List[Document], int]: Los documentos seleccionados y los tokens que ocupan en el contexto.
+    """
+    packed_docs, context_tokens = pack_documents(docs, get_context_token_budget(model))
+    if len(packed_docs) < len(docs):
+        print(
+            f"Se omitieron {len(docs) - len(packed_docs)} chunks por el presupuesto de tokens del contexto."
+        )
+    return packed_docs, context_tokens
+
+
+def generate_prompt(docs, query_text):
+    context_text = generate_context_text(docs)
+    prompt = PROMPT_TEMPLATE.format(context=context_text, question=query_text)
+    return prompt
+
+
 def generate_sources(docs):
     sources = []
     for doc in docs:
@@ -113,5 +568,5 @@ def generate_context_text(docs):
     for doc in docs:
         page_contents.append(doc.page_content)
 
-    context_text = "\n\n".join(page_contents)
+    context_text = CONTEXT_SEPARATOR.join(page_contents)
     return context_text
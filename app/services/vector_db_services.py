@@ -0,0 +1,154 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set
+from dotenv import load_dotenv
+from app.engines.engine_interface import Engine
+from app.utils.aho_corasick_utils import AhoCorasickMatcher
+
+load_dotenv(override=True)
+PROJECT_REGISTRY_TTL_SECONDS = float(os.getenv("PROJECT_REGISTRY_TTL_SECONDS", "300"))
+# Segundos mínimos entre refrescos provocados por una query sin proyecto reconocido.
+PROJECT_REGISTRY_MISS_REFRESH_SECONDS = float(
+    os.getenv("PROJECT_REGISTRY_MISS_REFRESH_SECONDS", "10")
+)
+
+
+class ProjectRegistry:
+    """
+    Registro en memoria de los nombres de proyectos de un engine.
+
+    Los nombres se obtienen desde la base de datos solo cuando el registro expira (TTL) o cuando
+    el engine avisa que sus datos cambiaron (`load_db`/`clear_db`). La detección del proyecto en
+    una query se realiza con un autómata Aho-Corasick construido en cada refresco.
+
+    Como las cargas suelen ejecutarse en otro proceso (`--load`), cuyo aviso no llega a la API,
+    una query sin proyecto reconocido también refresca el registro, a lo más una vez cada
+    `miss_refresh_seconds`.
+    """
+
+    def __init__(
+        self,
+        vector_db_engine: Engine,
+        ttl_seconds: float = PROJECT_REGISTRY_TTL_SECONDS,
+        miss_refresh_seconds: float = PROJECT_REGISTRY_MISS_REFRESH_SECONDS,
+    ):
+        """
+        Args:
+            vector_db_engine (Engine): El engine desde donde se obtienen los nombres de los proyectos.
+            ttl_seconds (float): Tiempo en segundos antes de volver a consultar la base de datos. Default: PROJECT_REGISTRY_TTL_SECONDS.
+            miss_refresh_seconds (float): Tiempo mínimo en segundos entre refrescos provocados por una query sin proyecto reconocido. Default: PROJECT_REGISTRY_MISS_REFRESH_SECONDS.
+        """
+        self.vector_db_engine = vector_db_engine
+        self.ttl_seconds = ttl_seconds
+        self.miss_refresh_seconds = miss_refresh_seconds
+        self._matcher = None
+        self._expires_at = 0.0
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+        vector_db_engine.add_change_listener(self.invalidate)
+
+    def invalidate(self, project_names: Optional[Set[str]] = None) -> None:
+        """
+        Marca el registro como expirado para que se refresque en la próxima consulta.
+
+        Args:
+            project_names (Set[str], opcional): Los proyectos modificados. Se ignora, siempre se refresca el registro completo.
+        """
+        self._expires_at = 0.0
+
+    def is_stale(self) -> bool:
+        """
+        Returns:
+            bool: True si el registro debe refrescarse desde la base de datos.
+        """
+        return self._matcher is None or time.monotonic() >= self._expires_at
+
+    def refresh(self) -> None:
+        """
+        Obtiene los nombres de los proyectos desde el engine y reconstruye el autómata de búsqueda.
+        """
+        project_names = self.vector_db_engine.get_project_names()
+        self._matcher = AhoCorasickMatcher(project_names)
+        self._refreshed_at = time.monotonic()
+        self._expires_at = self._refreshed_at + self.ttl_seconds
+
+    def _get_matcher(self) -> AhoCorasickMatcher:
+        if self.is_stale():
+            with self._lock:
+                if self.is_stale():
+                    self.refresh()
+        return self._matcher
+
+    def _should_refresh_on_miss(self) -> bool:
+        return time.monotonic() - self._refreshed_at >= self.miss_refresh_seconds
+
+    def _refresh_on_miss(self) -> AhoCorasickMatcher:
+        with self._lock:
+            if self._should_refresh_on_miss():
+                self.refresh()
+        return self._matcher
+
+    def get_project_names(self) -> List[str]:
+        """
+        Returns:
+            List[str]: Los nombres de los proyectos registrados.
+        """
+        return list(self._get_matcher().patterns)
+
+    def find_project(self, query_text: str) -> str:
+        """
+        Busca el nombre de un proyecto dentro de la query.
+
+        Si más de un proyecto aparece en la query, se retorna el nombre más largo
+        (y ante empate, el que aparece primero). Si no aparece ninguno, se refresca el registro
+        (ver `miss_refresh_seconds`) y se busca nuevamente.
+
+        Args:
+            query_text (str): La query en lenguaje natural.
+
+        Returns:
+            str: El nombre del proyecto encontrado o un string vacío si no se encuentra.
+        """
+        project_name = self._get_matcher().longest_match(query_text)
+        if not project_name and self._should_refresh_on_miss():
+            project_name = self._refresh_on_miss().longest_match(query_text)
+        return project_name or ""
+
+    async def afind_project(self, query_text: str) -> str:
+        """
+        Versión asíncrona de `find_project`. Si el registro debe refrescarse, la consulta a la
+        base de datos se ejecuta en un hilo aparte para no bloquear el event loop.
+        """
+        if self.is_stale():
+            await asyncio.to_thread(self._get_matcher)
+        project_name = self._matcher.longest_match(query_text)
+        if not project_name and self._should_refresh_on_miss():
+            matcher = await asyncio.to_thread(self._refresh_on_miss)
+            project_name = matcher.longest_match(query_text)
+        return project_name or ""
+
+
+# Un registro por engine, con llave `id(engine)`. El registro mantiene una referencia al engine,
+# por lo que ambos viven mientras viva el proceso y el id no se reutiliza.
+_project_registries: Dict[int, ProjectRegistry] = {}
+_project_registries_lock = threading.Lock()
+
+
+def get_project_registry(vector_db_engine: Engine) -> ProjectRegistry:
+    """
+    Obtiene el registro de proyectos asociado a un engine, creándolo si no existe.
+
+    Args:
+        vector_db_engine (Engine): El engine del registro.
+
+    Returns:
+        ProjectRegistry: El registro de proyectos compartido para ese engine.
+    """
+    with _project_registries_lock:
+        registry = _project_registries.get(id(vector_db_engine))
+        if registry is None:
+            registry = ProjectRegistry(vector_db_engine)
+            _project_registries[id(vector_db_engine)] = registry
+        return registry
@@ -0,0 +1,90 @@
+from collections import deque
+from typing import Iterable, List, Optional, Tuple
+
+
+class AhoCorasickMatcher:
+    """
+    Buscador de múltiples patrones en una sola pasada sobre el texto (algoritmo Aho-Corasick).
+
+    El autómata se construye una vez a partir de los patrones y luego cada búsqueda
+    recorre el texto una sola vez, sin importar la cantidad de patrones.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        """
+        Args:
+            patterns (Iterable[str]): Los patrones a buscar. Se ignoran los patrones vacíos y repetidos.
+        """
+        self.patterns = [pattern for pattern in dict.fromkeys(patterns) if pattern]
+        # Cada estado tiene sus transiciones, su estado de falla y los patrones que terminan en él.
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._build()
+
+    def _build(self) -> None:
+        for pattern_index, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(pattern_index)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail_state = self._fail[state]
+                while fail_state and char not in self._goto[fail_state]:
+                    fail_state = self._fail[fail_state]
+                self._fail[next_state] = self._goto[fail_state].get(char, 0)
+                self._output[next_state] = (
+                    self._output[next_state] + self._output[self._fail[next_state]]
+                )
+
+    def find_all(self, text: str) -> List[Tuple[int, str]]:
+        """
+        Encuentra todas las apariciones de los patrones en el texto.
+
+        Args:
+            text (str): El texto donde buscar.
+
+        Returns:
+            List[Tuple[int, str]]: Pares (posición de inicio, patrón) de cada aparición, en orden de término.
+        """
+        matches = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for pattern_index in self._output[state]:
+                pattern = self.patterns[pattern_index]
+                matches.append((position - len(pattern) + 1, pattern))
+        return matches
+
+    def longest_match(self, text: str) -> Optional[str]:
+        """
+        Obtiene el patrón más largo que aparece en el texto. Ante empate, el que aparece primero.
+
+        Args:
+            text (str): El texto donde buscar.
+
+        Returns:
+            Optional[str]: El patrón encontrado o None si ninguno aparece en el texto.
+        """
+        best_match = None
+        best_key = None
+        for start, pattern in self.find_all(text):
+            key = (-len(pattern), start)
+            if best_key is None or key < best_key:
+                best_match = pattern
+                best_key = key
+        return best_match
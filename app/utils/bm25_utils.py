@@ -0,0 +1,494 @@
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from filelock import FileLock
+from langchain.schema import Document
+from app.utils.chunk_store_utils import DocumentTable, top_k_indices
+from app.utils.keyword_search_utils import tokenize_text
+
+# Las frecuencias se guardan como uint16.
+MAX_TERM_FREQUENCY = np.iinfo(np.uint16).max
+
+
+def write_postings(
+    path: str,
+    vocabulary: List[str],
+    term_ids: np.ndarray,
+    doc_ids: np.ndarray,
+    term_frequencies: np.ndarray,
+    doc_lengths: np.ndarray,
+    first_doc: int,
+) -> None:
+    """
+    Ordena las postings por (término, documento) y las guarda de forma atómica en un `.npz`.
+
+    Args:
+        path (str): Ruta del archivo.
+        vocabulary (List[str]): El vocabulario ordenado.
+        term_ids (np.ndarray): El término (índice en `vocabulary`) de cada posting.
+        doc_ids (np.ndarray): El documento de cada posting.
+        term_frequencies (np.ndarray): La frecuencia de cada posting.
+        doc_lengths (np.ndarray): El largo en tokens de cada documento del segmento.
+        first_doc (int): El primer documento del segmento.
+    """
+    order = np.lexsort((doc_ids, term_ids))
+    term_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    term_offsets[1:] = np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)))
+    temporary_path = f"{path}.tmp.npz"
+    np.savez(
+        temporary_path,
+        terms=np.frombuffer("\n".join(vocabulary).encode("utf-8"), dtype=np.uint8),
+        term_offsets=term_offsets,
+        doc_ids=doc_ids[order].astype(np.uint32),
+        term_frequencies=term_frequencies[order].astype(np.uint16),
+        doc_lengths=doc_lengths.astype(np.uint32),
+        first_doc=np.int64(first_doc),
+    )
+    os.replace(temporary_path, path)
+
+
+class BM25Segment:
+    """
+    Postings inmutables de un rango contiguo de documentos de una partición: el vocabulario
+    ordenado (en un solo bloque UTF-8), el offset de las postings de cada término, el documento
+    y la frecuencia de cada posting, y el largo en tokens de cada documento del rango.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        with np.load(path) as postings:
+            terms = bytes(postings["terms"]).decode("utf-8").split("\n")
+            self.terms = terms if terms != [""] else []
+            self.term_offsets = postings["term_offsets"]
+            self.doc_ids = postings["doc_ids"]
+            self.term_frequencies = postings["term_frequencies"]
+            self.doc_lengths = postings["doc_lengths"]
+            # Los índices creados antes de los segmentos tienen un único archivo desde el documento 0.
+            self.first_doc = (
+                int(postings["first_doc"]) if "first_doc" in postings.files else 0
+            )
+        self.term_index = {term: i for i, term in enumerate(self.terms)}
+
+    @property
+    def documents(self) -> int:
+        return len(self.doc_lengths)
+
+    def get_postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Los documentos y las frecuencias del término, o None si no aparece en el segmento.
+        """
+        term_id = self.term_index.get(term)
+        if term_id is None:
+            return None
+        start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+        return self.doc_ids[start:end], self.term_frequencies[start:end]
+
+    def get_term_ids(self, vocabulary_index: Dict[str, int]) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: El término de cada posting, como índice en otro vocabulario.
+        """
+        return np.repeat(
+            np.array([vocabulary_index[term] for term in self.terms], dtype=np.int64),
+            np.diff(self.term_offsets),
+        )
+
+
+class BM25Partition:
+    """
+    Índice invertido BM25 de los chunks de un único proyecto.
+
+    Cada `add_documents` escribe un segmento nuevo (`BM25Segment`) solo con las postings de los
+    documentos agregados, en vez de reescribir todo el índice. Los segmentos se combinan como un
+    contador binario: cuando el último tiene al menos tantos documentos como el anterior, se
+    fusionan. Así la partición tiene O(log n) segmentos y cada documento se reescribe O(log n)
+    veces. `segments.json` lista los segmentos vigentes y se reemplaza de forma atómica.
+
+    Los documentos se guardan en `documents.jsonl`, una fila por documento indexado. Solo el
+    escritor modifica los archivos, con el lock `write.lock` tomado. Las búsquedas vuelven a
+    leer `segments.json` si cambió, por lo que ven los documentos agregados por otro proceso.
+    """
+
+    def __init__(self, directory: str, project_name: str, k1: float, b: float):
+        self.directory = directory
+        self.project_name = project_name
+        self.k1 = k1
+        self.b = b
+        self.segments_path = os.path.join(directory, "segments.json")
+        self.legacy_postings_path = os.path.join(directory, "postings.npz")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.write_lock = FileLock(os.path.join(directory, "write.lock"))
+        self.table = None
+        self.segments: List[BM25Segment] = []
+        self.doc_lengths = np.empty(0, dtype=np.uint32)
+        self.length_norm = np.empty(0, dtype=np.float32)
+        self._table_id = None
+        self._segments_version = None
+        self._lock = threading.Lock()
+        self._refresh()
+
+    @property
+    def document_count(self) -> int:
+        return len(self.doc_lengths)
+
+    def _get_segments_version(self) -> Optional[Tuple[int, int]]:
+        for path in [self.segments_path, self.legacy_postings_path]:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            return stat.st_mtime_ns, stat.st_size
+        return None
+
+    def _read_segments(self) -> Optional[Dict]:
+        if os.path.exists(self.segments_path):
+            with open(self.segments_path, "r", encoding="utf-8") as segments_file:
+                return json.load(segments_file)
+        if os.path.exists(self.legacy_postings_path):
+            return {"id": "postings", "segments": ["postings.npz"]}
+        return None
+
+    def _refresh(self, attempts: int = 3) -> None:
+        segments_version = self._get_segments_version()
+        if segments_version == self._segments_version and segments_version is not None:
+            self.table.refresh()
+            return
+        try:
+            manifest = self._read_segments()
+            if manifest is None:
+                self.table = None
+                self._table_id = None
+                segments = []
+            else:
+                if manifest["id"] != self._table_id:
+                    # El índice se vació y se volvió a crear (ej. desde otro proceso).
+                    self.segments = []
+                    self._table_id = manifest["id"]
+                    self.table = DocumentTable(
+                        os.path.join(self.directory, "documents.jsonl"), self.write_lock
+                    )
+                loaded = {segment.name: segment for segment in self.segments}
+                segments = [
+                    loaded.get(name)
+                    or BM25Segment(os.path.join(self.directory, name))
+                    for name in manifest["segments"]
+                ]
+                self.table.refresh()
+        except FileNotFoundError:
+            # Una fusión en otro proceso eliminó un segmento recién listado.
+            if attempts <= 1:
+                raise
+            return self._refresh(attempts - 1)
+
+        self.segments = segments
+        self._segments_version = segments_version
+        self.doc_lengths = (
+            np.concatenate([segment.doc_lengths for segment in segments])
+            if segments
+            else np.empty(0, dtype=np.uint32)
+        )
+        average_length = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0
+        self.length_norm = self.k1 * (
+            1 - self.b + self.b * self.doc_lengths / max(average_length, 1e-9)
+        )
+
+    def _save_segments(self, segment_names: List[str]) -> None:
+        temporary_path = f"{self.segments_path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as segments_file:
+            json.dump(
+                {"id": self._table_id, "segments": segment_names},
+                segments_file,
+                ensure_ascii=False,
+            )
+        os.replace(temporary_path, self.segments_path)
+
+    def _new_segment_path(self) -> str:
+        return os.path.join(self.directory, f"segment-{uuid.uuid4().hex}.npz")
+
+    def _merge(self, first: BM25Segment, second: BM25Segment) -> BM25Segment:
+        vocabulary = sorted(set(first.terms).union(second.terms))
+        vocabulary_index = {term: i for i, term in enumerate(vocabulary)}
+        path = self._new_segment_path()
+        write_postings(
+            path,
+            vocabulary,
+            np.concatenate(
+                [first.get_term_ids(vocabulary_index), second.get_term_ids(vocabulary_index)]
+            ),
+            np.concatenate([first.doc_ids, second.doc_ids]),
+            np.concatenate([first.term_frequencies, second.term_frequencies]),
+            np.concatenate([first.doc_lengths, second.doc_lengths]),
+            first.first_doc,
+        )
+        return BM25Segment(path)
+
+    def add_documents(self, documents: List[Document]) -> int:
+        """
+        Agrega documentos al índice y lo guarda en disco. Se omiten los documentos cuyo
+        `page_content_sha512` ya está indexado.
+
+        Args:
+            documents (List[Document]): Los documentos a indexar.
+
+        Returns:
+            int: Cantidad de documentos agregados.
+        """
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with self.write_lock:
+                return self._add_documents(documents)
+
+    def _add_documents(self, documents: List[Document]) -> int:
+        if not os.path.exists(self.meta_path):
+            with open(self.meta_path, "w", encoding="utf-8") as meta_file:
+                json.dump(
+                    {"project_name": self.project_name}, meta_file, ensure_ascii=False
+                )
+        self._refresh()
+        if self.table is None:
+            self._table_id = uuid.uuid4().hex
+            self.table = DocumentTable(
+                os.path.join(self.directory, "documents.jsonl"), self.write_lock
+            )
+        # Las filas de documentos sin segmento (escritura interrumpida) se descartan.
+        self.table.truncate(self.document_count)
+
+        new_documents = []
+        seen_hashes = set()
+        for document in documents:
+            content_hash = document.metadata.get("page_content_sha512")
+            if content_hash in self.table.hashes or content_hash in seen_hashes:
+                continue
+            if content_hash:
+                seen_hashes.add(content_hash)
+            new_documents.append(document)
+        if not new_documents:
+            return 0
+
+        new_terms, new_frequencies, new_lengths, terms_per_document = [], [], [], []
+        for document in new_documents:
+            tokens = tokenize_text(document.page_content)
+            term_counts = Counter(tokens)
+            new_terms.extend(term_counts.keys())
+            new_frequencies.extend(term_counts.values())
+            new_lengths.append(len(tokens))
+            terms_per_document.append(len(term_counts))
+        vocabulary = sorted(set(new_terms))
+        vocabulary_index = {term: i for i, term in enumerate(vocabulary)}
+
+        # Primero se agregan los documentos: las filas sin segmento se ignoran al buscar.
+        self.table.append(
+            new_documents,
+            [document.metadata.get("page_content_sha512") for document in new_documents],
+        )
+        path = self._new_segment_path()
+        write_postings(
+            path,
+            vocabulary,
+            np.array([vocabulary_index[term] for term in new_terms], dtype=np.int64),
+            np.repeat(
+                np.arange(len(new_documents), dtype=np.uint32) + self.document_count,
+                terms_per_document,
+            ),
+            np.minimum(new_frequencies, MAX_TERM_FREQUENCY),
+            np.array(new_lengths, dtype=np.uint32),
+            self.document_count,
+        )
+
+        segments = self.segments + [BM25Segment(path)]
+        obsolete = []
+        while len(segments) >= 2 and segments[-1].documents >= segments[-2].documents:
+            second = segments.pop()
+            first = segments.pop()
+            segments.append(self._merge(first, second))
+            obsolete.extend([first, second])
+        self._save_segments([segment.name for segment in segments])
+        for segment in obsolete:
+            if os.path.exists(segment.path):
+                os.remove(segment.path)
+        self._refresh()
+        return len(new_documents)
+
+    def is_empty(self) -> bool:
+        """
+        Returns:
+            bool: True si la partición no tiene documentos indexados, según su estado en disco.
+        """
+        with self._lock:
+            self._refresh()
+            return self.document_count == 0
+
+    def search(self, query: str, top_k: int = 10) -> List[Document]:
+        """
+        Busca los documentos con mayor puntaje BM25 para la query.
+
+        Args:
+            query (str): La query en lenguaje natural.
+            top_k (int): Cantidad máxima de resultados. Default: 10.
+
+        Returns:
+            List[Document]: Los documentos con puntaje mayor a cero, de mayor a menor puntaje. El puntaje se agrega a la metadata como `score`.
+        """
+        with self._lock:
+            self._refresh()
+            document_count = self.document_count
+            if document_count == 0:
+                return []
+            scores = np.zeros(document_count, dtype=np.float32)
+            for term in set(tokenize_text(query)):
+                postings = [
+                    term_postings
+                    for term_postings in (
+                        segment.get_postings(term) for segment in self.segments
+                    )
+                    if term_postings is not None
+                ]
+                if not postings:
+                    continue
+                document_frequency = sum(len(doc_ids) for doc_ids, _ in postings)
+                idf = math.log(
+                    1
+                    + (document_count - document_frequency + 0.5)
+                    / (document_frequency + 0.5)
+                )
+                for doc_ids, frequencies in postings:
+                    frequencies = frequencies.astype(np.float32)
+                    scores[doc_ids] += (
+                        idf
+                        * frequencies
+                        * (self.k1 + 1)
+                        / (frequencies + self.length_norm[doc_ids])
+                    )
+
+            rows = [
+                int(row) for row in top_k_indices(scores, top_k) if scores[row] > 0
+            ]
+            documents = self.table.get(rows)
+        for document, row in zip(documents, rows):
+            document.metadata["score"] = float(scores[row])
+        return documents
+
+
+class BM25Index:
+    """
+    Índice de keywords BM25 local e independiente del engine, particionado por `project_name`.
+
+    Se construye en `load_db` con la misma tokenización de `preprocess_query` (sin acentos, en
+    minúsculas y sin stopwords) y responde `keyword_search` sin llamar al modelo de embeddings
+    ni a la base de datos.
+    """
+
+    def __init__(self, root_directory: str, k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            root_directory (str): Directorio donde se guarda una partición por proyecto.
+            k1 (float): Saturación de la frecuencia de cada término. Default: 1.5.
+            b (float): Normalización por el largo del documento. Default: 0.75.
+        """
+        self.root_directory = root_directory
+        self.k1 = k1
+        self.b = b
+        self._partitions = {}
+        self._lock = threading.Lock()
+
+    def _partition_directory(self, project_name: str) -> str:
+        safe_name = re.sub(r"[^\w.-]", "_", project_name)
+        name_hash = hashlib.sha1(project_name.encode("utf-8")).hexdigest()[:8]
+        return os.path.join(self.root_directory, f"{safe_name}-{name_hash}")
+
+    def get_partition(
+        self, project_name: str, create: bool = False
+    ) -> Optional[BM25Partition]:
+        with self._lock:
+            partition = self._partitions.get(project_name)
+            if partition is None:
+                directory = self._partition_directory(project_name)
+                if not create and not os.path.exists(directory):
+                    return None
+                partition = BM25Partition(directory, project_name, self.k1, self.b)
+                self._partitions[project_name] = partition
+            return partition
+
+    def add_documents(self, documents: List[Document]) -> int:
+        """
+        Agrega documentos al índice de su proyecto. Los documentos sin `project_name` se omiten.
+
+        Args:
+            documents (List[Document]): Los documentos a indexar.
+
+        Returns:
+            int: Cantidad de documentos agregados.
+        """
+        return sum(self.add_documents_by_project(documents).values())
+
+    def add_documents_by_project(self, documents: List[Document]) -> Dict[str, int]:
+        """
+        Igual que `add_documents`, pero detalla los documentos agregados por proyecto.
+
+        Args:
+            documents (List[Document]): Los documentos a indexar.
+
+        Returns:
+            Dict[str, int]: Cantidad de documentos agregados a cada proyecto.
+        """
+        documents_by_project: Dict[str, List[Document]] = {}
+        for document in documents:
+            project_name = document.metadata.get("project_name")
+            if project_name:
+                documents_by_project.setdefault(project_name, []).append(document)
+
+        return {
+            project_name: self.get_partition(project_name, create=True).add_documents(
+                project_documents
+            )
+            for project_name, project_documents in documents_by_project.items()
+        }
+
+    def has_project(self, project_name: str) -> bool:
+        """
+        Indica si el proyecto tiene documentos en el índice. Los engines lo usan para volver a
+        su propia búsqueda por keywords en proyectos que aún no se indexan (ej. los cargados
+        antes de activar el índice, hasta ejecutar `--rebuild-keyword-index`).
+
+        Args:
+            project_name (str): El proyecto.
+
+        Returns:
+            bool: True si el proyecto tiene al menos un documento indexado.
+        """
+        partition = self.get_partition(project_name) if project_name else None
+        return partition is not None and not partition.is_empty()
+
+    def search(self, project_name: str, query: str, top_k: int = 10) -> List[Document]:
+        """
+        Args:
+            project_name (str): El proyecto donde buscar.
+            query (str): La query en lenguaje natural.
+            top_k (int): Cantidad máxima de resultados. Default: 10.
+
+        Returns:
+            List[Document]: Los documentos con mayor puntaje BM25 dentro del proyecto.
+        """
+        partition = self.get_partition(project_name) if project_name else None
+        if partition is None:
+            return []
+        return partition.search(query, top_k)
+
+    def clear(self) -> None:
+        """
+        Elimina el índice del disco.
+        """
+        with self._lock:
+            self._partitions = {}
+            if os.path.exists(self.root_directory):
+                shutil.rmtree(self.root_directory)
@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Cache LRU (least recently used) en memoria, acotado en tamaño y seguro para uso entre hilos.
+
+    Cuando se supera `maxsize`, se descarta la entrada usada hace más tiempo. Si se indica
+    `ttl_seconds`, las entradas expiran ese tiempo después de almacenarse. Lleva contadores de
+    aciertos y fallos para poder evaluar la efectividad del cache.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl_seconds: Optional[float] = None):
+        """
+        Args:
+            maxsize (int): Cantidad máxima de entradas que se mantienen en el cache. Default: 1024.
+            ttl_seconds (float, opcional): Segundos que dura cada entrada. Por defecto, no expiran.
+        """
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Obtiene el valor asociado a `key` y lo marca como usado recientemente.
+
+        Args:
+            key (Hashable): La llave a buscar.
+            default (Any): Valor a retornar si la llave no se encuentra. Default: None.
+
+        Returns:
+            Any: El valor almacenado o `default` si no existe o expiró.
+        """
+        with self._lock:
+            if key in self._data and not self._is_expired(key):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key][1]
+            self._data.pop(key, None)
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Almacena `value` bajo `key`, descartando la entrada menos usada si el cache está lleno.
+
+        Args:
+            key (Hashable): La llave del valor.
+            value (Any): El valor a almacenar.
+        """
+        expires_at = (
+            time.monotonic() + self.ttl_seconds
+            if self.ttl_seconds is not None
+            else None
+        )
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def remove_if(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Elimina las entradas cuya llave cumple `predicate`.
+
+        Args:
+            predicate (Callable[[Hashable], bool]): Función que recibe una llave y retorna True si debe eliminarse.
+
+        Returns:
+            int: Cantidad de entradas eliminadas.
+        """
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def _is_expired(self, key: Hashable) -> bool:
+        expires_at = self._data[key][0]
+        return expires_at is not None and time.monotonic() >= expires_at
+
+    def clear(self) -> None:
+        """
+        Elimina todas las entradas del cache. Los contadores se mantienen.
+        """
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: Aciertos, fallos y tamaño actual del cache.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data and not self._is_expired(key)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
@@ -0,0 +1,492 @@
+import json
+import os
+import re
+import shutil
+import threading
+import uuid
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from filelock import FileLock
+from langchain.schema import Document
+
+# Partición para los chunks que no pertenecen a ningún proyecto (por ejemplo, mensajes).
+NO_PROJECT_PARTITION = "_sin_proyecto"
+
+
+def normalize_vectors(vectors) -> np.ndarray:
+    """
+    Normaliza cada fila a norma 1, para que el producto punto equivalga a la similitud coseno.
+
+    Args:
+        vectors: Matriz (filas, dimensión) o vector de embeddings.
+
+    Returns:
+        np.ndarray: Los vectores normalizados en float32. Los vectores nulos se mantienen en cero.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Obtiene los índices de los `k` puntajes más altos, ordenados de mayor a menor.
+    Usa `argpartition`, por lo que solo se ordenan los `k` seleccionados.
+
+    Args:
+        scores (np.ndarray): Los puntajes.
+        k (int): La cantidad de índices a obtener.
+
+    Returns:
+        np.ndarray: Los índices seleccionados.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+# Cada fila de la tabla de documentos tiene un registro de largo fijo en un archivo índice
+# (`.idx`): el offset donde termina su línea en el JSONL y el hash SHA-512 (hex) del contenido.
+ROW_INDEX_DTYPE = np.dtype([("end", "<u8"), ("sha512", "S128")])
+
+
+def file_size(path: str) -> int:
+    """
+    Returns:
+        int: El tamaño del archivo en bytes, o 0 si no existe.
+    """
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+class DocumentTable:
+    """
+    Tabla de documentos en un archivo JSONL, con una línea por fila (ID, contenido y metadata).
+
+    El offset y el hash de cada fila se guardan en un archivo índice de registros de largo fijo
+    (leído como memmap), por lo que abrir la tabla no requiere leer el JSONL. Una fila existe
+    cuando su registro está completo en el índice: el JSONL se escribe antes que el índice, y
+    los bytes sobrantes al final de cualquiera de los dos archivos (escritura en curso o
+    interrumpida) se ignoran al leer.
+
+    Solo el escritor modifica los archivos, siempre con `lock` tomado: al agregar filas primero
+    descarta los restos de una escritura interrumpida.
+    """
+
+    def __init__(self, path: str, lock: Optional[FileLock] = None):
+        """
+        Args:
+            path (str): Ruta al archivo JSONL.
+            lock (FileLock, opcional): Lock entre procesos de los escritores. Por defecto, uno propio junto al archivo.
+        """
+        self.path = path
+        self.index_path = f"{os.path.splitext(path)[0]}.idx"
+        self.lock = lock or FileLock(f"{path}.lock")
+        self._rows = 0
+        self._index = None
+        self._hashes = set()
+        self._hashed_rows = 0
+        self.refresh()
+
+    @property
+    def rows(self) -> int:
+        return self._rows
+
+    @property
+    def hashes(self) -> Set[str]:
+        """
+        Returns:
+            Set[str]: Los hashes del contenido de las filas. Se construye al primer uso, desde el índice.
+        """
+        if self._hashed_rows < self._rows:
+            new_hashes = self._index["sha512"][self._hashed_rows : self._rows]
+            self._hashes.update(
+                content_hash.decode("ascii") for content_hash in new_hashes if content_hash
+            )
+            self._hashed_rows = self._rows
+        return self._hashes
+
+    def refresh(self) -> int:
+        """
+        Vuelve a leer la cantidad de filas desde el tamaño del índice, para ver las filas
+        agregadas por otro proceso. No modifica los archivos.
+
+        Returns:
+            int: La cantidad de filas.
+        """
+        if not os.path.exists(self.index_path) and file_size(self.path) > 0:
+            # Tabla creada antes del índice: se construye una sola vez.
+            with self.lock:
+                if not os.path.exists(self.index_path):
+                    self._build_index()
+        rows = file_size(self.index_path) // ROW_INDEX_DTYPE.itemsize
+        if rows < self._hashed_rows:
+            # La tabla se vació y se volvió a crear desde otro proceso.
+            self._hashes = set()
+            self._hashed_rows = 0
+        if rows != self._rows:
+            self._rows = rows
+            self._index = (
+                np.memmap(self.index_path, dtype=ROW_INDEX_DTYPE, mode="r", shape=(rows,))
+                if rows
+                else None
+            )
+        return rows
+
+    def _build_index(self) -> None:
+        records = []
+        end = 0
+        with open(self.path, "rb") as table_file:
+            for line in table_file:
+                if not line.endswith(b"\n"):
+                    break
+                end += len(line)
+                content_hash = json.loads(line)["metadata"].get("page_content_sha512")
+                records.append((end, (content_hash or "").encode("ascii")))
+        temporary_path = f"{self.index_path}.tmp"
+        np.array(records, dtype=ROW_INDEX_DTYPE).tofile(temporary_path)
+        os.replace(temporary_path, self.index_path)
+
+    def _row_end(self, row: int) -> int:
+        return int(self._index["end"][row - 1]) if row > 0 else 0
+
+    def truncate(self, rows: int) -> None:
+        """
+        Descarta las filas a partir de `rows` y los restos de una escritura interrumpida.
+        Solo debe llamarse desde el escritor, con `lock` tomado.
+
+        Args:
+            rows (int): Cantidad máxima de filas que se mantienen.
+        """
+        self.refresh()
+        rows = min(rows, self._rows)
+        end = self._row_end(rows)
+        self._index = None
+        for path, size in [
+            (self.index_path, rows * ROW_INDEX_DTYPE.itemsize),
+            (self.path, end),
+        ]:
+            open(path, "ab").close()
+            os.truncate(path, size)
+        self._rows = -1
+        self._hashes = set()
+        self._hashed_rows = 0
+        self.refresh()
+
+    def get(self, rows: Iterable[int]) -> List[Document]:
+        """
+        Args:
+            rows (Iterable[int]): Las filas a leer.
+
+        Returns:
+            List[Document]: Los documentos de cada fila, en el mismo orden.
+        """
+        documents = []
+        with open(self.path, "rb") as table_file:
+            for row in rows:
+                table_file.seek(self._row_end(row))
+                chunk = json.loads(table_file.readline())
+                documents.append(
+                    Document(
+                        id=chunk["id"],
+                        page_content=chunk["page_content"],
+                        metadata=chunk["metadata"],
+                    )
+                )
+        return documents
+
+    def append(self, documents: List[Document], ids: List[str]) -> None:
+        """
+        Agrega documentos al final de la tabla. Solo debe llamarse desde el escritor, con
+        `lock` tomado y después de `truncate`.
+
+        Args:
+            documents (List[Document]): Los documentos a agregar.
+            ids (List[str]): El ID de cada documento.
+        """
+        lines = [
+            json.dumps(
+                {
+                    "id": document_id,
+                    "page_content": document.page_content,
+                    "metadata": document.metadata,
+                },
+                ensure_ascii=False,
+            ).encode("utf-8")
+            + b"\n"
+            for document_id, document in zip(ids, documents)
+        ]
+        records = np.empty(len(lines), dtype=ROW_INDEX_DTYPE)
+        records["end"] = self._row_end(self._rows) + np.cumsum(
+            [len(line) for line in lines], dtype=np.uint64
+        )
+        records["sha512"] = [
+            (document.metadata.get("page_content_sha512") or "").encode("ascii")
+            for document in documents
+        ]
+        with open(self.path, "ab") as table_file:
+            table_file.write(b"".join(lines))
+        # El registro en el índice se escribe al final: desde ese momento la fila existe.
+        with open(self.index_path, "ab") as index_file:
+            index_file.write(records.tobytes())
+        self.refresh()
+
+
+class ChunkPartition:
+    """
+    Chunks de un único proyecto almacenados en disco.
+
+    Los embeddings se guardan como filas float32 en `vectors.f32` (leído como memmap, por lo
+    que varios procesos comparten las mismas páginas) y cada fila tiene una entrada en la tabla
+    `chunks.jsonl` con su ID, contenido y metadata, en el mismo orden.
+
+    Un proceso escribe (`append`, con el lock `write.lock` tomado) y otros pueden leer al mismo
+    tiempo: los lectores nunca modifican los archivos y `refresh` les muestra las filas nuevas.
+    """
+
+    def __init__(self, directory: str, project_name: Optional[str]):
+        self.directory = directory
+        self.project_name = project_name
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.write_lock = FileLock(os.path.join(directory, "write.lock"))
+        self.dimension = None
+        self.rows = 0
+        self._vectors = None
+        self._lock = threading.Lock()
+        self.table = DocumentTable(
+            os.path.join(directory, "chunks.jsonl"), self.write_lock
+        )
+        self.refresh()
+
+    @property
+    def hashes(self) -> Set[str]:
+        with self._lock:
+            return self.table.hashes
+
+    def refresh(self) -> int:
+        """
+        Vuelve a leer la cantidad de filas desde el tamaño de los archivos. Una fila existe
+        cuando tiene su embedding y su entrada en la tabla de chunks.
+
+        Returns:
+            int: La cantidad de filas.
+        """
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self) -> int:
+        if self.dimension is None:
+            if not os.path.exists(self.meta_path):
+                return self.rows
+            with open(self.meta_path, "r", encoding="utf-8") as meta_file:
+                self.dimension = json.load(meta_file)["dimension"]
+        rows = min(
+            self.table.refresh(), file_size(self.vectors_path) // (self.dimension * 4)
+        )
+        if rows != self.rows:
+            self.rows = rows
+            self._vectors = None
+        return rows
+
+    def get_vectors(self) -> Optional[np.memmap]:
+        """
+        Returns:
+            np.memmap: La matriz (filas, dimensión) de embeddings, o None si la partición está vacía.
+        """
+        with self._lock:
+            if self._vectors is None and self.rows > 0:
+                self._vectors = np.memmap(
+                    self.vectors_path,
+                    dtype=np.float32,
+                    mode="r",
+                    shape=(self.rows, self.dimension),
+                )
+            return self._vectors
+
+    def get_documents(self, rows: Iterable[int]) -> List[Document]:
+        """
+        Args:
+            rows (Iterable[int]): Las filas a leer.
+
+        Returns:
+            List[Document]: Los documentos de cada fila, en el mismo orden.
+        """
+        with self._lock:
+            return self.table.get(rows)
+
+    def append(self, documents: List[Document], vectors: np.ndarray) -> List[str]:
+        """
+        Agrega documentos con sus embeddings al final de la partición.
+
+        Args:
+            documents (List[Document]): Los documentos a agregar.
+            vectors (np.ndarray): La matriz de embeddings, una fila por documento.
+
+        Returns:
+            List[str]: Los IDs asignados a los documentos.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        ids = [str(uuid.uuid4()) for _ in documents]
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, self.write_lock:
+            if self.dimension is None and not os.path.exists(self.meta_path):
+                with open(self.meta_path, "w", encoding="utf-8") as meta_file:
+                    json.dump(
+                        {"project_name": self.project_name, "dimension": vectors.shape[1]},
+                        meta_file,
+                        ensure_ascii=False,
+                    )
+            # Se descartan los restos de una escritura interrumpida antes de agregar filas.
+            rows = self._refresh()
+            self.table.truncate(rows)
+            open(self.vectors_path, "ab").close()
+            os.truncate(self.vectors_path, rows * self.dimension * 4)
+
+            # Los embeddings se escriben primero: una fila existe recién cuando su entrada en
+            # la tabla de chunks está completa.
+            with open(self.vectors_path, "ab") as vectors_file:
+                vectors_file.write(vectors.tobytes())
+            self.table.append(documents, ids)
+            self._refresh()
+        return ids
+
+
+class ChunkStore:
+    """
+    Almacén local de chunks con sus embeddings, particionado por `project_name`.
+
+    Cada proyecto tiene su propio directorio con una `ChunkPartition`, de modo que una búsqueda
+    filtrada por proyecto solo lee los embeddings de ese proyecto. Es utilizado por los engines
+    que mantienen los datos en el mismo proceso.
+
+    Cada consulta vuelve a revisar el catálogo de particiones y el tamaño de sus archivos, por
+    lo que un proceso lector (la API) ve los chunks que agrega otro proceso (`--load`).
+    """
+
+    def __init__(self, root_directory: str):
+        """
+        Args:
+            root_directory (str): Directorio donde se guarda una partición por proyecto.
+        """
+        self.root_directory = root_directory
+        self.catalog_path = os.path.join(root_directory, "partitions.json")
+        self._partitions = {}
+        self._catalog_version = None
+        self._lock = threading.Lock()
+
+    def _get_catalog_version(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.catalog_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load_partitions(self) -> Dict[Optional[str], ChunkPartition]:
+        catalog_version = self._get_catalog_version()
+        if catalog_version == self._catalog_version:
+            return self._partitions
+        partitions = {}
+        if catalog_version is not None:
+            with open(self.catalog_path, "r", encoding="utf-8") as catalog_file:
+                catalog = json.load(catalog_file)
+            for entry in catalog:
+                directory = os.path.join(self.root_directory, entry["directory"])
+                partition = self._partitions.get(entry["project_name"])
+                if partition is None or partition.directory != directory:
+                    partition = ChunkPartition(directory, entry["project_name"])
+                partitions[entry["project_name"]] = partition
+        self._partitions = partitions
+        self._catalog_version = catalog_version
+        return self._partitions
+
+    def _save_catalog(self) -> None:
+        catalog = [
+            {
+                "project_name": project_name,
+                "directory": os.path.basename(partition.directory),
+            }
+            for project_name, partition in self._partitions.items()
+        ]
+        temporary_path = f"{self.catalog_path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as catalog_file:
+            json.dump(catalog, catalog_file, ensure_ascii=False, indent=4)
+        os.replace(temporary_path, self.catalog_path)
+        self._catalog_version = self._get_catalog_version()
+
+    def get_partition(self, project_name: Optional[str]) -> Optional[ChunkPartition]:
+        with self._lock:
+            partition = self._load_partitions().get(project_name or None)
+        if partition is not None:
+            partition.refresh()
+        return partition
+
+    def get_partitions(self) -> List[ChunkPartition]:
+        with self._lock:
+            partitions = list(self._load_partitions().values())
+        for partition in partitions:
+            partition.refresh()
+        return partitions
+
+    def get_or_create_partition(self, project_name: Optional[str]) -> ChunkPartition:
+        project_name = project_name or None
+        with self._lock:
+            os.makedirs(self.root_directory, exist_ok=True)
+            # El catálogo se modifica con el lock tomado, para no perder particiones creadas
+            # por otro proceso.
+            with FileLock(f"{self.catalog_path}.lock"):
+                partitions = self._load_partitions()
+                partition = partitions.get(project_name)
+                if partition is None:
+                    if project_name is None:
+                        directory_name = NO_PROJECT_PARTITION
+                    else:
+                        safe_name = re.sub(r"[^\w.-]", "_", project_name)
+                        directory_name = f"{safe_name}-{uuid.uuid4().hex[:8]}"
+                    partition = ChunkPartition(
+                        os.path.join(self.root_directory, directory_name), project_name
+                    )
+                    partitions[project_name] = partition
+                    self._save_catalog()
+            return partition
+
+    def get_project_names(self) -> List[str]:
+        """
+        Returns:
+            List[str]: Los nombres de los proyectos con al menos un chunk.
+        """
+        return [
+            partition.project_name
+            for partition in self.get_partitions()
+            if partition.project_name is not None and partition.rows > 0
+        ]
+
+    def find_existing_hashes(self, hashes: List[str]) -> Set[str]:
+        """
+        Args:
+            hashes (List[str]): Los hashes SHA-512 del contenido de los chunks.
+
+        Returns:
+            Set[str]: Los hashes que ya están almacenados en alguna partición.
+        """
+        existing_hashes = set()
+        for partition in self.get_partitions():
+            existing_hashes.update(partition.hashes.intersection(hashes))
+        return existing_hashes
+
+    def clear(self) -> None:
+        """
+        Elimina todas las particiones del disco.
+        """
+        with self._lock:
+            if os.path.exists(self.root_directory):
+                shutil.rmtree(self.root_directory)
+            self._partitions = {}
+            self._catalog_version = None
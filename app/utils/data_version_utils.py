@@ -0,0 +1,86 @@
+import json
+import os
+import threading
+import uuid
+from typing import Dict, Optional, Set, Tuple
+from filelock import FileLock
+
+# Llave de la versión que cambia cuando se modifican todos los proyectos (ej. `clear_db`).
+GLOBAL_VERSION_KEY = "__all__"
+
+
+class DataVersionFile:
+    """
+    Versión de los datos de un engine guardada en un archivo JSON, compartida por los procesos
+    que abren el mismo directorio (ej. la API y el CLI de ingesta).
+
+    Guarda un token aleatorio global y uno por proyecto, que se reemplazan en cada cambio. Se
+    usan tokens en vez de contadores para que una versión no se repita si el directorio se
+    elimina (ej. `clear_db`) y se vuelve a crear.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Ruta del archivo JSON con las versiones.
+        """
+        self.path = path
+        self._file_lock = FileLock(f"{path}.lock")
+        self._versions: Dict[str, str] = {}
+        self._file_version = None
+        self._lock = threading.Lock()
+
+    def _get_file_version(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        # Los tokens tienen largo fijo: el inodo distingue dos reemplazos con la misma fecha.
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _read(self) -> Dict[str, str]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as version_file:
+                return json.load(version_file)
+        except FileNotFoundError:
+            return {}
+
+    def get(self, project_name: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Args:
+            project_name (str): El proyecto.
+
+        Returns:
+            Tuple[str, str]: La versión global y la del proyecto. None si aún no tienen versión.
+        """
+        file_version = self._get_file_version()
+        with self._lock:
+            if file_version != self._file_version:
+                self._versions = self._read() if file_version is not None else {}
+                self._file_version = file_version
+            return (
+                self._versions.get(GLOBAL_VERSION_KEY),
+                self._versions.get(project_name),
+            )
+
+    def bump(self, project_names: Optional[Set[str]] = None) -> None:
+        """
+        Registra un cambio en los datos.
+
+        Args:
+            project_names (Set[str], opcional): Los proyectos modificados. None indica que cambiaron todos.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._file_lock:
+            if project_names is None:
+                versions = {GLOBAL_VERSION_KEY: uuid.uuid4().hex}
+            else:
+                versions = self._read()
+                for project_name in project_names:
+                    versions[project_name] = uuid.uuid4().hex
+            temporary_path = f"{self.path}.tmp"
+            with open(temporary_path, "w", encoding="utf-8") as version_file:
+                json.dump(versions, version_file, ensure_ascii=False)
+            os.replace(temporary_path, self.path)
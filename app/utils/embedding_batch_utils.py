@@ -0,0 +1,132 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List
+from langchain_core.embeddings import Embeddings
+from app.utils.embedding_cache_utils import get_embedding_model_name
+from app.utils.metrics_utils import observe_embedding_batch
+
+
+class BatchingEmbeddings(Embeddings):
+    """
+    Envoltorio de un modelo de embeddings que agrupa las queries concurrentes en micro-batches.
+
+    Cada llamada a `embed_query` se encola y espera su resultado. Un hilo despachador toma la
+    primera query en espera, junta las que lleguen durante los siguientes `window_ms`
+    milisegundos (hasta `max_batch_size`) y las envía al modelo en una sola llamada a
+    `embed_documents`. Los embeddings de documentos se delegan directamente al modelo.
+
+    El tamaño de cada batch y la espera de cada query se exponen en `/metrics`
+    (`rag_embedding_batch_size` y `rag_embedding_batch_wait_seconds`).
+    """
+
+    def __init__(
+        self,
+        embedding_model: Embeddings,
+        window_ms: float = 5,
+        max_batch_size: int = 32,
+    ):
+        """
+        Args:
+            embedding_model (Embeddings): El modelo de embeddings a envolver.
+            window_ms (float): Milisegundos que se esperan otras queries antes de enviar un batch. Default: 5.
+            max_batch_size (int): Cantidad máxima de queries por batch. Default: 32.
+        """
+        self.embedding_model = embedding_model
+        self.model = get_embedding_model_name(embedding_model)
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.queries = 0
+        self.largest_batch = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._queue = queue.Queue()
+        self._dispatcher = None
+        self._lock = threading.Lock()
+
+    def _submit(self, text: str) -> Future:
+        with self._lock:
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(
+                    target=self._dispatch, name="embedding-batcher", daemon=True
+                )
+                self._dispatcher.start()
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def _collect_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window_ms / 1000
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                if timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _dispatch(self) -> None:
+        while True:
+            batch = self._collect_batch()
+            dispatched_at = time.perf_counter()
+            # Las queries repetidas dentro del batch se envían una sola vez.
+            texts = list(dict.fromkeys(text for text, _, _ in batch))
+            # Se registra antes de entregar los resultados, para que quien espera vea el batch.
+            self._record_batch(
+                len(batch), [dispatched_at - queued_at for _, _, queued_at in batch]
+            )
+            try:
+                vectors = dict(zip(texts, self.embedding_model.embed_documents(texts)))
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+            else:
+                for text, future, _ in batch:
+                    future.set_result(vectors[text])
+
+    def _record_batch(self, batch_size: int, wait_seconds: List[float]) -> None:
+        with self._lock:
+            self.batches += 1
+            self.queries += batch_size
+            self.largest_batch = max(self.largest_batch, batch_size)
+            self.total_wait_seconds += sum(wait_seconds)
+            self.max_wait_seconds = max(self.max_wait_seconds, max(wait_seconds))
+        observe_embedding_batch(batch_size, wait_seconds)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._submit(text).result()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self._submit(text))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embedding_model.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embedding_model.aembed_documents(texts)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns:
+            Dict[str, float]: Batches enviados, queries atendidas, tamaño promedio y máximo de los batches, y espera promedio y máxima de cada query en la cola (en milisegundos).
+        """
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "queries": self.queries,
+                "average_batch_size": (
+                    self.queries / self.batches if self.batches else 0
+                ),
+                "largest_batch": self.largest_batch,
+                "average_wait_ms": (
+                    1000 * self.total_wait_seconds / self.queries if self.queries else 0
+                ),
+                "max_wait_ms": 1000 * self.max_wait_seconds,
+            }
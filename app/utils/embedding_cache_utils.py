@@ -0,0 +1,172 @@
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from typing import Dict, List, Optional
+from langchain_core.embeddings import Embeddings
+from app.utils.cache_utils import LRUCache
+
+
+def normalize_query_text(text: str) -> str:
+    """
+    Normaliza una query para usarla como llave de cache: forma Unicode NFKC, minúsculas y
+    espacios colapsados.
+
+    Args:
+        text (str): La query original.
+
+    Returns:
+        str: La query normalizada.
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def get_embedding_model_name(embedding_model: Embeddings) -> str:
+    """
+    Obtiene el nombre del modelo de embeddings, o el nombre de su clase si no lo expone.
+
+    Args:
+        embedding_model (Embeddings): El modelo de embeddings.
+
+    Returns:
+        str: El nombre del modelo.
+    """
+    return getattr(embedding_model, "model", None) or type(embedding_model).__name__
+
+
+class SqliteEmbeddingCache:
+    """
+    Cache persistente de embeddings almacenado en un archivo SQLite.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Ruta al archivo SQLite. Se crea si no existe.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._connection.commit()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT vector FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        vector = array("d")
+        vector.frombytes(row[0])
+        return vector.tolist()
+
+    def put(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                (key, array("d", vector).tobytes()),
+            )
+            self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Envoltorio de un modelo de embeddings que guarda en cache los embeddings de las queries.
+
+    La llave del cache es el nombre del modelo más la query normalizada. Se consulta primero un
+    cache LRU en memoria y luego, si se configuró, un cache persistente en disco que sobrevive
+    a reinicios. Los embeddings de documentos (`embed_documents`) no se guardan en cache.
+    """
+
+    def __init__(
+        self,
+        embedding_model: Embeddings,
+        maxsize: int = 4096,
+        persist_path: Optional[str] = None,
+    ):
+        """
+        Args:
+            embedding_model (Embeddings): El modelo de embeddings a envolver.
+            maxsize (int): Cantidad máxima de embeddings en el cache en memoria. Default: 4096.
+            persist_path (str, opcional): Ruta al archivo SQLite del cache en disco. Si no se indica, solo se usa el cache en memoria.
+        """
+        self.embedding_model = embedding_model
+        self.model = get_embedding_model_name(embedding_model)
+        self.memory_cache = LRUCache(maxsize=maxsize)
+        self.disk_cache = SqliteEmbeddingCache(persist_path) if persist_path else None
+        self.disk_hits = 0
+        self.misses = 0
+        self._counters_lock = threading.Lock()
+
+    def cache_key(self, text: str) -> str:
+        return f"{self.model}\x00{normalize_query_text(text)}"
+
+    def _get_cached(self, key: str) -> Optional[List[float]]:
+        vector = self.memory_cache.get(key)
+        if vector is not None:
+            return list(vector)
+
+        if self.disk_cache is not None:
+            vector = self.disk_cache.get(key)
+            if vector is not None:
+                with self._counters_lock:
+                    self.disk_hits += 1
+                self.memory_cache.put(key, tuple(vector))
+                return vector
+
+        with self._counters_lock:
+            self.misses += 1
+        return None
+
+    def _store(self, key: str, vector: List[float]) -> None:
+        self.memory_cache.put(key, tuple(vector))
+        if self.disk_cache is not None:
+            self.disk_cache.put(key, vector)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self.cache_key(text)
+        vector = self._get_cached(key)
+        if vector is None:
+            vector = self.embedding_model.embed_query(text)
+            self._store(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self.cache_key(text)
+        vector = self._get_cached(key)
+        if vector is None:
+            vector = await self.embedding_model.aembed_query(text)
+            self._store(key, vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embedding_model.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embedding_model.aembed_documents(texts)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: Aciertos totales, aciertos en memoria, aciertos en disco, fallos y tamaño del cache en memoria.
+        """
+        memory_stats = self.memory_cache.stats()
+        return {
+            "hits": memory_stats["hits"] + self.disk_hits,
+            "memory_hits": memory_stats["hits"],
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_size": memory_stats["size"],
+        }
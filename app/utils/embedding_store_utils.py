@@ -0,0 +1,270 @@
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+from filelock import FileLock
+from langchain_core.embeddings import Embeddings
+from app.utils.chunk_store_utils import file_size
+from app.utils.embedding_cache_utils import get_embedding_model_name
+from app.utils.embedding_utils import hash_content
+
+# Un hash SHA-512 ocupa 64 bytes en binario.
+HASH_SIZE = 64
+
+
+class _ModelPartition:
+    """
+    Embeddings almacenados para un único modelo.
+
+    Los vectores se guardan como filas float32 en `vectors.f32` (leído como memmap) y el hash
+    binario de cada fila en `hashes.bin`, en el mismo orden. Se mantiene un índice en memoria
+    hash -> fila, que se completa con las filas agregadas por otros procesos (ej. la API y un
+    `--load`) según el tamaño de los archivos.
+
+    Solo se escribe con el lock `write.lock` tomado: el escritor vuelve a leer los archivos,
+    descarta las filas incompletas de una escritura interrumpida y agrega las nuevas al final.
+    Los lectores no modifican los archivos y solo consideran las filas completas en ambos.
+    """
+
+    def __init__(self, directory: str, model: str):
+        self.directory = directory
+        self.model = model
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.hashes_path = os.path.join(directory, "hashes.bin")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.write_lock = FileLock(os.path.join(directory, "write.lock"))
+        self.dimension = None
+        self.rows = 0
+        self.index = {}
+        self._vectors = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._refresh()
+
+    def _read_dimension(self) -> Optional[int]:
+        if self.dimension is None and os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as meta_file:
+                self.dimension = json.load(meta_file)["dimension"]
+        return self.dimension
+
+    def _committed_rows(self) -> int:
+        if self._read_dimension() is None:
+            return 0
+        # Los vectores se escriben antes que los hashes: una fila existe si está en ambos.
+        vector_rows = file_size(self.vectors_path) // (self.dimension * 4)
+        hash_rows = file_size(self.hashes_path) // HASH_SIZE
+        return min(vector_rows, hash_rows)
+
+    def _refresh(self) -> None:
+        rows = self._committed_rows()
+        if rows == self.rows:
+            return
+        if rows < self.rows:
+            # Los archivos se eliminaron o se reemplazaron: se vuelve a leer el índice completo.
+            self.index = {}
+            self.rows = 0
+            self._vectors = None
+            if rows == 0:
+                return
+        with open(self.hashes_path, "rb") as hashes_file:
+            hashes_file.seek(self.rows * HASH_SIZE)
+            hashes = hashes_file.read((rows - self.rows) * HASH_SIZE)
+        for offset in range(rows - self.rows):
+            self.index[hashes[offset * HASH_SIZE : (offset + 1) * HASH_SIZE]] = (
+                self.rows + offset
+            )
+        self.rows = rows
+        self._vectors = None
+
+    def _get_vectors(self) -> np.memmap:
+        if self._vectors is None and self.rows > 0:
+            self._vectors = np.memmap(
+                self.vectors_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(self.rows, self.dimension),
+            )
+        return self._vectors
+
+    def get_many(self, hashes: List[str]) -> List[Optional[List[float]]]:
+        with self._lock:
+            self._refresh()
+            vectors = self._get_vectors()
+            results = []
+            for content_hash in hashes:
+                row = self.index.get(bytes.fromhex(content_hash))
+                results.append(None if row is None else vectors[row].tolist())
+            return results
+
+    def put_many(self, hashes: List[str], vectors: List[List[float]]) -> None:
+        if not hashes:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or len(matrix) != len(hashes):
+            raise ValueError(
+                f"Se esperaba un embedding por hash ({len(hashes)}), con la misma dimensión."
+            )
+        with self._lock, self.write_lock:
+            if self._read_dimension() is None:
+                self.dimension = matrix.shape[1]
+                with open(self.meta_path, "w", encoding="utf-8") as meta_file:
+                    json.dump(
+                        {"model": self.model, "dimension": self.dimension}, meta_file
+                    )
+            if matrix.shape[1] != self.dimension:
+                raise ValueError(
+                    f"Los embeddings tienen dimensión {matrix.shape[1]}, pero el almacén del modelo {self.model} usa {self.dimension}."
+                )
+
+            self._refresh()
+            # Si una escritura quedó a medias, se descartan las filas incompletas.
+            for path, row_size in [
+                (self.vectors_path, self.dimension * 4),
+                (self.hashes_path, HASH_SIZE),
+            ]:
+                with open(path, "ab"):
+                    pass
+                os.truncate(path, self.rows * row_size)
+
+            new_rows = {}
+            for row, content_hash in enumerate(hashes):
+                key = bytes.fromhex(content_hash)
+                if key not in self.index and key not in new_rows:
+                    new_rows[key] = row
+            if not new_rows:
+                return
+
+            with open(self.vectors_path, "ab") as vectors_file:
+                vectors_file.write(matrix[list(new_rows.values())].tobytes())
+            with open(self.hashes_path, "ab") as hashes_file:
+                hashes_file.write(b"".join(new_rows.keys()))
+
+            for key in new_rows:
+                self.index[key] = self.rows
+                self.rows += 1
+            self._vectors = None
+
+
+class EmbeddingStore:
+    """
+    Almacén local de embeddings direccionado por contenido, con llave (modelo, sha512 del chunk).
+
+    Permite reutilizar los embeddings ya calculados al recargar la base de datos (por ejemplo
+    después de un `--reset` o al cambiar de engine), calculando solo los de chunks nuevos.
+    """
+
+    def __init__(self, root_directory: str):
+        """
+        Args:
+            root_directory (str): Directorio donde se guarda una partición por modelo.
+        """
+        self.root_directory = root_directory
+        self._partitions = {}
+        self._lock = threading.Lock()
+
+    def get_partition(self, model: str) -> _ModelPartition:
+        with self._lock:
+            partition = self._partitions.get(model)
+            if partition is None:
+                directory_name = re.sub(r"[^\w.-]", "_", model)
+                partition = _ModelPartition(
+                    os.path.join(self.root_directory, directory_name), model
+                )
+                self._partitions[model] = partition
+            return partition
+
+    def get_many(self, model: str, hashes: List[str]) -> List[Optional[List[float]]]:
+        """
+        Args:
+            model (str): El nombre del modelo de embeddings.
+            hashes (List[str]): Los hashes SHA-512 (hexadecimales) del contenido de cada chunk.
+
+        Returns:
+            List[Optional[List[float]]]: El embedding de cada hash, o None si no está almacenado.
+        """
+        return self.get_partition(model).get_many(hashes)
+
+    def put_many(
+        self, model: str, hashes: List[str], vectors: List[List[float]]
+    ) -> None:
+        """
+        Args:
+            model (str): El nombre del modelo de embeddings.
+            hashes (List[str]): Los hashes SHA-512 (hexadecimales) del contenido de cada chunk.
+            vectors (List[List[float]]): El embedding de cada hash.
+        """
+        self.get_partition(model).put_many(hashes, vectors)
+
+
+class StoreBackedEmbeddings(Embeddings):
+    """
+    Envoltorio de un modelo de embeddings que obtiene los embeddings de documentos desde un
+    `EmbeddingStore` y solo llama al modelo para los chunks que nunca se han visto.
+
+    La llave es el SHA-512 del texto, que coincide con `page_content_sha512` de cada chunk.
+    Los embeddings de queries se delegan directamente al modelo.
+    """
+
+    def __init__(self, embedding_model: Embeddings, embedding_store: EmbeddingStore):
+        """
+        Args:
+            embedding_model (Embeddings): El modelo de embeddings a envolver.
+            embedding_store (EmbeddingStore): El almacén de embeddings.
+        """
+        self.embedding_model = embedding_model
+        self.embedding_store = embedding_store
+        self.model = get_embedding_model_name(embedding_model)
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, texts: List[str]):
+        hashes = [hash_content(text) for text in texts]
+        vectors = self.embedding_store.get_many(self.model, hashes)
+        missing = {}
+        for content_hash, text, vector in zip(hashes, texts, vectors):
+            if vector is None:
+                missing[content_hash] = text
+        self.hits += len(texts) - sum(vector is None for vector in vectors)
+        self.misses += len(missing)
+        return hashes, vectors, missing
+
+    def _merge(self, hashes, vectors, missing, new_vectors) -> List[List[float]]:
+        self.embedding_store.put_many(self.model, list(missing), new_vectors)
+        computed = dict(zip(missing, new_vectors))
+        return [
+            vector if vector is not None else computed[content_hash]
+            for content_hash, vector in zip(hashes, vectors)
+        ]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes, vectors, missing = self._lookup(texts)
+        new_vectors = (
+            self.embedding_model.embed_documents(list(missing.values()))
+            if missing
+            else []
+        )
+        return self._merge(hashes, vectors, missing, new_vectors)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes, vectors, missing = self._lookup(texts)
+        new_vectors = (
+            await self.embedding_model.aembed_documents(list(missing.values()))
+            if missing
+            else []
+        )
+        return self._merge(hashes, vectors, missing, new_vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embedding_model.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embedding_model.aembed_query(text)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: Chunks encontrados en el almacén y chunks que se enviaron al modelo.
+        """
+        return {"hits": self.hits, "misses": self.misses}
@@ -1,10 +1,12 @@
 import json
 import os
 import hashlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from datetime import datetime
-from typing import List, Dict
+from pathlib import Path
+from typing import Iterator, List, Dict, Optional, Tuple
 from dotenv import load_dotenv
-from langchain_community.document_loaders import PyPDFDirectoryLoader
+from langchain_community.document_loaders import PyPDFDirectoryLoader, PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.schema.document import Document
 from langchain_ollama import OllamaEmbeddings
@@ -15,6 +17,8 @@ from logging.handlers import RotatingFileHandler
 load_dotenv(override=True)
 DOCUMENTS_PATH = os.getenv("DOCUMENTS_PATH")
 MESSAGES_PATH = os.getenv("MESSAGES_PATH")
+# Mismo patron que utiliza PyPDFDirectoryLoader.
+PDF_GLOB = "**/[!.]*.pdf"
 
 # Set up logging
 logger = logging.getLogger()
@@ -43,7 +47,9 @@ def load_pdf_documents(path: str = DOCUMENTS_PATH) -> List[Document]:
     return documents
 
 
-def load_pdf_documents_subdirectories(path: str) -> List[List[Document]]:
+def load_pdf_documents_subdirectories(
+    path: str, max_workers: Optional[int] = None
+) -> List[List[Document]]:
     """
     Carga documentos PDF desde cada subdirectorio dentro del directorio especificado.
 
@@ -62,6 +68,7 @@ def load_pdf_documents_subdirectories(path: str) -> List[List[Document]]:
 
     Parámetros:
         path (str): Ruta del directorio principal que contiene los subdirectorios con los documentos PDF.
+        max_workers (int, opcional): Cantidad de procesos que extraen el texto de los PDFs. Por defecto, la cantidad de CPUs.
 
     Retorna:
         List[List[Document]]: Una lista donde cada elemento es una lista de objetos Document correspondientes a un subdirectorio.
@@ -70,50 +77,172 @@ def load_pdf_documents_subdirectories(path: str) -> List[List[Document]]:
         - Los subdirectorios deben contener un archivo "PDF File Names.json" para enriquecer con título y enlace.
         - Si no se encuentra una coincidencia en el JSON, se imprime una advertencia.
         - Se incrementa en 1 el número de página para corregir la indexación basada en cero del cargador de PDFs.
+        - La extracción se realiza en paralelo, un archivo por tarea (ver `iter_pdf_documents_subdirectories`).
     """
-    subdir_documents = []
+    subdir_documents = {subdir: [] for subdir, _ in list_pdf_files_subdirectories(path)}
+    file_documents = dict(iter_pdf_documents_subdirectories(path, max_workers))
 
+    for subdir, file_path in list_pdf_files_subdirectories(path):
+        subdir_documents[subdir].extend(file_documents[file_path])
+
+    return list(subdir_documents.values())
+
+
+def list_pdf_files_subdirectories(path: str) -> List[Tuple[str, str]]:
+    """
+    Lista los archivos PDF de cada subdirectorio dentro del directorio especificado.
+
+    Args:
+        path (str): Ruta del directorio principal que contiene los subdirectorios con los documentos PDF.
+
+    Returns:
+        List[Tuple[str, str]]: Pares (subdirectorio, ruta del archivo PDF), en orden.
+    """
+    pdf_files = []
     for subdir, _, _ in os.walk(path):
         if subdir == path:
             continue
+        subdir_path = Path(subdir)
+        for file_path in sorted(subdir_path.glob(PDF_GLOB)):
+            relative_parts = file_path.relative_to(subdir_path).parts
+            if file_path.is_file() and not any(
+                part.startswith(".") for part in relative_parts
+            ):
+                pdf_files.append((subdir, str(file_path)))
+    return pdf_files
+
+
+def load_pdf_file(file_path: str) -> List[Document]:
+    """
+    Extrae el texto de cada página de un archivo PDF.
+
+    Args:
+        file_path (str): Ruta al archivo PDF.
+
+    Returns:
+        List[Document]: Un Document por página, con la ruta del archivo en `source`.
+    """
+    documents = PyPDFLoader(file_path).load()
+    for document in documents:
+        document.metadata["source"] = file_path
+    return documents
+
+
+def load_pdf_links(subdir: str) -> Dict[Tuple[str, str], Dict]:
+    """
+    Carga el archivo "PDF File Names.json" de un subdirectorio como un diccionario indexado por (año, autor).
+
+    Args:
+        subdir (str): Ruta del subdirectorio.
+
+    Returns:
+        Dict[Tuple[str, str], Dict]: Las entradas del JSON indexadas por (año, autor en minúsculas). Vacío si no existe el JSON.
+    """
+    json_path = os.path.join(subdir, "PDF File Names.json")
+    links_lookup = {}
+    if os.path.exists(json_path):
+        with open(json_path, "r", encoding="utf-8") as json_file:
+            for entry in json.load(json_file):
+                # Se mantiene la primera entrada en caso de repetidos.
+                links_lookup.setdefault((entry["year"], entry["author"].lower()), entry)
+    return links_lookup
+
+
+def enrich_pdf_documents(
+    documents: List[Document],
+    project_name: str,
+    links_lookup: Dict[Tuple[str, str], Dict],
+) -> List[Document]:
+    """
+    Agrega a cada página el nombre del proyecto, autor y año (desde el nombre del archivo), y el
+    título y enlace (desde el JSON del subdirectorio).
+
+    Args:
+        documents (List[Document]): Las páginas de un archivo PDF.
+        project_name (str): El nombre del proyecto.
+        links_lookup (Dict[Tuple[str, str], Dict]): Las entradas del JSON indexadas por (año, autor).
+
+    Returns:
+        List[Document]: Las mismas páginas con la metadata agregada.
+    """
+    for docu in documents:
 
-        json_path = os.path.join(subdir, "PDF File Names.json")
-        links_data = []
-        if os.path.exists(json_path):
-            with open(json_path, "r", encoding="utf-8") as json_file:
-                links_data = json.load(json_file)
-
-        documents = load_pdf_documents(subdir)
-        for docu in documents:
-
-            filename_parts = docu.metadata["source"].split("/")[-1].split("_")
-            docu.metadata["project_name"] = subdir.split("/")[-1]
-            docu.metadata["author"] = filename_parts[1].replace("-", " ").lower()
-            docu.metadata["year"] = filename_parts[0]
-
-            # Se busca el link y titulo del documento en el JSON utilizando la fecha y el autor
-            matching_entry = next(
-                (
-                    entry
-                    for entry in links_data
-                    if entry["year"] == docu.metadata["year"]
-                    and entry["author"].lower() == docu.metadata["author"].lower()
-                ),
-                None,
+        filename_parts = docu.metadata["source"].split("/")[-1].split("_")
+        docu.metadata["project_name"] = project_name
+        docu.metadata["author"] = filename_parts[1].replace("-", " ").lower()
+        docu.metadata["year"] = filename_parts[0]
+
+        # Se busca el link y titulo del documento en el JSON utilizando la fecha y el autor
+        matching_entry = links_lookup.get(
+            (docu.metadata["year"], docu.metadata["author"].lower())
+        )
+        if matching_entry:
+            docu.metadata["title"] = matching_entry["title"]
+            docu.metadata["link"] = matching_entry["link"]
+            # El PDF loader empieza a contar las paginas desde 0. Se le suma 1.
+            docu.metadata["page"] = docu.metadata["page"] + 1
+        else:
+            print(
+                f"Documento NO encontrado: {docu.metadata}. Revisar que el autor, fecha y titulo sea igual entre el JSON y el nombre del archivo del documento."
             )
-            if matching_entry:
-                docu.metadata["title"] = matching_entry["title"]
-                docu.metadata["link"] = matching_entry["link"]
-                # El PDF loader empieza a contar las paginas desde 0. Se le suma 1.
-                docu.metadata["page"] = docu.metadata["page"] + 1
-            else:
-                print(
-                    f"Documento NO encontrado: {docu.metadata}. Revisar que el autor, fecha y titulo sea igual entre el JSON y el nombre del archivo del documento."
-                )
+    return documents
 
-        subdir_documents.append(documents)
 
-    return subdir_documents
+def iter_pdf_documents_subdirectories(
+    path: str, max_workers: Optional[int] = None
+) -> Iterator[Tuple[str, List[Document]]]:
+    """
+    Extrae en paralelo los PDFs de cada subdirectorio, usando un pool de procesos con una tarea
+    por archivo, y entrega cada archivo a medida que termina (no en orden).
+
+    Args:
+        path (str): Ruta del directorio principal que contiene los subdirectorios con los documentos PDF.
+        max_workers (int, opcional): Cantidad de procesos. Por defecto, la cantidad de CPUs.
+
+    Yields:
+        Tuple[str, List[Document]]: La ruta del archivo PDF y sus páginas con la metadata agregada.
+    """
+    return iter_pdf_documents(list_pdf_files_subdirectories(path), max_workers)
+
+
+def iter_pdf_documents(
+    pdf_files: List[Tuple[str, str]],
+    max_workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+) -> Iterator[Tuple[str, List[Document]]]:
+    """
+    Extrae en paralelo los PDFs indicados, usando un pool de procesos con una tarea por archivo,
+    y entrega cada archivo a medida que termina (no en orden).
+
+    Args:
+        pdf_files (List[Tuple[str, str]]): Pares (subdirectorio, ruta del archivo PDF), como los entrega `list_pdf_files_subdirectories`.
+        max_workers (int, opcional): Cantidad de procesos. Por defecto, la cantidad de CPUs.
+        max_in_flight (int, opcional): Cantidad máxima de archivos enviados al pool sin haber sido consumidos. Por defecto, sin límite.
+
+    Yields:
+        Tuple[str, List[Document]]: La ruta del archivo PDF y sus páginas con la metadata agregada.
+    """
+    links_lookups = {}
+    pending_files = list(reversed(pdf_files))
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        while pending_files or futures:
+            while pending_files and (
+                max_in_flight is None or len(futures) < max_in_flight
+            ):
+                subdir, file_path = pending_files.pop()
+                futures[executor.submit(load_pdf_file, file_path)] = (subdir, file_path)
+
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                subdir, file_path = futures.pop(future)
+                if subdir not in links_lookups:
+                    links_lookups[subdir] = load_pdf_links(subdir)
+                documents = enrich_pdf_documents(
+                    future.result(), subdir.split("/")[-1], links_lookups[subdir]
+                )
+                yield file_path, documents
 
 
 def split_documents_subdirectories(
@@ -1,17 +1,22 @@
 import argparse
 import os
 import time
-from app.config import DOCUMENTS_PATH, vector_db_engine
+from app.config import (
+    DOCUMENTS_PATH,
+    INGESTION_CHECKPOINT_PATH,
+    INGESTION_MANIFEST_PATH,
+    vector_db_engine,
+)
 from app.config import llm
+from app.services.ingestion_services import plan_ingestion, run_ingestion_pipeline
+from app.utils.ingestion_utils import IngestionCheckpoint, IngestionManifest
+from app.utils.quantization_utils import benchmark_quantization
 from app.services.llm_services import query_llm
 from app.utils.embedding_utils import (
     chunk_messages_with_context,
     extract_pdf_metadata,
-    hash_documents,
     load_json,
-    load_pdf_documents_subdirectories,
     make_chat_chunks_into_documents,
-    split_documents_subdirectories,
     update_mongodb_with_links,
 )
 
@@ -39,34 +44,99 @@ def main():
         action="store_true",
         help="Obtiene los nombres de los proyectos.",
     )
+    parser.add_argument(
+        "--ensure-indexes",
+        action="store_true",
+        help="Crea y verifica los indices de la base de datos.",
+    )
+    parser.add_argument(
+        "--recreate-indexes",
+        action="store_true",
+        help="Junto a --ensure-indexes, reemplaza los indices que existen con opciones distintas.",
+    )
+    parser.add_argument(
+        "--pdf-workers",
+        type=int,
+        default=None,
+        help="Cantidad de procesos para extraer el texto de los PDFs. Por defecto, la cantidad de CPUs.",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        default=INGESTION_CHECKPOINT_PATH,
+        help="Archivo de checkpoint para reanudar una carga interrumpida.",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        default=INGESTION_MANIFEST_PATH,
+        help="Manifiesto de archivos cargados. Los archivos sin cambios no se vuelven a procesar.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Junto a --load, solo informa que archivos se agregarian, modificarian o eliminarian.",
+    )
+    parser.add_argument(
+        "--rebuild-keyword-index",
+        action="store_true",
+        help="Reconstruye el indice de keywords BM25 desde los documentos, sin recalcular embeddings.",
+    )
+    parser.add_argument(
+        "--benchmark-quantization",
+        action="store_true",
+        help="Compara memoria y recall@k de los embeddings cuantizados (engines locales).",
+    )
+    parser.add_argument(
+        "--benchmark-k",
+        type=int,
+        default=10,
+        help="Cantidad de resultados por consulta del benchmark.",
+    )
+    parser.add_argument(
+        "--benchmark-queries",
+        type=int,
+        default=100,
+        help="Cantidad de consultas del benchmark, tomadas al azar del corpus.",
+    )
     args = parser.parse_args()
 
-    if args.load:
+    if args.ensure_indexes:
+        print("Verificando indices de la base de datos...")
+        print_index_status(
+            vector_db_engine.ensure_indexes(recreate_mismatched=args.recreate_indexes)
+        )
+
+    if args.load and args.dry_run:
+        print_ingestion_plan(plan_ingestion(DOCUMENTS_PATH, args.manifest))
+    elif args.load:
         overall_start_time = time.perf_counter()
+        print_index_status(vector_db_engine.ensure_indexes())
         print("Cargando documentos almacenados en subdirectorios...")
-        start_time = time.perf_counter()
-        documents_directory = load_pdf_documents_subdirectories(DOCUMENTS_PATH)
-        print(
-            f"Documentos cargados, tiempo demorado: { time.perf_counter() - start_time} segundos."
+        summary = run_ingestion_pipeline(
+            vector_db_engine,
+            DOCUMENTS_PATH,
+            checkpoint_path=args.checkpoint,
+            manifest_path=args.manifest,
+            chunk_size=512,
+            chunk_overlap=64,
+            max_workers=args.pdf_workers,
         )
-        print("Partiendo contenido en chunks...")
-        start_time = time.perf_counter()
-        chunks = split_documents_subdirectories(documents_directory, 512, 64)
-        chunks_with_sha512 = hash_documents(chunks)
         print(
-            f"Se crearon {len(chunks_with_sha512)} chunks. Tiempo demorado: { time.perf_counter() - start_time} segundos."
+            f"Se procesaron {summary['files']} archivos ({summary['skipped_files']} omitidos por el checkpoint) y {summary['chunks']} chunks."
         )
-        print("Cargando base de datos con chunks...")
-        start_time = time.perf_counter()
-
-        added_ids = vector_db_engine.load_db(chunks_with_sha512)
-
         print(
-            f"Se agregaron {len(added_ids)} documentos. Tiempo demorado: { time.perf_counter() - start_time} segundos."
+            f"Archivos sin cambios: {summary['unchanged_files']}. Archivos eliminados: {summary['removed_files']}."
         )
+        print(f"Se agregaron {summary['added']} documentos.")
+        print_ingestion_summary(summary, time.perf_counter() - overall_start_time)
         print(
             f"Tiempo total en el cargado de documentos: {time.perf_counter() - overall_start_time} segundos."
         )
+    if args.rebuild_keyword_index:
+        print("Reconstruyendo el indice de keywords desde los documentos almacenados...")
+        added = vector_db_engine.rebuild_keyword_index()
+        print(f"Se indexaron {added} documentos.")
     if args.load_msg:
         messages = load_json(file_path="app/data/messages/chat_history_each_msg.json")
         msg_chunks = chunk_messages_with_context(messages)
@@ -76,6 +146,10 @@ def main():
     if args.reset:
         print("Eliminando contenidos de base de datos")
         vector_db_engine.clear_db()
+        # Sin el manifiesto ni el checkpoint, la siguiente carga vuelve a procesar todos
+        # los archivos, incluidos los de una carga interrumpida.
+        IngestionManifest(args.manifest).clear()
+        IngestionCheckpoint(args.checkpoint).clear()
     if args.query:
         query_string = args.query
         print(f"La consulta es: {query_string}")
@@ -98,6 +172,61 @@ def main():
     if args.project_names:
         project_names = vector_db_engine.get_project_names()
         print(project_names)
+    if args.benchmark_quantization:
+        if not hasattr(vector_db_engine, "chunk_store"):
+            print(
+                "El benchmark de cuantización requiere un engine local (NumpyEngine o HnswEngine)."
+            )
+        else:
+            print_quantization_benchmark(
+                benchmark_quantization(
+                    vector_db_engine.chunk_store,
+                    k=args.benchmark_k,
+                    sample_size=args.benchmark_queries,
+                ),
+                args.benchmark_k,
+            )
+
+    vector_db_engine.close()
+
+
+def print_index_status(index_status):
+    if not index_status:
+        print("El engine no requiere indices.")
+    for index_name, status in index_status.items():
+        print(f"\t{index_name}: {status}")
+
+
+def print_ingestion_plan(changes):
+    labels = {
+        "added": "Archivos nuevos",
+        "changed": "Archivos modificados",
+        "removed": "Archivos eliminados",
+    }
+    for change, label in labels.items():
+        print(f"{label}: {len(changes[change])}")
+        for file_path in changes[change]:
+            print(f"\t{file_path}")
+    print(f"Archivos sin cambios: {len(changes['unchanged'])}")
+
+
+def print_ingestion_summary(summary, elapsed_seconds):
+    print(
+        f"Throughput: ~{summary['added'] / max(elapsed_seconds, 1e-9):.1f} chunks/s. "
+        f"Tiempo de embeddings acumulado: {summary['embedding_seconds']:.2f} segundos. "
+        f"Tiempo de escritura acumulado: {summary['write_seconds']:.2f} segundos."
+    )
+
+
+def print_quantization_benchmark(report, k):
+    if not report:
+        print("No hay embeddings almacenados.")
+    for result in report:
+        print(
+            f"{result['method']:>16}: {result['bytes'] / 2**20:.1f} MiB "
+            f"({result['memory_ratio']:.0%} de float32), recall@{k}: {result['recall']:.3f}, "
+            f"{result['milliseconds']:.2f} ms por consulta."
+        )
 
 
 if __name__ == "__main__":
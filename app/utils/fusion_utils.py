@@ -0,0 +1,63 @@
+from typing import Dict, List, Optional
+from langchain.schema import Document
+from app.utils.embedding_utils import hash_content
+
+
+def document_key(document: Document) -> str:
+    """
+    Obtiene la llave que identifica el contenido de un documento: su `page_content_sha512`, o
+    el hash de su contenido si no lo tiene (por ejemplo, en los mensajes).
+
+    Args:
+        document (Document): El documento.
+
+    Returns:
+        str: La llave del documento.
+    """
+    return document.metadata.get("page_content_sha512") or hash_content(
+        document.page_content
+    )
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: List[List[Document]],
+    weights: Optional[List[float]] = None,
+    k: int = 60,
+    top_n: Optional[int] = None,
+) -> List[Document]:
+    """
+    Combina varias listas de documentos ordenadas por relevancia mediante reciprocal rank
+    fusion (RRF): cada documento suma `peso / (k + posición)` por cada lista en que aparece.
+
+    Los documentos repetidos (mismo contenido) se cuentan una sola vez por lista y se entregan
+    una sola vez, usando la primera instancia encontrada.
+
+    Args:
+        ranked_lists (List[List[Document]]): Las listas de documentos, cada una de mayor a menor relevancia.
+        weights (List[float], opcional): El peso de cada lista. Por defecto, todas pesan 1.
+        k (int): Constante que suaviza la diferencia entre las primeras posiciones. Default: 60.
+        top_n (int, opcional): Cantidad máxima de documentos a retornar. Por defecto, todos.
+
+    Returns:
+        List[Document]: Los documentos sin repetir, de mayor a menor puntaje combinado.
+    """
+    if weights is None:
+        weights = [1.0] * len(ranked_lists)
+
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranked_list, weight in zip(ranked_lists, weights):
+        seen_keys = set()
+        for rank, document in enumerate(ranked_list, start=1):
+            key = document_key(document)
+            if key in seen_keys:
+                continue
+            seen_keys.add(key)
+            documents.setdefault(key, document)
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+
+    # sorted es estable: ante un empate se mantiene el orden de aparición.
+    ranked_keys = sorted(scores, key=lambda key: scores[key], reverse=True)
+    if top_n is not None:
+        ranked_keys = ranked_keys[:top_n]
+    return [documents[key] for key in ranked_keys]
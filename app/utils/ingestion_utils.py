@@ -0,0 +1,372 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+from langchain.schema.document import Document
+from langchain_core.embeddings import Embeddings
+
+WriteFunction = Callable[[List[Document], List[List[float]]], List[str]]
+
+
+class IngestionWriter:
+    """
+    Escribe documentos en la base de datos calculando sus embeddings por lotes.
+
+    Los lotes de embeddings se envían al modelo desde un pool acotado de hilos. A medida que
+    cada lote termina (en cualquier orden) sus documentos se acumulan y se escriben en lotes
+    de escritura. Como solo se mantienen `max_pending_batches` lotes en vuelo, el cálculo de
+    embeddings nunca se adelanta demasiado a la escritura.
+    """
+
+    def __init__(
+        self,
+        embedding_batch_size: int = 64,
+        embedding_workers: int = 4,
+        write_batch_size: int = 512,
+        max_pending_batches: int = 8,
+    ):
+        """
+        Args:
+            embedding_batch_size (int): Cantidad de chunks por llamada al modelo de embeddings. Default: 64.
+            embedding_workers (int): Cantidad de llamadas concurrentes al modelo de embeddings. Default: 4.
+            write_batch_size (int): Cantidad de chunks por escritura en la base de datos. Default: 512.
+            max_pending_batches (int): Cantidad máxima de lotes de embeddings en vuelo o esperando escritura. Default: 8.
+        """
+        self.embedding_batch_size = embedding_batch_size
+        self.embedding_workers = embedding_workers
+        self.write_batch_size = write_batch_size
+        self.max_pending_batches = max(max_pending_batches, embedding_workers)
+        self.batch_stats = []
+
+    def write(
+        self,
+        documents: List[Document],
+        embedding_model: Embeddings,
+        write_function: WriteFunction,
+    ) -> List[str]:
+        """
+        Calcula los embeddings de los documentos y los escribe en la base de datos.
+
+        Args:
+            documents (List[Document]): Los documentos a escribir.
+            embedding_model (Embeddings): El modelo de embeddings.
+            write_function (WriteFunction): Función que escribe un lote de documentos con sus embeddings y retorna sus IDs.
+
+        Returns:
+            List[str]: Los IDs de los documentos escritos.
+        """
+        self.reset()
+        added_ids = []
+        pending_documents = []
+        pending_embeddings = []
+        embedding_seconds = 0.0
+
+        batches = [
+            documents[i : i + self.embedding_batch_size]
+            for i in range(0, len(documents), self.embedding_batch_size)
+        ]
+        batches.reverse()
+
+        with ThreadPoolExecutor(max_workers=self.embedding_workers) as executor:
+            in_flight = set()
+            while batches or in_flight:
+                while batches and len(in_flight) < self.max_pending_batches:
+                    in_flight.add(
+                        executor.submit(_embed_batch, embedding_model, batches.pop())
+                    )
+
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch, embeddings, seconds = future.result()
+                    pending_documents.extend(batch)
+                    pending_embeddings.extend(embeddings)
+                    embedding_seconds += seconds
+
+                while len(pending_documents) >= self.write_batch_size or (
+                    pending_documents and not batches and not in_flight
+                ):
+                    added_ids.extend(
+                        self._write_batch(
+                            pending_documents[: self.write_batch_size],
+                            pending_embeddings[: self.write_batch_size],
+                            write_function,
+                            embedding_seconds,
+                        )
+                    )
+                    del pending_documents[: self.write_batch_size]
+                    del pending_embeddings[: self.write_batch_size]
+                    embedding_seconds = 0.0
+
+        return added_ids
+
+    def _write_batch(
+        self,
+        documents: List[Document],
+        embeddings: List[List[float]],
+        write_function: WriteFunction,
+        embedding_seconds: float,
+    ) -> List[str]:
+        start_time = time.perf_counter()
+        batch_ids = write_function(documents, embeddings)
+        batch_end = time.perf_counter()
+        write_seconds = batch_end - start_time
+        # El throughput se mide en tiempo real desde el lote anterior, ya que los
+        # embeddings de distintos lotes se calculan en paralelo.
+        elapsed = max(batch_end - self._last_batch_end, 1e-9)
+        self._last_batch_end = batch_end
+
+        batch_number = len(self.batch_stats) + 1
+        stats = {
+            "batch": batch_number,
+            "documents": len(documents),
+            "written": len(batch_ids),
+            "embedding_seconds": embedding_seconds,
+            "write_seconds": write_seconds,
+            "documents_per_second": len(documents) / elapsed,
+        }
+        self.batch_stats.append(stats)
+        print(
+            f"Lote {batch_number}: {len(batch_ids)}/{len(documents)} chunks escritos. "
+            f"Embeddings: {embedding_seconds:.2f} s, escritura: {write_seconds:.2f} s "
+            f"(~{stats['documents_per_second']:.1f} chunks/s)."
+        )
+        return batch_ids
+
+    def reset(self) -> None:
+        """
+        Descarta las estadísticas de la última escritura. Debe llamarse antes de cada
+        `load_db` cuyo resumen se vaya a leer, ya que `load_db` no llama a `write` cuando
+        todos los documentos ya existen.
+        """
+        self.batch_stats = []
+        self._last_batch_end = time.perf_counter()
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Returns:
+            Dict[str, float]: Totales de la última escritura: lotes, chunks, segundos de embeddings y de escritura.
+        """
+        return {
+            "batches": len(self.batch_stats),
+            "documents": sum(stats["documents"] for stats in self.batch_stats),
+            "written": sum(stats["written"] for stats in self.batch_stats),
+            "embedding_seconds": sum(
+                stats["embedding_seconds"] for stats in self.batch_stats
+            ),
+            "write_seconds": sum(stats["write_seconds"] for stats in self.batch_stats),
+        }
+
+
+def _embed_batch(
+    embedding_model: Embeddings, batch: List[Document]
+) -> Tuple[List[Document], List[List[float]], float]:
+    start_time = time.perf_counter()
+    embeddings = embedding_model.embed_documents(
+        [document.page_content for document in batch]
+    )
+    return batch, embeddings, time.perf_counter() - start_time
+
+
+class IngestionCheckpoint:
+    """
+    Registro persistente de los archivos fuente cuya carga en la base de datos ya terminó.
+
+    Permite reanudar una carga interrumpida sin volver a procesar esos archivos. El archivo
+    se reescribe de forma atómica cada vez que se marca un grupo de archivos como completado.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Ruta al archivo JSON del checkpoint.
+        """
+        self.path = path
+        self.completed_files = set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as checkpoint_file:
+                self.completed_files = set(json.load(checkpoint_file)["completed_files"])
+
+    def is_completed(self, file_path: str) -> bool:
+        return file_path in self.completed_files
+
+    def mark_completed(self, file_paths: List[str]) -> None:
+        """
+        Marca los archivos como completados y guarda el checkpoint en disco.
+
+        Args:
+            file_paths (List[str]): Las rutas de los archivos completados.
+        """
+        self.completed_files.update(file_paths)
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as checkpoint_file:
+            json.dump(
+                {"completed_files": sorted(self.completed_files)},
+                checkpoint_file,
+                ensure_ascii=False,
+                indent=4,
+            )
+        os.replace(temporary_path, self.path)
+
+    def clear(self) -> None:
+        """
+        Elimina el checkpoint. Se llama cuando la carga termina correctamente.
+        """
+        self.completed_files = set()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def iter_in_background(iterable: Iterable, maxsize: int) -> Iterator:
+    """
+    Consume un iterable desde un hilo aparte y entrega sus elementos a través de una cola acotada.
+
+    Permite que dos etapas de un pipeline de generadores avancen en paralelo, sin que la etapa
+    productora se adelante más de `maxsize` elementos a la consumidora. Si la etapa productora
+    falla, la excepción se relanza en el consumidor.
+
+    Args:
+        iterable (Iterable): La etapa productora.
+        maxsize (int): Cantidad máxima de elementos esperando en la cola.
+
+    Yields:
+        Any: Los elementos del iterable, en el mismo orden.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    end_of_stream = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                items.put((item, None))
+        except BaseException as e:
+            items.put((end_of_stream, e))
+            return
+        items.put((end_of_stream, None))
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item, error = items.get()
+        if item is end_of_stream:
+            if error is not None:
+                raise error
+            return
+        yield item
+
+
+class IngestionManifest:
+    """
+    Registro persistente de los archivos fuente ya cargados, indexado por ruta, con su tamaño,
+    fecha de modificación y hash SHA-256 del contenido.
+
+    Permite omitir los archivos que no cambiaron antes de extraer su texto. Un archivo con el
+    mismo tamaño y fecha de modificación se considera sin cambios; si alguno de ellos cambió, se
+    compara el hash del contenido.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Ruta al archivo JSON del manifiesto.
+        """
+        self.path = path
+        self.entries = {}
+        self._hashes = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as manifest_file:
+                self.entries = json.load(manifest_file)
+
+    def diff(self, file_paths: List[str]) -> Dict[str, List[str]]:
+        """
+        Compara los archivos actuales con el manifiesto.
+
+        Args:
+            file_paths (List[str]): Las rutas de los archivos fuente actuales.
+
+        Returns:
+            Dict[str, List[str]]: Las rutas agrupadas en "added", "changed", "unchanged" y "removed".
+        """
+        changes = {"added": [], "changed": [], "unchanged": [], "removed": []}
+        for file_path in file_paths:
+            entry = self.entries.get(file_path)
+            stat = os.stat(file_path)
+            if (
+                entry
+                and entry["size"] == stat.st_size
+                and entry["mtime"] == stat.st_mtime
+            ):
+                changes["unchanged"].append(file_path)
+                continue
+
+            content_hash = self._hash_file(file_path)
+            if entry is None:
+                changes["added"].append(file_path)
+            elif entry["sha256"] == content_hash:
+                # Solo cambió la fecha de modificación: se actualiza el registro.
+                self.record([file_path])
+                changes["unchanged"].append(file_path)
+            else:
+                changes["changed"].append(file_path)
+
+        current_files = set(file_paths)
+        changes["removed"] = sorted(
+            file_path for file_path in self.entries if file_path not in current_files
+        )
+        return changes
+
+    def record(self, file_paths: List[str]) -> None:
+        """
+        Registra el estado actual de los archivos en el manifiesto (sin guardarlo en disco).
+
+        Args:
+            file_paths (List[str]): Las rutas de los archivos cargados.
+        """
+        for file_path in file_paths:
+            stat = os.stat(file_path)
+            self.entries[file_path] = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "sha256": self._hash_file(file_path),
+            }
+
+    def forget(self, file_paths: List[str]) -> None:
+        """
+        Elimina archivos del manifiesto (sin guardarlo en disco).
+
+        Args:
+            file_paths (List[str]): Las rutas de los archivos a eliminar.
+        """
+        for file_path in file_paths:
+            self.entries.pop(file_path, None)
+
+    def save(self) -> None:
+        """
+        Guarda el manifiesto en disco de forma atómica.
+        """
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as manifest_file:
+            json.dump(self.entries, manifest_file, ensure_ascii=False, indent=4)
+        os.replace(temporary_path, self.path)
+
+    def clear(self) -> None:
+        """
+        Elimina el manifiesto. Debe llamarse cuando se vacía la base de datos.
+        """
+        self.entries = {}
+        self._hashes = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _hash_file(self, file_path: str) -> str:
+        stat = os.stat(file_path)
+        key = (file_path, stat.st_size, stat.st_mtime)
+        if key not in self._hashes:
+            sha256 = hashlib.sha256()
+            with open(file_path, "rb") as source_file:
+                for block in iter(lambda: source_file.read(1024 * 1024), b""):
+                    sha256.update(block)
+            self._hashes[key] = sha256.hexdigest()
+        return self._hashes[key]
@@ -1,97 +1,210 @@
 import re
+import threading
 import unicodedata
+from typing import List
 import spacy
+from spacy.language import Language
+from spacy.tokens import Doc
 from langchain.schema import Document
 from langchain_core.language_models import BaseLLM
+from app.utils.cache_utils import LRUCache
+
+SPACY_MODEL_NAME = "es_core_news_sm"
+# Para extraer keywords solo se necesita el POS (morphologizer + attribute_ruler).
+SPACY_EXCLUDED_COMPONENTS = ["parser", "ner", "lemmatizer"]
+KEYWORD_POS_TAGS = {"NOUN", "PROPN"}
+
+_nlp = None
+_nlp_load_lock = threading.Lock()
+_nlp_analysis_lock = threading.Lock()
+_keywords_cache = LRUCache(maxsize=2048)
+
+SPANISH_STOPWORDS = {
+    "de",
+    "la",
+    "que",
+    "el",
+    "en",
+    "y",
+    "a",
+    "los",
+    "se",
+    "del",
+    "las",
+    "un",
+    "por",
+    "con",
+    "no",
+    "una",
+    "su",
+    "para",
+    "es",
+    "al",
+    "como",
+    "mas",
+    "pero",
+    "sus",
+    "le",
+    "ya",
+    "o",
+    "este",
+    "si",
+    "me",
+    "sin",
+    "sobre",
+    "este",
+    "este",
+    "ser",
+    "entre",
+    "cuando",
+    "todo",
+    "tambien",
+    "muy",
+    "hasta",
+    "aqui",
+    "bien",
+    "aquel",
+    "cual",
+    "ella",
+    "esto",
+    "ese",
+    "solo",
+    "algunos",
+    "hacer",
+    "o",
+    "donde",
+}
 
 
 def preprocess_query(query: str) -> str:
+    return " ".join(tokenize_text(query))
 
-    spanish_stopwords = {
-        "de",
-        "la",
-        "que",
-        "el",
-        "en",
-        "y",
-        "a",
-        "los",
-        "se",
-        "del",
-        "las",
-        "un",
-        "por",
-        "con",
-        "no",
-        "una",
-        "su",
-        "para",
-        "es",
-        "al",
-        "como",
-        "mas",
-        "pero",
-        "sus",
-        "le",
-        "ya",
-        "o",
-        "este",
-        "si",
-        "me",
-        "sin",
-        "sobre",
-        "este",
-        "este",
-        "ser",
-        "entre",
-        "cuando",
-        "todo",
-        "tambien",
-        "muy",
-        "hasta",
-        "aqui",
-        "bien",
-        "aquel",
-        "cual",
-        "ella",
-        "esto",
-        "ese",
-        "solo",
-        "algunos",
-        "hacer",
-        "o",
-        "donde",
-    }
-
-    query = unicodedata.normalize("NFKD", query)
-    query = "".join([c for c in query if not unicodedata.combining(c)])
-
-    query = query.lower()
-    words = re.findall(r"\b\w+\b", query)
+
+def tokenize_text(text: str) -> List[str]:
+    """
+    Divide un texto en palabras sin acentos y en minúsculas, descartando las stopwords.
+    Es la tokenización usada por `preprocess_query` y por el índice BM25.
+
+    Args:
+        text (str): El texto a tokenizar.
+
+    Returns:
+        List[str]: Los tokens, en el orden en que aparecen.
+    """
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join([c for c in text if not unicodedata.combining(c)])
+
+    text = text.lower()
+    words = re.findall(r"\b\w+\b", text)
 
     keywords = []
     for word in words:
-        if word not in spanish_stopwords:
+        if word not in SPANISH_STOPWORDS:
             keywords.append(word)
 
-    return " ".join(keywords)
+    return keywords
 
 
-def preprocess_query_spacy(query: str) -> str:
+def get_spacy_pipeline() -> Language:
+    """
+    Obtiene el pipeline de spaCy compartido por todo el proceso.
 
-    nlp = spacy.load("es_core_news_sm")
+    El modelo se carga una sola vez, de forma perezosa y segura entre hilos, excluyendo los
+    componentes que no se utilizan para extraer keywords.
 
-    doc = nlp(query)
+    Returns:
+        Language: El pipeline de spaCy cargado.
+    """
+    global _nlp
+    if _nlp is None:
+        with _nlp_load_lock:
+            if _nlp is None:
+                _nlp = spacy.load(SPACY_MODEL_NAME, exclude=SPACY_EXCLUDED_COMPONENTS)
+    return _nlp
 
+
+def extract_keywords(doc: Doc) -> str:
+    """
+    Extrae los sustantivos y nombres propios de un documento analizado por spaCy.
+
+    Args:
+        doc (Doc): El documento analizado.
+
+    Returns:
+        str: Las keywords en minúsculas separadas por espacios.
+    """
     keywords = []
 
     for token in doc:
-        if token.is_alpha and token.pos_ in {"NOUN", "PROPN"}:
+        if token.is_alpha and token.pos_ in KEYWORD_POS_TAGS:
             keywords.append(token.text.lower())
 
     return " ".join(keywords)
 
 
+def preprocess_query_spacy(query: str) -> str:
+    """
+    Extrae las keywords de una query utilizando el pipeline de spaCy compartido.
+
+    Los resultados de las queries analizadas recientemente se mantienen en un cache LRU.
+
+    Args:
+        query (str): La query en lenguaje natural.
+
+    Returns:
+        str: Las keywords de la query separadas por espacios.
+    """
+    keywords = _keywords_cache.get(query)
+    if keywords is not None:
+        return keywords
+
+    nlp = get_spacy_pipeline()
+    with _nlp_analysis_lock:
+        doc = nlp(query)
+
+    keywords = extract_keywords(doc)
+    _keywords_cache.put(query, keywords)
+    return keywords
+
+
+def preprocess_queries_spacy(queries: List[str], batch_size: int = 64) -> List[str]:
+    """
+    Extrae las keywords de varias queries a la vez utilizando `nlp.pipe`.
+
+    Solo se analizan las queries que no están en el cache LRU; el resultado mantiene el orden de entrada.
+
+    Args:
+        queries (List[str]): Las queries en lenguaje natural.
+        batch_size (int): Tamaño de los lotes entregados a spaCy. Default: 64.
+
+    Returns:
+        List[str]: Las keywords de cada query, en el mismo orden que `queries`.
+    """
+    results = {}
+    pending = []
+    for query in queries:
+        if query in results:
+            continue
+        keywords = _keywords_cache.get(query)
+        if keywords is None:
+            results[query] = None
+            pending.append(query)
+        else:
+            results[query] = keywords
+
+    if pending:
+        nlp = get_spacy_pipeline()
+        with _nlp_analysis_lock:
+            docs = list(nlp.pipe(pending, batch_size=batch_size))
+        for query, doc in zip(pending, docs):
+            keywords = extract_keywords(doc)
+            _keywords_cache.put(query, keywords)
+            results[query] = keywords
+
+    return [results[query] for query in queries]
+
+
 def transform_to_document(item_dict: dict) -> Document:
 
     page_content = item_dict.get("page_content", "")
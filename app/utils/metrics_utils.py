@@ -0,0 +1,258 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterator, List, Tuple, TypeVar
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily
+
+T = TypeVar("T")
+
+# Buckets pensados para etapas que van desde milisegundos (búsquedas) hasta decenas de
+# segundos (generación del LLM).
+STAGE_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+)
+DOCUMENT_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64)
+TOKEN_BUCKETS = (0, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+STAGE_DURATION = Histogram(
+    "rag_stage_duration_seconds",
+    "Duración de cada etapa del pipeline RAG.",
+    ["stage", "engine", "project"],
+    buckets=STAGE_BUCKETS,
+)
+RETRIEVED_DOCUMENTS = Histogram(
+    "rag_retrieved_documents",
+    "Cantidad de documentos obtenidos por cada búsqueda (vector, keyword) y entregados al LLM (context).",
+    ["source", "engine", "project"],
+    buckets=DOCUMENT_BUCKETS,
+)
+CONTEXT_TOKENS = Histogram(
+    "rag_context_tokens",
+    "Tokens del contexto entregado al LLM.",
+    ["engine", "project"],
+    buckets=TOKEN_BUCKETS,
+)
+PROMPT_TOKENS = Counter(
+    "rag_prompt_tokens",
+    "Tokens de los prompts enviados al LLM.",
+    ["engine", "project", "model"],
+)
+COMPLETION_TOKENS = Counter(
+    "rag_completion_tokens",
+    "Tokens de las respuestas generadas por el LLM.",
+    ["engine", "project", "model"],
+)
+EMBEDDING_BATCH_SIZE = Histogram(
+    "rag_embedding_batch_size",
+    "Queries enviadas al modelo de embeddings en cada micro-batch.",
+    buckets=BATCH_SIZE_BUCKETS,
+)
+EMBEDDING_BATCH_WAIT = Histogram(
+    "rag_embedding_batch_wait_seconds",
+    "Espera de cada query en la cola del micro-batcher de embeddings.",
+    buckets=STAGE_BUCKETS,
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "rag_requests_in_progress",
+    "Consultas en curso por endpoint.",
+    ["endpoint"],
+)
+
+
+class CacheStatsCollector:
+    """
+    Expone como métricas de Prometheus los aciertos y fallos de los caches en memoria, leídos
+    desde sus contadores al momento de cada scrape.
+    """
+
+    def __init__(self):
+        self._sources: List[Tuple[str, Callable[[], Dict[str, int]]]] = []
+        self._lock = threading.Lock()
+
+    def add_source(
+        self, cache_name: str, stats_function: Callable[[], Dict[str, int]]
+    ) -> None:
+        with self._lock:
+            self._sources.append((cache_name, stats_function))
+
+    def collect(self) -> Iterator[CounterMetricFamily]:
+        hits = CounterMetricFamily(
+            "rag_cache_hits", "Aciertos de cada cache.", labels=["cache"]
+        )
+        misses = CounterMetricFamily(
+            "rag_cache_misses", "Fallos de cada cache.", labels=["cache"]
+        )
+        with self._lock:
+            sources = list(self._sources)
+        # Los caches registrados con el mismo nombre (ej. uno por engine) se suman.
+        totals: Dict[str, List[int]] = {}
+        for cache_name, stats_function in sources:
+            stats = stats_function()
+            total = totals.setdefault(cache_name, [0, 0])
+            total[0] += stats["hits"]
+            total[1] += stats["misses"]
+        for cache_name, (cache_hits, cache_misses) in totals.items():
+            hits.add_metric([cache_name], cache_hits)
+            misses.add_metric([cache_name], cache_misses)
+        yield hits
+        yield misses
+
+
+cache_stats_collector = CacheStatsCollector()
+REGISTRY.register(cache_stats_collector)
+
+
+def register_cache_stats(
+    cache_name: str, stats_function: Callable[[], Dict[str, int]]
+) -> None:
+    """
+    Registra un cache para exponer sus aciertos y fallos en `/metrics`.
+
+    Args:
+        cache_name (str): El nombre del cache, usado como etiqueta `cache`.
+        stats_function (Callable[[], Dict[str, int]]): Función que retorna los contadores acumulados del cache, con las llaves `hits` y `misses`.
+    """
+    cache_stats_collector.add_source(cache_name, stats_function)
+
+
+def get_engine_label(vector_db_engine: object) -> str:
+    """
+    Args:
+        vector_db_engine (Engine): El engine.
+
+    Returns:
+        str: El nombre de la clase del engine, usado como etiqueta `engine`.
+    """
+    return type(vector_db_engine).__name__
+
+
+def observe_stage(
+    stage: str, engine_label: str, project_name: str, seconds: float
+) -> None:
+    """
+    Registra la duración de una etapa en `rag_stage_duration_seconds`.
+
+    Args:
+        stage (str): El nombre de la etapa.
+        engine_label (str): El engine, según `get_engine_label`.
+        project_name (str): El proyecto de la consulta. Vacío si no se detectó.
+        seconds (float): La duración en segundos.
+    """
+    STAGE_DURATION.labels(stage, engine_label, project_name or "").observe(seconds)
+
+
+@contextmanager
+def time_stage(stage: str, engine_label: str, project_name: str) -> Iterator[None]:
+    """
+    Mide la duración del bloque y la registra en `rag_stage_duration_seconds`.
+
+    Args:
+        stage (str): El nombre de la etapa.
+        engine_label (str): El engine, según `get_engine_label`.
+        project_name (str): El proyecto de la consulta.
+    """
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(
+            stage, engine_label, project_name, time.perf_counter() - start_time
+        )
+
+
+async def atime_stage(
+    awaitable: Awaitable[T], stage: str, engine_label: str, project_name: str
+) -> T:
+    """
+    Versión de `time_stage` para un awaitable, útil al ejecutar etapas con `asyncio.gather`.
+
+    Returns:
+        T: El resultado del awaitable.
+    """
+    with time_stage(stage, engine_label, project_name):
+        return await awaitable
+
+
+def observe_documents(
+    source: str, engine_label: str, project_name: str, count: int
+) -> None:
+    """
+    Registra la cantidad de documentos obtenidos por una búsqueda.
+
+    Args:
+        source (str): La búsqueda: "vector" o "keyword".
+        engine_label (str): El engine, según `get_engine_label`.
+        project_name (str): El proyecto de la consulta.
+        count (int): La cantidad de documentos.
+    """
+    RETRIEVED_DOCUMENTS.labels(source, engine_label, project_name).observe(count)
+
+
+def observe_context(
+    engine_label: str, project_name: str, documents: int, tokens: int
+) -> None:
+    """
+    Registra el tamaño del contexto entregado al LLM.
+
+    Args:
+        engine_label (str): El engine, según `get_engine_label`.
+        project_name (str): El proyecto de la consulta.
+        documents (int): Documentos del contexto.
+        tokens (int): Tokens del contexto.
+    """
+    RETRIEVED_DOCUMENTS.labels("context", engine_label, project_name).observe(
+        documents
+    )
+    CONTEXT_TOKENS.labels(engine_label, project_name).observe(tokens)
+
+
+def observe_embedding_batch(batch_size: int, wait_seconds: List[float]) -> None:
+    """
+    Registra un micro-batch de queries enviado al modelo de embeddings.
+
+    Args:
+        batch_size (int): Queries del batch.
+        wait_seconds (List[float]): Espera en la cola de cada query del batch.
+    """
+    EMBEDDING_BATCH_SIZE.observe(batch_size)
+    for seconds in wait_seconds:
+        EMBEDDING_BATCH_WAIT.observe(seconds)
+
+
+def observe_generation(
+    engine_label: str,
+    project_name: str,
+    model_name: str,
+    prompt_tokens: int,
+    completion_tokens: int,
+) -> None:
+    """
+    Registra los tokens del prompt y de la respuesta de una generación del LLM.
+
+    Args:
+        engine_label (str): El engine, según `get_engine_label`.
+        project_name (str): El proyecto de la consulta.
+        model_name (str): El nombre del LLM.
+        prompt_tokens (int): Tokens del prompt.
+        completion_tokens (int): Tokens de la respuesta.
+    """
+    PROMPT_TOKENS.labels(engine_label, project_name, model_name).inc(prompt_tokens)
+    COMPLETION_TOKENS.labels(engine_label, project_name, model_name).inc(
+        completion_tokens
+    )
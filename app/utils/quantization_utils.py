@@ -0,0 +1,329 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.utils.chunk_store_utils import (
+    ChunkPartition,
+    ChunkStore,
+    file_size,
+    top_k_indices,
+)
+
+QUANTIZATION_TYPES = ("float16", "int8")
+# Cantidad de filas que se convierten a float32 a la vez al calcular puntajes.
+SCORE_BLOCK_ROWS = 65536
+
+
+def check_quantization(quantization: str) -> None:
+    """
+    Args:
+        quantization (str): El tipo de cuantización.
+
+    Raises:
+        ValueError: Si el tipo de cuantización no está soportado.
+    """
+    if quantization not in QUANTIZATION_TYPES:
+        raise ValueError(
+            f"Cuantización no soportada: {quantization}. Opciones: {', '.join(QUANTIZATION_TYPES)}."
+        )
+
+
+def quantize_vectors(
+    vectors: np.ndarray, quantization: str
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Convierte embeddings float32 a una representación compacta.
+
+    Con "float16" cada valor ocupa 2 bytes. Con "int8" cada valor ocupa 1 byte y cada vector
+    guarda su escala (máximo valor absoluto / 127) como float32.
+
+    Args:
+        vectors (np.ndarray): Matriz (filas, dimensión) de embeddings.
+        quantization (str): "float16" o "int8".
+
+    Returns:
+        Tuple[np.ndarray, Optional[np.ndarray]]: Los vectores cuantizados y la escala de cada vector (None para "float16").
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if quantization == "float16":
+        return vectors.astype(np.float16), None
+    check_quantization(quantization)
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127)
+    return codes.astype(np.int8), scales.astype(np.float32)
+
+
+def score_quantized(
+    codes: np.ndarray, scales: Optional[np.ndarray], query_vector: np.ndarray
+) -> np.ndarray:
+    """
+    Calcula el producto punto aproximado entre la consulta y cada vector cuantizado. Los
+    vectores se convierten a float32 por bloques, para no materializar la matriz completa.
+
+    Args:
+        codes (np.ndarray): Los vectores cuantizados.
+        scales (np.ndarray, opcional): La escala de cada vector, para "int8".
+        query_vector (np.ndarray): El embedding normalizado de la consulta.
+
+    Returns:
+        np.ndarray: El puntaje de cada vector.
+    """
+    scores = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+        end = start + SCORE_BLOCK_ROWS
+        scores[start:end] = codes[start:end].astype(np.float32) @ query_vector
+        if scales is not None:
+            scores[start:end] *= scales[start:end]
+    return scores
+
+
+def search_quantized(
+    codes: np.ndarray,
+    scales: Optional[np.ndarray],
+    query_vector: np.ndarray,
+    k: int,
+    full_vectors: Optional[np.ndarray] = None,
+    rescore_factor: int = 4,
+) -> List[Tuple[int, float]]:
+    """
+    Busca los `k` vectores más similares usando la representación cuantizada. Si se entregan
+    los vectores en precisión completa, se seleccionan `k * rescore_factor` candidatos y se
+    vuelven a puntuar de forma exacta, leyendo solo esas filas.
+
+    Args:
+        codes (np.ndarray): Los vectores cuantizados.
+        scales (np.ndarray, opcional): La escala de cada vector, para "int8".
+        query_vector (np.ndarray): El embedding normalizado de la consulta.
+        k (int): Cantidad de resultados.
+        full_vectors (np.ndarray, opcional): Los vectores float32 normalizados, para el re-puntaje exacto.
+        rescore_factor (int): Candidatos por resultado que se re-puntúan. Default: 4.
+
+    Returns:
+        List[Tuple[int, float]]: Pares (fila, puntaje), de mayor a menor puntaje.
+    """
+    scores = score_quantized(codes, scales, query_vector)
+    if full_vectors is None:
+        return [(int(row), float(scores[row])) for row in top_k_indices(scores, k)]
+
+    candidates = np.sort(top_k_indices(scores, k * max(rescore_factor, 1)))
+    exact_scores = np.asarray(full_vectors[candidates]) @ query_vector
+    return [
+        (int(candidates[i]), float(exact_scores[i]))
+        for i in top_k_indices(exact_scores, k)
+    ]
+
+
+class QuantizedVectors:
+    """
+    Copia cuantizada de los embeddings de una partición de chunks, guardada en disco junto a
+    los embeddings en precisión completa y leída como memmap.
+
+    Se mantiene al día de forma incremental: las filas nuevas de la partición se cuantizan y
+    se agregan al final la próxima vez que se consulta.
+    """
+
+    def __init__(self, partition: ChunkPartition, quantization: str):
+        check_quantization(quantization)
+        self.partition = partition
+        self.quantization = quantization
+        self.codes_path = os.path.join(partition.directory, f"vectors.{quantization}")
+        self.scales_path = os.path.join(partition.directory, "scales.f32")
+        self.code_dtype = np.float16 if quantization == "float16" else np.int8
+        self.rows = None
+        self._codes = None
+        self._scales = None
+        self._lock = threading.Lock()
+
+    def _committed_rows(self) -> int:
+        row_size = self.partition.dimension * np.dtype(self.code_dtype).itemsize
+        rows = file_size(self.codes_path) // row_size
+        if self.quantization == "int8":
+            rows = min(rows, file_size(self.scales_path) // 4)
+        return rows
+
+    def sync(self) -> None:
+        """
+        Cuantiza y agrega las filas de la partición que aún no tienen versión cuantizada.
+
+        Los archivos cuantizados se escriben con el lock de escritura de la partición tomado,
+        ya que otro proceso puede estar sincronizándolos. Con el lock tomado, primero se
+        descartan los restos de una escritura interrumpida.
+        """
+        with self._lock:
+            if self.partition.dimension is None:
+                return
+            full_vectors = self.partition.get_vectors()
+            end = 0 if full_vectors is None else len(full_vectors)
+            if self.rows is not None and end <= self.rows:
+                return
+            with self.partition.write_lock:
+                rows = self._committed_rows()
+                row_sizes = {
+                    self.codes_path: self.partition.dimension
+                    * np.dtype(self.code_dtype).itemsize
+                }
+                if self.quantization == "int8":
+                    row_sizes[self.scales_path] = 4
+                for path, row_size in row_sizes.items():
+                    open(path, "ab").close()
+                    os.truncate(path, rows * row_size)
+                if end > rows:
+                    codes, scales = quantize_vectors(
+                        full_vectors[rows:end], self.quantization
+                    )
+                    with open(self.codes_path, "ab") as codes_file:
+                        codes_file.write(codes.tobytes())
+                    if scales is not None:
+                        with open(self.scales_path, "ab") as scales_file:
+                            scales_file.write(scales.tobytes())
+            # Otro proceso pudo cuantizar más filas de las que esta partición ve: solo se
+            # leen las `end` primeras.
+            self.rows = end
+            self._codes = None
+            self._scales = None
+
+    def _get_arrays(self) -> Tuple[np.memmap, Optional[np.memmap]]:
+        with self._lock:
+            if self._codes is None:
+                self._codes = np.memmap(
+                    self.codes_path,
+                    dtype=self.code_dtype,
+                    mode="r",
+                    shape=(self.rows, self.partition.dimension),
+                )
+                if self.quantization == "int8":
+                    self._scales = np.memmap(
+                        self.scales_path, dtype=np.float32, mode="r", shape=(self.rows,)
+                    )
+            return self._codes, self._scales
+
+    def search(
+        self, query_vector: np.ndarray, k: int, rescore_factor: int = 4
+    ) -> List[Tuple[int, float]]:
+        """
+        Args:
+            query_vector (np.ndarray): El embedding normalizado de la consulta.
+            k (int): Cantidad de resultados.
+            rescore_factor (int): Candidatos por resultado que se re-puntúan con los vectores en precisión completa. 0 desactiva el re-puntaje. Default: 4.
+
+        Returns:
+            List[Tuple[int, float]]: Pares (fila, puntaje), de mayor a menor puntaje.
+        """
+        self.sync()
+        if not self.rows:
+            return []
+        codes, scales = self._get_arrays()
+        full_vectors = self.partition.get_vectors() if rescore_factor > 0 else None
+        return search_quantized(
+            codes, scales, query_vector, k, full_vectors, rescore_factor
+        )
+
+
+def benchmark_quantization(
+    chunk_store: ChunkStore,
+    k: int = 10,
+    sample_size: int = 100,
+    rescore_factor: int = 4,
+    seed: int = 0,
+) -> List[Dict[str, float]]:
+    """
+    Compara la memoria y el recall@k de cada representación de los embeddings almacenados,
+    tomando como referencia la búsqueda exacta en float32.
+
+    Las consultas son embeddings de chunks distintos elegidos al azar del propio corpus, y cada
+    una se busca dentro del proyecto de su chunk (igual que una consulta filtrada por proyecto).
+    El chunk de la consulta se excluye de los resultados exactos y aproximados: de lo contrario
+    todas las representaciones lo encontrarían como primer resultado y el recall quedaría inflado.
+
+    Args:
+        chunk_store (ChunkStore): El almacén de chunks a evaluar.
+        k (int): Cantidad de resultados por consulta. Default: 10.
+        sample_size (int): Cantidad máxima de consultas. Default: 100.
+        rescore_factor (int): Candidatos por resultado que se re-puntúan. Default: 4.
+        seed (int): Semilla para elegir las consultas. Default: 0.
+
+    Returns:
+        List[Dict[str, float]]: Por cada representación: bytes de los vectores recorridos en cada búsqueda, fracción respecto a float32, recall@k y milisegundos promedio por consulta. Con re-puntaje, los vectores float32 se mantienen en disco y solo se leen las filas candidatas.
+    """
+    # Un proyecto con un solo chunk no tiene otros resultados contra los cuales medir el recall.
+    partitions = [
+        partition for partition in chunk_store.get_partitions() if partition.rows > 1
+    ]
+    total_rows = sum(partition.rows for partition in partitions)
+    if total_rows == 0:
+        return []
+
+    rng = np.random.default_rng(seed)
+    samples = rng.choice(total_rows, size=min(sample_size, total_rows), replace=False)
+    row_offsets = np.cumsum([0] + [partition.rows for partition in partitions])
+
+    methods = {"float32": None}
+    for quantization in QUANTIZATION_TYPES:
+        methods[quantization] = (quantization, 0)
+        methods[f"{quantization}+rescore"] = (quantization, rescore_factor)
+
+    matrices = {}
+    for partition in partitions:
+        full_vectors = np.asarray(partition.get_vectors())
+        matrices[partition.directory] = {
+            quantization: quantize_vectors(full_vectors, quantization)
+            for quantization in QUANTIZATION_TYPES
+        }
+
+    results = {
+        name: {"method": name, "recall": 0.0, "seconds": 0.0} for name in methods
+    }
+    for sample in samples:
+        index = int(np.searchsorted(row_offsets, sample, side="right") - 1)
+        partition = partitions[index]
+        full_vectors = partition.get_vectors()
+        query_row = int(sample - row_offsets[index])
+        query_vector = np.asarray(full_vectors[query_row])
+
+        start_time = time.perf_counter()
+        exact_rows = top_k_indices(full_vectors @ query_vector, k + 1).tolist()
+        results["float32"]["seconds"] += time.perf_counter() - start_time
+        exact_rows = set([row for row in exact_rows if row != query_row][:k])
+        results["float32"]["recall"] += 1.0
+
+        for name, method in methods.items():
+            if method is None:
+                continue
+            quantization, factor = method
+            codes, scales = matrices[partition.directory][quantization]
+            start_time = time.perf_counter()
+            rows = search_quantized(
+                codes,
+                scales,
+                query_vector,
+                k + 1,
+                full_vectors if factor > 0 else None,
+                factor,
+            )
+            results[name]["seconds"] += time.perf_counter() - start_time
+            found_rows = set([row for row, _ in rows if row != query_row][:k])
+            results[name]["recall"] += len(exact_rows & found_rows) / max(
+                len(exact_rows), 1
+            )
+
+    dimension = partitions[0].dimension
+    bytes_per_vector = {
+        "float32": dimension * 4,
+        "float16": dimension * 2,
+        "int8": dimension + 4,
+    }
+    report = []
+    for name, result in results.items():
+        vector_bytes = bytes_per_vector[name.split("+")[0]] * total_rows
+        report.append(
+            {
+                "method": name,
+                "bytes": vector_bytes,
+                "memory_ratio": vector_bytes / (bytes_per_vector["float32"] * total_rows),
+                "recall": result["recall"] / len(samples),
+                "milliseconds": 1000 * result["seconds"] / len(samples),
+            }
+        )
+    return report
@@ -0,0 +1,117 @@
+from functools import lru_cache
+from typing import List, Optional, Tuple
+import tiktoken
+from langchain.schema import Document
+
+# Encoding usado para contar tokens. No es el tokenizador exacto de cada LLM, pero entrega
+# una estimación consistente para acotar el tamaño del contexto.
+TOKEN_ENCODING_NAME = "cl100k_base"
+# Caracteres por token usados si el encoding no está disponible (por ejemplo, sin conexión).
+FALLBACK_CHARS_PER_TOKEN = 4
+CONTEXT_SEPARATOR = "\n\n"
+
+
+@lru_cache(maxsize=None)
+def get_token_encoder(
+    encoding_name: str = TOKEN_ENCODING_NAME,
+) -> Optional[tiktoken.Encoding]:
+    """
+    Obtiene el encoder de tiktoken, cargado una sola vez por proceso.
+
+    Args:
+        encoding_name (str): El nombre del encoding. Default: "cl100k_base".
+
+    Returns:
+        tiktoken.Encoding: El encoder, o None si no se pudo cargar.
+    """
+    try:
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        print(
+            f"No se pudo cargar el encoding {encoding_name} ({e}). Se estimarán los tokens a partir de la cantidad de caracteres."
+        )
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Cuenta los tokens de un texto.
+
+    Args:
+        text (str): El texto.
+
+    Returns:
+        int: La cantidad de tokens.
+    """
+    encoder = get_token_encoder()
+    if encoder is None:
+        return -(-len(text) // FALLBACK_CHARS_PER_TOKEN)
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def count_documents_tokens(documents: List[Document]) -> List[Document]:
+    """
+    Cuenta los tokens del contenido de cada documento y los almacena en sus metadatos.
+
+    Args:
+        documents (List[Document]): Los documentos.
+
+    Returns:
+        List[Document]: Los documentos con la cantidad de tokens en la metadata bajo la clave 'page_content_tokens'.
+    """
+    encoder = get_token_encoder()
+    texts = [document.page_content for document in documents]
+    if encoder is None:
+        counts = [count_tokens(text) for text in texts]
+    else:
+        counts = [
+            len(tokens) for tokens in encoder.encode_batch(texts, disallowed_special=())
+        ]
+    for document, count in zip(documents, counts):
+        document.metadata["page_content_tokens"] = count
+    return documents
+
+
+def get_document_tokens(document: Document) -> int:
+    """
+    Obtiene la cantidad de tokens de un documento desde su metadata, o la cuenta si no está
+    (por ejemplo, en documentos cargados antes de que se registrara).
+
+    Args:
+        document (Document): El documento.
+
+    Returns:
+        int: La cantidad de tokens del contenido.
+    """
+    tokens = document.metadata.get("page_content_tokens")
+    if tokens is None:
+        tokens = count_tokens(document.page_content)
+    return int(tokens)
+
+
+def pack_documents(
+    documents: List[Document], token_budget: int
+) -> Tuple[List[Document], int]:
+    """
+    Selecciona documentos en orden de relevancia mientras quepan en el presupuesto de tokens.
+    Un documento que no cabe se omite y se sigue intentando con los siguientes.
+
+    Args:
+        documents (List[Document]): Los documentos, de mayor a menor relevancia.
+        token_budget (int): La cantidad máxima de tokens del contexto.
+
+    Returns:
+        Tuple[List[Document], int]: Los documentos seleccionados, en el mismo orden, y los tokens que ocupan (incluyendo los separadores).
+    """
+    separator_tokens = count_tokens(CONTEXT_SEPARATOR)
+    packed_documents = []
+    used_tokens = 0
+    for document in documents:
+        tokens = get_document_tokens(document)
+        if packed_documents:
+            tokens += separator_tokens
+        if used_tokens + tokens > token_budget:
+            continue
+        packed_documents.append(document)
+        used_tokens += tokens
+    return packed_documents, used_tokens
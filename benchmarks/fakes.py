@@ -0,0 +1,184 @@
+import hashlib
+import time
+import uuid
+from functools import lru_cache
+from typing import Any, List, Optional
+import numpy as np
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import LLM
+from app.engines.engine_interface import Engine
+from app.utils.chunk_store_utils import normalize_vectors, top_k_indices
+from app.utils.embedding_utils import check_all_documents_for_duplicate
+from app.utils.ingestion_utils import IngestionWriter
+from app.utils.keyword_search_utils import tokenize_text
+
+
+@lru_cache(maxsize=None)
+def _token_vector(token: str, dimension: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(token.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dimension).astype(np.float32)
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Modelo de embeddings determinista y sin red. El embedding de un texto es la suma de un
+    vector aleatorio fijo por palabra, por lo que textos con palabras en común son similares.
+    """
+
+    def __init__(self, dimension: int = 768, latency_ms: float = 0):
+        """
+        Args:
+            dimension (int): Dimensión de los embeddings. Default: 768 (la de jina-embeddings-v2).
+            latency_ms (float): Milisegundos de espera por cada llamada al modelo. Default: 0.
+        """
+        self.model = "fake-embeddings"
+        self.dimension = dimension
+        self.latency_ms = latency_ms
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in text.lower().split():
+            vector += _token_vector(token, self.dimension)
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency_ms / 1000)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class FakeLLM(LLM):
+    """
+    LLM sin red que espera `latency_ms` milisegundos y responde siempre `response`.
+    """
+
+    model: str = "fake-llm"
+    response: str = "Respuesta generada por el LLM de prueba."
+    latency_ms: float = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> str:
+        time.sleep(self.latency_ms / 1000)
+        return self.response
+
+
+class InMemoryEngine(Engine):
+    """
+    Engine en memoria para los benchmarks: guarda los chunks en una lista y responde
+    `vector_search` con una búsqueda exacta y `keyword_search` contando los términos de la
+    query presentes en cada chunk.
+    """
+
+    def __init__(
+        self,
+        embedding_model: Embeddings,
+        ingestion_writer: Optional[IngestionWriter] = None,
+    ):
+        """
+        Args:
+            embedding_model (Embeddings): El modelo de embeddings.
+            ingestion_writer (IngestionWriter, opcional): Escritor de documentos usado por `load_db`.
+        """
+        self.embedding_model = embedding_model
+        self.ingestion_writer = ingestion_writer or IngestionWriter()
+        self.clear_db()
+
+    def init_vector_store(self) -> "InMemoryEngine":
+        return self
+
+    def load_db(self, documents: List[Document]) -> List[str]:
+        final_documents = check_all_documents_for_duplicate(
+            documents,
+            [{"page_content_sha512": sha} for sha in self.hashes],
+        )
+        if not final_documents:
+            return []
+        added_ids = self.ingestion_writer.write(
+            final_documents, self.embedding_model, self.add_embedded_documents
+        )
+        self.notify_change(
+            {document.metadata.get("project_name") for document in final_documents}
+        )
+        return added_ids
+
+    def add_embedded_documents(
+        self, documents: List[Document], embeddings: List[List[float]]
+    ) -> List[str]:
+        ids = [str(uuid.uuid4()) for _ in documents]
+        for document, document_id in zip(documents, ids):
+            self.documents.append(
+                Document(
+                    page_content=document.page_content,
+                    metadata={**document.metadata, "_id": document_id},
+                )
+            )
+            self.terms.append(set(tokenize_text(document.page_content)))
+            self.hashes.add(document.metadata.get("page_content_sha512"))
+        self.vectors = np.vstack([self.vectors, normalize_vectors(embeddings)])
+        return ids
+
+    def clear_db(self) -> None:
+        self.documents = []
+        self.terms = []
+        self.hashes = set()
+        dimension = getattr(self.embedding_model, "dimension", 0)
+        self.vectors = np.empty((0, dimension), dtype=np.float32)
+        self.notify_change()
+
+    def get_project_names(self) -> List[str]:
+        return list(
+            dict.fromkeys(
+                document.metadata.get("project_name") for document in self.documents
+            )
+        )
+
+    def _project_rows(self, project_name: Optional[str]) -> np.ndarray:
+        return np.array(
+            [
+                row
+                for row, document in enumerate(self.documents)
+                if not project_name
+                or document.metadata.get("project_name") == project_name
+            ],
+            dtype=np.int64,
+        )
+
+    def vector_search(
+        self,
+        query: str,
+        project_name: str = None,
+        search_type: str = "similarity",
+        k: int = 4,
+    ) -> List[Document]:
+        rows = self._project_rows(project_name)
+        if len(rows) == 0:
+            return []
+        query_vector = normalize_vectors(self.embedding_model.embed_query(query))
+        scores = self.vectors[rows] @ query_vector
+        return [self.documents[rows[i]] for i in top_k_indices(scores, k)]
+
+    def keyword_search(
+        self, project_name: str, query: str, top_k: int = 10
+    ) -> List[Document]:
+        query_terms = set(tokenize_text(query))
+        rows = self._project_rows(project_name)
+        scores = np.array(
+            [len(query_terms & self.terms[row]) for row in rows], dtype=np.float32
+        )
+        return [
+            self.documents[rows[i]]
+            for i in top_k_indices(scores, top_k)
+            if scores[i] > 0
+        ]
@@ -0,0 +1,348 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+from langchain.schema import Document
+from app.services import answer_cache_services
+from app.services.llm_services import generate_sources, query_llm
+from app.utils import keyword_search_utils
+from app.utils.embedding_utils import hash_documents, split_documents
+from app.utils.keyword_search_utils import preprocess_query_spacy
+from app.utils.token_utils import count_documents_tokens
+from benchmarks.fakes import FakeEmbeddings, FakeLLM, InMemoryEngine
+
+BASELINE_PATH = "benchmarks/baseline.json"
+OUTPUT_PATH = "benchmarks/results.json"
+# Aumento absoluto de la mediana, en milisegundos, bajo el cual no se marca una regresión.
+MIN_CHANGE_MS = 0.5
+PROJECT_NAMES = ["proyecto alfa", "proyecto beta", "proyecto gamma"]
+VOCABULARY = (
+    "sensor datos captura sistema usuario prototipo software arquitectura modulo "
+    "visualizacion experimento evaluacion interfaz dispositivo señal plataforma "
+    "investigacion metodologia iteracion requisito extension analisis resultado "
+    "desarrollo herramienta registro sesion participante tarea busqueda modelo"
+).split()
+QUERIES = [
+    "¿Qué sensores se utilizan en el {project}?",
+    "¿Cuál es la metodología de desarrollo del {project}?",
+    "¿Cómo se visualizan los datos de captura en el {project}?",
+    "¿Qué resultados obtuvo la evaluación del {project}?",
+]
+
+
+def build_pages(
+    pages_per_project: int, words_per_page: int, seed: int
+) -> List[Document]:
+    """
+    Genera páginas sintéticas y deterministas para cada proyecto, con la misma metadata que
+    tienen los PDFs cargados.
+
+    Args:
+        pages_per_project (int): Cantidad de páginas por proyecto.
+        words_per_page (int): Cantidad de palabras por página.
+        seed (int): Semilla del generador.
+
+    Returns:
+        List[Document]: Las páginas.
+    """
+    rng = random.Random(seed)
+    pages = []
+    for project_name in PROJECT_NAMES:
+        for page in range(pages_per_project):
+            words = [rng.choice(VOCABULARY) for _ in range(words_per_page)]
+            # Se agregan saltos de línea para que el splitter tenga separadores naturales.
+            text = "\n".join(
+                " ".join(words[i : i + 12]) + "." for i in range(0, len(words), 12)
+            )
+            pages.append(
+                Document(
+                    page_content=f"{project_name}. {text}",
+                    metadata={
+                        "project_name": project_name,
+                        "title": f"memoria del {project_name}",
+                        "author": "autor de prueba",
+                        "link": "https://example.org",
+                        "year": "2024",
+                        "page": page,
+                    },
+                )
+            )
+    return pages
+
+
+def measure(function: Callable[[], object], repetitions: int) -> Dict[str, float]:
+    """
+    Ejecuta una función varias veces y resume sus tiempos.
+
+    Args:
+        function (Callable): La función a medir.
+        repetitions (int): Cantidad de ejecuciones medidas. Antes se realiza una ejecución de calentamiento.
+
+    Returns:
+        Dict[str, float]: Mediana, p95, mínimo y promedio en milisegundos, y la cantidad de ejecuciones.
+    """
+    function()
+    milliseconds = []
+    for _ in range(repetitions):
+        start_time = time.perf_counter()
+        function()
+        milliseconds.append(1000 * (time.perf_counter() - start_time))
+    milliseconds.sort()
+    p95_index = min(len(milliseconds) - 1, int(0.95 * len(milliseconds)))
+    return {
+        "median_ms": statistics.median(milliseconds),
+        "p95_ms": milliseconds[p95_index],
+        "min_ms": milliseconds[0],
+        "mean_ms": statistics.fmean(milliseconds),
+        "repetitions": repetitions,
+    }
+
+
+def run_benchmarks(
+    repetitions: int = 20,
+    pages_per_project: int = 40,
+    words_per_page: int = 400,
+    llm_latency_ms: float = 0,
+    seed: int = 0,
+) -> Dict:
+    """
+    Mide la latencia de cada etapa de la ingesta y de la consulta, sin red: usa
+    `FakeEmbeddings`, `FakeLLM` e `InMemoryEngine`.
+
+    Args:
+        repetitions (int): Ejecuciones medidas por etapa. Default: 20.
+        pages_per_project (int): Páginas sintéticas por proyecto. Default: 40.
+        words_per_page (int): Palabras por página. Default: 400.
+        llm_latency_ms (float): Latencia simulada del LLM. Default: 0 (solo se mide el código del backend).
+        seed (int): Semilla del corpus sintético. Default: 0.
+
+    Returns:
+        Dict: El entorno, los parámetros y los tiempos de cada etapa.
+    """
+    pages = build_pages(pages_per_project, words_per_page, seed)
+    chunks = count_documents_tokens(hash_documents(split_documents(pages, 512, 64)))
+    embedding_model = FakeEmbeddings()
+    llm = FakeLLM(latency_ms=llm_latency_ms)
+    queries = [
+        query.format(project=project_name)
+        for project_name in PROJECT_NAMES
+        for query in QUERIES
+    ]
+
+    stages = {}
+    stages["split_documents"] = measure(
+        lambda: split_documents(pages, 512, 64), repetitions
+    )
+    stages["hash_documents"] = measure(lambda: hash_documents(chunks), repetitions)
+    stages["count_documents_tokens"] = measure(
+        lambda: count_documents_tokens(chunks), repetitions
+    )
+    stages["load_db"] = measure(
+        lambda: InMemoryEngine(embedding_model).load_db(chunks), repetitions
+    )
+
+    engine = InMemoryEngine(embedding_model)
+    engine.load_db(chunks)
+    retrieved_docs = engine.vector_search(queries[0], PROJECT_NAMES[0], k=8)
+
+    def preprocess_queries():
+        # Se vacía el cache de keywords para medir el análisis de spaCy.
+        keyword_search_utils._keywords_cache.clear()
+        for query in queries:
+            preprocess_query_spacy(query)
+
+    try:
+        stages["preprocess_query_spacy"] = measure(preprocess_queries, repetitions)
+    except OSError as e:
+        print(f"Se omite preprocess_query_spacy: {e}")
+
+    stages["generate_sources"] = measure(
+        lambda: generate_sources(retrieved_docs), repetitions
+    )
+    stages["vector_search"] = measure(
+        lambda: [
+            engine.vector_search(query, PROJECT_NAMES[0], k=4) for query in queries
+        ],
+        repetitions,
+    )
+    stages["keyword_search"] = measure(
+        lambda: [
+            engine.keyword_search(PROJECT_NAMES[0], query, 5) for query in queries
+        ],
+        repetitions,
+    )
+
+    def run_queries():
+        for query in queries:
+            query_llm(engine, query, model=llm, search_k=4)
+
+    answer_cache_enabled = answer_cache_services.ANSWER_CACHE_ENABLED
+    try:
+        answer_cache_services.ANSWER_CACHE_ENABLED = False
+        stages["query_llm"] = measure(run_queries, repetitions)
+        answer_cache_services.ANSWER_CACHE_ENABLED = True
+        stages["query_llm_cached"] = measure(run_queries, repetitions)
+    finally:
+        answer_cache_services.ANSWER_CACHE_ENABLED = answer_cache_enabled
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+        },
+        "parameters": {
+            "repetitions": repetitions,
+            "pages": len(pages),
+            "chunks": len(chunks),
+            "queries": len(queries),
+            "llm_latency_ms": llm_latency_ms,
+            "seed": seed,
+        },
+        "stages": stages,
+    }
+
+
+def compare_with_baseline(
+    results: Dict,
+    baseline: Dict,
+    tolerance: float,
+    min_change_ms: float = MIN_CHANGE_MS,
+) -> List[Dict[str, float]]:
+    """
+    Compara la mediana de cada etapa con la del baseline. Una etapa es una regresión si su
+    mediana supera la del baseline en más de `tolerance` y, a la vez, en más de
+    `min_change_ms`: en etapas de fracciones de milisegundo un cambio relativo grande suele ser
+    ruido.
+
+    Args:
+        results (Dict): Los resultados actuales.
+        baseline (Dict): Los resultados de referencia.
+        tolerance (float): Aumento relativo permitido antes de marcar una regresión (0.2 = 20%).
+        min_change_ms (float): Aumento absoluto mínimo, en milisegundos, para marcar una regresión. Default: MIN_CHANGE_MS.
+
+    Returns:
+        List[Dict[str, float]]: Por cada etapa presente en ambos: mediana actual, mediana del baseline, cambio relativo y si es una regresión.
+    """
+    comparison = []
+    for stage, result in results["stages"].items():
+        baseline_result = baseline.get("stages", {}).get(stage)
+        if baseline_result is None:
+            continue
+        change = result["median_ms"] / max(baseline_result["median_ms"], 1e-9) - 1
+        change_ms = result["median_ms"] - baseline_result["median_ms"]
+        comparison.append(
+            {
+                "stage": stage,
+                "median_ms": result["median_ms"],
+                "baseline_median_ms": baseline_result["median_ms"],
+                "change": change,
+                "regression": change > tolerance and change_ms > min_change_ms,
+            }
+        )
+    return comparison
+
+
+def print_results(results: Dict, comparison: Optional[List[Dict]] = None) -> None:
+    comparison_by_stage = {row["stage"]: row for row in comparison or []}
+    print(
+        f"{'Etapa':<24}{'Mediana (ms)':>14}{'p95 (ms)':>12}{'Baseline (ms)':>15}{'Cambio':>10}"
+    )
+    for stage, result in results["stages"].items():
+        row = comparison_by_stage.get(stage)
+        baseline_text = f"{row['baseline_median_ms']:.3f}" if row else "-"
+        change_text = f"{row['change']:+.1%}" if row else "-"
+        marker = "  REGRESION" if row and row["regression"] else ""
+        print(
+            f"{stage:<24}{result['median_ms']:>14.3f}{result['p95_ms']:>12.3f}{baseline_text:>15}{change_text:>10}{marker}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks sin red de la ingesta y de las consultas."
+    )
+    parser.add_argument("--repetitions", type=int, default=20)
+    parser.add_argument("--pages-per-project", type=int, default=40)
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument(
+        "--llm-latency-ms",
+        type=float,
+        default=0,
+        help="Latencia simulada del LLM en cada respuesta.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=OUTPUT_PATH)
+    parser.add_argument("--baseline", type=str, default=BASELINE_PATH)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Aumento relativo de la mediana que se considera una regresión.",
+    )
+    parser.add_argument(
+        "--min-change-ms",
+        type=float,
+        default=MIN_CHANGE_MS,
+        help="Aumento absoluto de la mediana (ms) bajo el cual no se considera una regresión.",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Guarda los resultados como el nuevo baseline.",
+    )
+    parser.add_argument(
+        "--ci",
+        action="store_true",
+        help="Termina con código 1 si no existe el baseline, en vez de solo mostrar los resultados.",
+    )
+    args = parser.parse_args()
+
+    results = run_benchmarks(
+        repetitions=args.repetitions,
+        pages_per_project=args.pages_per_project,
+        words_per_page=args.words_per_page,
+        llm_latency_ms=args.llm_latency_ms,
+        seed=args.seed,
+    )
+    with open(args.output, "w", encoding="utf-8") as output_file:
+        json.dump(results, output_file, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(results, baseline_file, indent=2, ensure_ascii=False)
+        print(f"Baseline actualizado en {args.baseline}")
+        print_results(results)
+        return
+
+    if not os.path.exists(args.baseline):
+        print(
+            f"No existe el baseline {args.baseline}. Ejecutar con --update-baseline para crearlo."
+        )
+        print_results(results)
+        if args.ci:
+            sys.exit(1)
+        return
+
+    with open(args.baseline, "r", encoding="utf-8") as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline.get("parameters") != results["parameters"]:
+        print("Los parámetros del baseline son distintos: la comparación no es directa.")
+    comparison = compare_with_baseline(
+        results, baseline, args.tolerance, args.min_change_ms
+    )
+    print_results(results, comparison)
+    regressions = [row["stage"] for row in comparison if row["regression"]]
+    if regressions:
+        print(f"Regresiones: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+from app.utils.aho_corasick_utils import AhoCorasickMatcher
+
+
+def test_find_all_reports_overlapping_matches():
+    matcher = AhoCorasickMatcher(["he", "she", "his", "hers"])
+
+    assert sorted(matcher.find_all("ushers")) == [(1, "she"), (2, "he"), (2, "hers")]
+
+
+def test_find_all_without_matches():
+    matcher = AhoCorasickMatcher(["alfa", "beta"])
+
+    assert matcher.find_all("proyecto gamma") == []
+    assert AhoCorasickMatcher([]).find_all("texto") == []
+
+
+def test_empty_and_repeated_patterns_are_ignored():
+    matcher = AhoCorasickMatcher(["alfa", "", "alfa", "beta"])
+
+    assert matcher.patterns == ["alfa", "beta"]
+    assert matcher.find_all("alfa") == [(0, "alfa")]
+
+
+def test_longest_match_prefers_longest_pattern():
+    matcher = AhoCorasickMatcher(["proyecto", "proyecto alfa", "alfa"])
+
+    assert matcher.longest_match("¿qué sensores usa el proyecto alfa?") == (
+        "proyecto alfa"
+    )
+
+
+def test_longest_match_breaks_ties_by_position():
+    matcher = AhoCorasickMatcher(["beta", "alfa"])
+
+    assert matcher.longest_match("alfa y beta") == "alfa"
+    assert matcher.longest_match("sin proyecto") is None
+
+
+def test_matches_agree_with_naive_search():
+    patterns = ["ab", "abc", "bca", "c", "cab", "aaa"]
+    text = "abcabcaaabca"
+    matcher = AhoCorasickMatcher(patterns)
+
+    expected = sorted(
+        (start, pattern)
+        for pattern in patterns
+        for start in range(len(text))
+        if text.startswith(pattern, start)
+    )
+    assert sorted(matcher.find_all(text)) == expected
@@ -0,0 +1,97 @@
+import hashlib
+from langchain.schema.document import Document
+from app.engines.numpy_engine import NumpyEngine
+from app.services.answer_cache_services import AnswerCache, get_answer_cache
+from benchmarks.fakes import FakeEmbeddings
+
+RESPONSE = {"response": "respuesta"}
+
+
+def make_engine(directory):
+    return NumpyEngine(str(directory), embedding_model=FakeEmbeddings(dimension=8))
+
+
+def make_document(content, project_name="proyecto"):
+    return Document(
+        page_content=content,
+        metadata={
+            "project_name": project_name,
+            "page_content_sha512": hashlib.sha512(content.encode()).hexdigest(),
+        },
+    )
+
+
+def put_response(answer_cache, project_name="proyecto", query_text="¿Qué es?"):
+    generation = answer_cache.get_generation(project_name)
+    answer_cache.put(project_name, "modelo", query_text, 5, RESPONSE, generation)
+
+
+def test_exact_hit_normalizes_query(tmp_path):
+    answer_cache = AnswerCache(make_engine(tmp_path), similarity_threshold=0)
+    put_response(answer_cache)
+
+    assert answer_cache.get("proyecto", "modelo", "  ¿qué es?", 5) == RESPONSE
+    assert answer_cache.get("proyecto", "modelo", "¿Qué es?", 10) is None
+
+
+def test_load_db_invalidates_only_modified_project(tmp_path):
+    engine = make_engine(tmp_path)
+    answer_cache = AnswerCache(engine, similarity_threshold=0)
+    put_response(answer_cache, "proyecto")
+    put_response(answer_cache, "otro")
+
+    engine.load_db([make_document("chunk nuevo", "proyecto")])
+
+    assert answer_cache.get("proyecto", "modelo", "¿Qué es?", 5) is None
+    assert answer_cache.get("otro", "modelo", "¿Qué es?", 5) == RESPONSE
+
+
+def test_put_is_skipped_when_data_changes_during_query(tmp_path):
+    engine = make_engine(tmp_path)
+    answer_cache = AnswerCache(engine, similarity_threshold=0)
+    generation = answer_cache.get_generation("proyecto")
+    engine.load_db([make_document("chunk nuevo")])
+    answer_cache.put("proyecto", "modelo", "¿Qué es?", 5, RESPONSE, generation)
+
+    assert answer_cache.get("proyecto", "modelo", "¿Qué es?", 5) is None
+
+
+def test_changes_from_another_process_invalidate(tmp_path):
+    # Dos engines sobre el mismo directorio simulan la API y el CLI de ingesta: los cambios
+    # del segundo no llegan a los listeners del primero.
+    answer_cache = AnswerCache(make_engine(tmp_path), similarity_threshold=0)
+    put_response(answer_cache, "proyecto")
+    put_response(answer_cache, "otro")
+    cli_engine = make_engine(tmp_path)
+
+    cli_engine.load_db([make_document("chunk nuevo", "proyecto")])
+    assert answer_cache.get("proyecto", "modelo", "¿Qué es?", 5) is None
+    assert answer_cache.get("otro", "modelo", "¿Qué es?", 5) == RESPONSE
+
+    put_response(answer_cache, "proyecto")
+    cli_engine.clear_db()
+    assert answer_cache.get("proyecto", "modelo", "¿Qué es?", 5) is None
+    assert answer_cache.get("otro", "modelo", "¿Qué es?", 5) is None
+
+
+def test_semantic_hit_and_invalidation(tmp_path):
+    engine = make_engine(tmp_path)
+    answer_cache = AnswerCache(engine, similarity_threshold=0.9)
+    generation = answer_cache.get_generation("proyecto")
+    answer_cache.put(
+        "proyecto", "modelo", "pregunta", 5, RESPONSE, generation, [1.0, 0.0]
+    )
+
+    assert answer_cache.get("proyecto", "modelo", "otra", 5, [0.99, 0.05]) == RESPONSE
+    assert answer_cache.get("proyecto", "modelo", "otra", 5, [0.0, 1.0]) is None
+
+    make_engine(tmp_path).load_db([make_document("chunk nuevo")])
+    assert answer_cache.get("proyecto", "modelo", "otra", 5, [0.99, 0.05]) is None
+
+
+def test_get_answer_cache_is_shared_per_engine(tmp_path):
+    engine = make_engine(tmp_path)
+
+    answer_cache = get_answer_cache(engine)
+    assert answer_cache is get_answer_cache(engine)
+    assert get_answer_cache(make_engine(tmp_path)) is not answer_cache
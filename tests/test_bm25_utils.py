@@ -0,0 +1,92 @@
+import hashlib
+from langchain.schema.document import Document
+from app.utils.bm25_utils import BM25Index
+
+
+def make_document(content, project_name="proyecto"):
+    return Document(
+        page_content=content,
+        metadata={
+            "project_name": project_name,
+            "page_content_sha512": hashlib.sha512(content.encode()).hexdigest(),
+        },
+    )
+
+
+def test_search_ranks_matching_documents(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add_documents(
+        [
+            make_document("bomba de agua principal"),
+            make_document("válvula de presión del agua"),
+            make_document("motor eléctrico"),
+        ]
+    )
+
+    results = index.search("proyecto", "bomba agua", top_k=3)
+    assert results[0].page_content == "bomba de agua principal"
+    assert "motor eléctrico" not in [document.page_content for document in results]
+    assert index.search("otro", "bomba") == []
+
+
+def test_search_is_scoped_by_project(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add_documents(
+        [
+            make_document("sensor de temperatura", project_name="a"),
+            make_document("sensor de humedad", project_name="b"),
+        ]
+    )
+
+    results = index.search("b", "sensor")
+    assert [document.page_content for document in results] == ["sensor de humedad"]
+
+
+def test_add_documents_skips_indexed_hashes(tmp_path):
+    index = BM25Index(str(tmp_path))
+    assert index.add_documents([make_document("chunk uno")]) == 1
+    assert index.add_documents([make_document("chunk uno"), make_document("dos")]) == 1
+    assert index.get_partition("proyecto").document_count == 2
+
+
+def test_segments_match_single_flush(tmp_path):
+    documents = [
+        make_document(f"documento {i} trata sobre tema{i % 7} y tema{i % 3}")
+        for i in range(40)
+    ]
+    single = BM25Index(str(tmp_path / "single"))
+    single.add_documents(documents)
+    segmented = BM25Index(str(tmp_path / "segmented"))
+    for start in range(0, len(documents), 3):
+        segmented.add_documents(documents[start : start + 3])
+
+    # Los segmentos se fusionan, por lo que quedan O(log n).
+    assert len(segmented.get_partition("proyecto").segments) <= 6
+    for query in ["tema3", "tema1 tema2", "documento 17"]:
+        expected = single.search("proyecto", query, top_k=5)
+        results = segmented.search("proyecto", query, top_k=5)
+        assert [document.page_content for document in results] == [
+            document.page_content for document in expected
+        ]
+
+
+def test_reader_sees_documents_added_by_writer(tmp_path):
+    writer = BM25Index(str(tmp_path))
+    writer.add_documents([make_document("primer chunk")])
+    reader = BM25Index(str(tmp_path))
+    assert len(reader.search("proyecto", "chunk")) == 1
+
+    writer.add_documents([make_document("segundo chunk")])
+    assert len(reader.search("proyecto", "chunk")) == 2
+
+
+def test_has_project_only_for_indexed_projects(tmp_path):
+    index = BM25Index(str(tmp_path))
+    assert not index.has_project("proyecto")
+
+    index.add_documents([make_document("chunk", project_name="proyecto")])
+    assert index.has_project("proyecto")
+    assert not index.has_project("otro")
+    assert index.add_documents_by_project(
+        [make_document("chunk"), make_document("nuevo", project_name="otro")]
+    ) == {"proyecto": 0, "otro": 1}
@@ -0,0 +1,56 @@
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from prometheus_client import REGISTRY
+from langchain_core.embeddings import Embeddings
+from app.utils.embedding_batch_utils import BatchingEmbeddings
+
+
+class RecordingEmbeddings(Embeddings):
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.calls.append(list(texts))
+        if self.fail:
+            raise RuntimeError("modelo caído")
+        return [[float(len(text)), float(sum(map(ord, text)))] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_concurrent_queries_get_their_own_vectors():
+    model = RecordingEmbeddings()
+    batcher = BatchingEmbeddings(model, window_ms=20, max_batch_size=8)
+    texts = [f"query {i}" for i in range(20)] + ["query 3", "query 3"]
+
+    with ThreadPoolExecutor(max_workers=len(texts)) as executor:
+        vectors = list(executor.map(batcher.embed_query, texts))
+
+    assert vectors == [model.embed_query(text) for text in texts]
+    stats = batcher.stats()
+    assert stats["queries"] == len(texts)
+    assert stats["largest_batch"] <= 8
+    # Las queries repetidas dentro de un batch se envían una sola vez.
+    for call in model.calls:
+        assert len(call) == len(set(call))
+
+
+def test_model_errors_reach_every_waiting_query():
+    batcher = BatchingEmbeddings(RecordingEmbeddings(fail=True), window_ms=1)
+
+    with pytest.raises(RuntimeError, match="modelo caído"):
+        batcher.embed_query("query")
+
+
+def test_batches_are_exposed_as_metrics():
+    before = REGISTRY.get_sample_value("rag_embedding_batch_size_count") or 0
+    batcher = BatchingEmbeddings(RecordingEmbeddings(), window_ms=1)
+    batcher.embed_query("query")
+
+    assert REGISTRY.get_sample_value("rag_embedding_batch_size_count") == before + 1
+    assert REGISTRY.get_sample_value("rag_embedding_batch_wait_seconds_count") >= 1
@@ -0,0 +1,57 @@
+import hashlib
+import pytest
+from app.utils.embedding_store_utils import EmbeddingStore
+
+
+def content_hash(text):
+    return hashlib.sha512(text.encode()).hexdigest()
+
+
+def test_put_and_get_many(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.put_many("modelo", [content_hash("a"), content_hash("b")], [[1, 2], [3, 4]])
+
+    assert store.get_many("modelo", [content_hash("b"), content_hash("c")]) == [
+        [3.0, 4.0],
+        None,
+    ]
+    assert EmbeddingStore(str(tmp_path)).get_many("modelo", [content_hash("a")]) == [
+        [1.0, 2.0]
+    ]
+
+
+def test_writers_sharing_the_store_keep_rows_aligned(tmp_path):
+    # Dos almacenes sobre el mismo directorio simulan la API y el CLI de ingesta.
+    first = EmbeddingStore(str(tmp_path))
+    second = EmbeddingStore(str(tmp_path))
+    first.put_many("modelo", [content_hash("a")], [[1, 1]])
+    second.put_many("modelo", [content_hash("b")], [[2, 2]])
+    first.put_many("modelo", [content_hash("c"), content_hash("b")], [[3, 3], [9, 9]])
+
+    hashes = [content_hash(text) for text in "abc"]
+    expected = [[1.0, 1.0], [2.0, 2.0], [3.0, 3.0]]
+    assert first.get_many("modelo", hashes) == expected
+    assert second.get_many("modelo", hashes) == expected
+
+
+def test_torn_rows_are_ignored_and_repaired(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.put_many("modelo", [content_hash("a")], [[1, 1]])
+    partition = store.get_partition("modelo")
+    # Un vector escrito sin su hash, como si la escritura se hubiera interrumpido.
+    with open(partition.vectors_path, "ab") as vectors_file:
+        vectors_file.write(b"\0" * 8)
+
+    reader = EmbeddingStore(str(tmp_path))
+    assert reader.get_partition("modelo").rows == 1
+    store.put_many("modelo", [content_hash("b")], [[2, 2]])
+    assert reader.get_many("modelo", [content_hash("b")]) == [[2.0, 2.0]]
+
+
+def test_rejects_vectors_with_another_dimension(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.put_many("modelo", [content_hash("a")], [[1, 1]])
+
+    with pytest.raises(ValueError):
+        EmbeddingStore(str(tmp_path)).put_many("modelo", [content_hash("b")], [[1, 2, 3]])
+    assert store.get_many("modelo", [content_hash("b")]) == [None]
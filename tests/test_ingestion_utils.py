@@ -0,0 +1,140 @@
+import os
+from langchain.schema.document import Document
+from app.utils.ingestion_utils import (
+    IngestionCheckpoint,
+    IngestionManifest,
+    IngestionWriter,
+)
+
+
+class ConstantEmbeddings:
+    def embed_documents(self, texts):
+        return [[float(len(text))] for text in texts]
+
+
+def write_documents(documents, embeddings):
+    return [document.page_content for document in documents]
+
+
+def test_checkpoint_persists_completed_files(tmp_path):
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    checkpoint = IngestionCheckpoint(checkpoint_path)
+    checkpoint.mark_completed(["a.pdf", "b.pdf"])
+
+    reloaded = IngestionCheckpoint(checkpoint_path)
+    assert reloaded.is_completed("a.pdf")
+    assert reloaded.is_completed("b.pdf")
+    assert not reloaded.is_completed("c.pdf")
+    assert not os.path.exists(f"{checkpoint_path}.tmp")
+
+
+def test_checkpoint_accumulates_groups(tmp_path):
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    IngestionCheckpoint(checkpoint_path).mark_completed(["a.pdf"])
+    IngestionCheckpoint(checkpoint_path).mark_completed(["b.pdf"])
+
+    assert IngestionCheckpoint(checkpoint_path).completed_files == {"a.pdf", "b.pdf"}
+
+
+def test_checkpoint_clear_removes_file(tmp_path):
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    checkpoint = IngestionCheckpoint(checkpoint_path)
+    checkpoint.mark_completed(["a.pdf"])
+    checkpoint.clear()
+
+    assert not os.path.exists(checkpoint_path)
+    assert not checkpoint.is_completed("a.pdf")
+    assert not IngestionCheckpoint(checkpoint_path).is_completed("a.pdf")
+    # Limpiar un checkpoint inexistente no falla.
+    IngestionCheckpoint(checkpoint_path).clear()
+
+
+def test_writer_writes_all_documents_in_batches():
+    writer = IngestionWriter(
+        embedding_batch_size=2, embedding_workers=2, write_batch_size=3
+    )
+    documents = [Document(page_content=f"chunk {i}") for i in range(7)]
+
+    added_ids = writer.write(documents, ConstantEmbeddings(), write_documents)
+
+    assert sorted(added_ids) == sorted(document.page_content for document in documents)
+    summary = writer.summary()
+    assert summary["documents"] == 7
+    assert summary["written"] == 7
+    assert summary["batches"] == 3
+
+
+def test_writer_reset_discards_previous_summary():
+    writer = IngestionWriter(embedding_batch_size=2, write_batch_size=2)
+    writer.write(
+        [Document(page_content="chunk")], ConstantEmbeddings(), write_documents
+    )
+    writer.reset()
+
+    assert writer.summary() == {
+        "batches": 0,
+        "documents": 0,
+        "written": 0,
+        "embedding_seconds": 0,
+        "write_seconds": 0,
+    }
+
+
+def write_file(path, content):
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_manifest_diff_without_entries_marks_all_added(tmp_path):
+    first = write_file(tmp_path / "a.pdf", b"a")
+    second = write_file(tmp_path / "b.pdf", b"b")
+    manifest = IngestionManifest(str(tmp_path / "manifest.json"))
+
+    assert manifest.diff([first, second]) == {
+        "added": [first, second],
+        "changed": [],
+        "unchanged": [],
+        "removed": [],
+    }
+
+
+def test_manifest_diff_detects_changes(tmp_path):
+    manifest_path = str(tmp_path / "manifest.json")
+    unchanged = write_file(tmp_path / "unchanged.pdf", b"igual")
+    touched = write_file(tmp_path / "touched.pdf", b"igual")
+    changed = write_file(tmp_path / "changed.pdf", b"antes")
+    removed = write_file(tmp_path / "removed.pdf", b"eliminado")
+    manifest = IngestionManifest(manifest_path)
+    manifest.record([unchanged, touched, changed, removed])
+    manifest.save()
+
+    # Solo cambia la fecha de modificación: se compara el hash y se considera sin cambios.
+    stat = os.stat(touched)
+    os.utime(touched, (stat.st_atime, stat.st_mtime + 10))
+    write_file(tmp_path / "changed.pdf", b"despues del cambio")
+    os.remove(removed)
+    added = write_file(tmp_path / "added.pdf", b"nuevo")
+
+    changes = IngestionManifest(manifest_path).diff(
+        [unchanged, touched, changed, added]
+    )
+    assert changes["added"] == [added]
+    assert changes["changed"] == [changed]
+    assert sorted(changes["unchanged"]) == sorted([unchanged, touched])
+    assert changes["removed"] == [removed]
+
+
+def test_manifest_forget_and_clear(tmp_path):
+    manifest_path = str(tmp_path / "manifest.json")
+    source = write_file(tmp_path / "a.pdf", b"a")
+    manifest = IngestionManifest(manifest_path)
+    manifest.record([source])
+    manifest.forget([source])
+    manifest.save()
+    assert IngestionManifest(manifest_path).entries == {}
+
+    manifest.record([source])
+    manifest.save()
+    manifest.clear()
+    assert not os.path.exists(manifest_path)
+    assert IngestionManifest(manifest_path).diff([source])["added"] == [source]
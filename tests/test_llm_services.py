@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+from prometheus_client import REGISTRY
+from langchain.schema.document import Document
+from app.services import llm_services
+from app.services.llm_services import astream_query_llm, fuse_documents, pack_context
+from benchmarks.fakes import FakeEmbeddings, FakeLLM, InMemoryEngine
+
+
+def make_document(name, **metadata):
+    return Document(
+        page_content=f"contenido {name}",
+        metadata={"page_content_sha512": name, **metadata},
+    )
+
+
+def contents(documents):
+    return [document.metadata["page_content_sha512"] for document in documents]
+
+
+def test_fuse_documents_ranks_documents_found_by_both_searches_first():
+    vector_docs = [make_document("a"), make_document("b"), make_document("c")]
+    keyword_docs = [make_document("c"), make_document("d"), make_document("a")]
+
+    fused = fuse_documents(vector_docs, keyword_docs, search_k=4)
+
+    assert contents(fused) == ["a", "c", "b", "d"]
+
+
+def test_fuse_documents_removes_duplicates_keeping_first_instance():
+    vector_docs = [make_document("a", origen="vector"), make_document("a")]
+    keyword_docs = [make_document("a", origen="keyword")]
+
+    fused = fuse_documents(vector_docs, keyword_docs, search_k=5)
+
+    assert len(fused) == 1
+    assert fused[0].metadata["origen"] == "vector"
+
+
+def test_fuse_documents_returns_search_k_unless_top_n_is_set(monkeypatch):
+    vector_docs = [make_document(name) for name in "abcd"]
+    keyword_docs = [make_document(name) for name in "efgh"]
+
+    monkeypatch.setattr(llm_services, "RRF_TOP_N", 0)
+    assert len(fuse_documents(vector_docs, keyword_docs, search_k=3)) == 3
+
+    monkeypatch.setattr(llm_services, "RRF_TOP_N", 6)
+    assert len(fuse_documents(vector_docs, keyword_docs, search_k=3)) == 6
+
+
+def test_fuse_documents_applies_weights(monkeypatch):
+    monkeypatch.setattr(llm_services, "RRF_VECTOR_WEIGHT", 1.0)
+    monkeypatch.setattr(llm_services, "RRF_KEYWORD_WEIGHT", 2.0)
+
+    fused = fuse_documents([make_document("a")], [make_document("b")], search_k=2)
+
+    assert contents(fused) == ["b", "a"]
+
+
+class FakeModel:
+    def __init__(self, model):
+        self.model = model
+
+
+def make_chunk(name, tokens):
+    return Document(page_content=name, metadata={"page_content_tokens": tokens})
+
+
+def test_pack_context_keeps_relevance_order_within_budget(monkeypatch):
+    monkeypatch.setattr(llm_services, "CONTEXT_TOKEN_BUDGET", 100)
+    monkeypatch.setattr(llm_services, "CONTEXT_TOKEN_BUDGETS", {})
+    docs = [make_chunk("a", 40), make_chunk("b", 70), make_chunk("c", 30)]
+
+    packed, tokens = pack_context(docs, FakeModel("modelo"))
+
+    # "b" no cabe y se omite, pero "c" todavía cabe después de "a".
+    assert [doc.page_content for doc in packed] == ["a", "c"]
+    assert 70 <= tokens <= 100
+
+
+def test_pack_context_uses_the_model_budget(monkeypatch):
+    monkeypatch.setattr(llm_services, "CONTEXT_TOKEN_BUDGET", 100)
+    monkeypatch.setattr(llm_services, "CONTEXT_TOKEN_BUDGETS", {"grande": 1000})
+    docs = [make_chunk(name, 90) for name in "abc"]
+
+    assert len(pack_context(docs, FakeModel("grande"))[0]) == 3
+    assert len(pack_context(docs, FakeModel("otro"))[0]) == 1
+
+
+def test_pack_context_with_no_room_returns_nothing(monkeypatch):
+    monkeypatch.setattr(llm_services, "CONTEXT_TOKEN_BUDGET", 10)
+    monkeypatch.setattr(llm_services, "CONTEXT_TOKEN_BUDGETS", {})
+
+    assert pack_context([make_chunk("a", 50)], FakeModel("modelo")) == ([], 0)
+
+
+def stage_seconds(stage, project_name):
+    labels = {"stage": stage, "engine": "InMemoryEngine", "project": project_name}
+    return REGISTRY.get_sample_value("rag_stage_duration_seconds_sum", labels) or 0.0
+
+
+def test_stream_generation_time_excludes_the_client():
+    content = "el proyecto delta usa sensores de temperatura"
+    engine = InMemoryEngine(FakeEmbeddings(dimension=8))
+    engine.load_db(
+        [
+            Document(
+                page_content=content,
+                metadata={
+                    "project_name": "proyecto delta",
+                    "page_content_sha512": hashlib.sha512(content.encode()).hexdigest(),
+                    "title": "informe",
+                    "page": 1,
+                    "author": "autor",
+                    "link": "",
+                    "year": 2024,
+                },
+            )
+        ]
+    )
+    generation_before = stage_seconds("llm_generation", "proyecto delta")
+    first_token_before = stage_seconds("llm_first_token", "proyecto delta")
+
+    async def consume_slowly():
+        events = []
+        async for event in astream_query_llm(
+            engine, "¿qué sensores usa el proyecto delta?", FakeLLM(latency_ms=20)
+        ):
+            events.append(event["event"])
+            # Un cliente lento no debe sumarse al tiempo de generación.
+            await asyncio.sleep(0.3)
+        return events
+
+    assert asyncio.run(consume_slowly()) == ["sources", "token", "done"]
+    generation = stage_seconds("llm_generation", "proyecto delta") - generation_before
+    first_token = stage_seconds("llm_first_token", "proyecto delta") - first_token_before
+    assert 0.02 <= first_token <= generation < 0.3
@@ -0,0 +1,62 @@
+import hashlib
+import pytest
+from langchain.schema.document import Document
+from app.engines import numpy_engine
+from app.engines.numpy_engine import NumpyEngine
+from app.utils.bm25_utils import BM25Index
+from benchmarks.fakes import FakeEmbeddings
+
+
+class FailingEmbeddings(FakeEmbeddings):
+    def embed_documents(self, texts):
+        raise RuntimeError("modelo caído")
+
+
+def make_document(content, project_name="proyecto"):
+    return Document(
+        page_content=content,
+        metadata={
+            "project_name": project_name,
+            "page_content_sha512": hashlib.sha512(content.encode()).hexdigest(),
+        },
+    )
+
+
+def make_engine(tmp_path, embedding_model=None):
+    return NumpyEngine(
+        str(tmp_path / "store"),
+        embedding_model=embedding_model or FakeEmbeddings(dimension=8),
+        keyword_index=BM25Index(str(tmp_path / "keywords")),
+    )
+
+
+def test_failed_write_does_not_index_keywords(tmp_path):
+    engine = make_engine(tmp_path, FailingEmbeddings(dimension=8))
+
+    with pytest.raises(RuntimeError):
+        engine.load_db([make_document("bomba de agua")])
+    assert not engine.keyword_index.has_project("proyecto")
+
+
+def test_indexing_stored_chunks_notifies_change(tmp_path):
+    make_engine(tmp_path).load_db([make_document("bomba de agua")])
+    engine = make_engine(tmp_path)
+    engine.keyword_index.clear()
+    changes = []
+    engine.add_change_listener(changes.append)
+
+    # Los chunks ya están en el almacén: solo cambia el índice de keywords.
+    assert engine.load_db([make_document("bomba de agua")]) == []
+    assert changes == [{"proyecto"}]
+    assert engine.keyword_search("proyecto", "bomba")[0].page_content == "bomba de agua"
+
+
+def test_keyword_search_falls_back_for_unindexed_projects(tmp_path, monkeypatch):
+    # La búsqueda propia del engine procesa la query con spaCy; aquí basta con la query.
+    monkeypatch.setattr(numpy_engine, "preprocess_query_spacy", lambda query: query)
+    engine = make_engine(tmp_path)
+    engine.load_db([make_document("bomba de agua")])
+    engine.keyword_index.clear()
+
+    results = engine.keyword_search("proyecto", "bomba")
+    assert [document.page_content for document in results] == ["bomba de agua"]
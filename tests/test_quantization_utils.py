@@ -0,0 +1,45 @@
+import numpy as np
+from langchain.schema.document import Document
+from app.utils.chunk_store_utils import ChunkStore, normalize_vectors
+from app.utils.quantization_utils import benchmark_quantization
+
+
+def add_chunks(store, project_name, vectors):
+    documents = [
+        Document(
+            page_content=f"{project_name} {row}",
+            metadata={
+                "project_name": project_name,
+                "page_content_sha512": f"{project_name}{row:04d}",
+            },
+        )
+        for row in range(len(vectors))
+    ]
+    store.get_or_create_partition(project_name).append(
+        documents, normalize_vectors(vectors)
+    )
+
+
+def test_benchmark_quantization_excludes_the_query_chunk(tmp_path):
+    rng = np.random.default_rng(0)
+    store = ChunkStore(str(tmp_path))
+    add_chunks(store, "alfa", rng.standard_normal((50, 16)).astype(np.float32))
+    # Un proyecto con un solo chunk no tiene vecinos y no se usa para consultar.
+    add_chunks(store, "beta", rng.standard_normal((1, 16)).astype(np.float32))
+
+    report = {
+        row["method"]: row
+        for row in benchmark_quantization(store, k=5, sample_size=500)
+    }
+
+    assert report["float32"]["recall"] == 1.0
+    assert report["float16+rescore"]["recall"] == 1.0
+    assert 0 < report["int8"]["recall"] <= 1.0
+    assert report["float16"]["memory_ratio"] == 0.5
+
+
+def test_benchmark_quantization_without_neighbors_is_empty(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    add_chunks(store, "alfa", np.ones((1, 4), dtype=np.float32))
+
+    assert benchmark_quantization(store) == []
@@ -0,0 +1,22 @@
+from benchmarks.run_benchmarks import compare_with_baseline
+
+
+def stages(**medians):
+    return {"stages": {stage: {"median_ms": median} for stage, median in medians.items()}}
+
+
+def test_regression_needs_relative_and_absolute_increase():
+    baseline = stages(tokens=0.03, search=10.0, load=10.0, nuevo=1.0)
+    results = stages(tokens=0.09, search=13.0, load=10.1, otra=5.0)
+
+    comparison = {
+        row["stage"]: row
+        for row in compare_with_baseline(results, baseline, 0.2, min_change_ms=0.5)
+    }
+
+    # +200% pero solo 0.06 ms: ruido en una etapa de fracciones de milisegundo.
+    assert not comparison["tokens"]["regression"]
+    assert comparison["search"]["regression"]
+    assert not comparison["load"]["regression"]
+    # Las etapas que no están en ambos resultados no se comparan.
+    assert set(comparison) == {"tokens", "search", "load"}
@@ -0,0 +1,55 @@
+from app.services.vector_db_services import ProjectRegistry, get_project_registry
+
+
+class FakeEngine:
+    def __init__(self, project_names):
+        self.project_names = project_names
+        self.listeners = []
+        self.calls = 0
+
+    def add_change_listener(self, listener):
+        self.listeners.append(listener)
+
+    def get_project_names(self):
+        self.calls += 1
+        return list(self.project_names)
+
+
+def test_registry_is_shared_per_engine():
+    engine = FakeEngine(["alfa"])
+
+    assert get_project_registry(engine) is get_project_registry(engine)
+    assert get_project_registry(FakeEngine(["alfa"])) is not get_project_registry(engine)
+
+
+def test_find_project_prefers_the_longest_name():
+    registry = ProjectRegistry(FakeEngine(["proyecto", "proyecto alfa", "beta"]))
+
+    assert registry.find_project("¿qué usa el proyecto alfa y beta?") == "proyecto alfa"
+
+
+def test_names_are_cached_until_the_engine_changes():
+    engine = FakeEngine(["alfa"])
+    registry = ProjectRegistry(engine, miss_refresh_seconds=3600)
+    registry.find_project("alfa")
+    registry.find_project("alfa otra vez")
+    assert engine.calls == 1
+
+    engine.project_names.append("beta")
+    for listener in engine.listeners:
+        listener({"beta"})
+    assert registry.find_project("beta") == "beta"
+    assert engine.calls == 2
+
+
+def test_unknown_project_refreshes_at_most_once_per_interval():
+    engine = FakeEngine(["alfa"])
+    registry = ProjectRegistry(engine, miss_refresh_seconds=0)
+    registry.find_project("alfa")
+    # Un proyecto cargado por otro proceso no avisa al registro.
+    engine.project_names.append("beta")
+
+    assert registry.find_project("beta") == "beta"
+    registry.miss_refresh_seconds = 3600
+    assert registry.find_project("gamma") == ""
+    assert engine.calls == 2